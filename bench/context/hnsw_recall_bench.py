@@ -0,0 +1,52 @@
+import json
+import time
+from typing import Any, Dict, Sequence
+
+
+def make_clustered(n: int, dim: int, clusters: int, seed: int):
+  """Gaussian blobs around random centres: closer to real embedding sets than iid noise."""
+  import numpy as np  # local import
+  rng = np.random.default_rng(seed)
+  centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+  assign = rng.integers(0, clusters, size=n)
+  return (centres[assign] + 0.35 * rng.standard_normal((n, dim))).astype(np.float32)
+
+
+def run_bench(n: int = 10000,
+              dim: int = 64,
+              queries: int = 200,
+              k: int = 10,
+              m: int = 16,
+              ef_construction: int = 100,
+              ef_search: Sequence[int] = (16, 32, 64, 128)) -> Dict[str, Any]:
+  """recall@k of HNSW dense search against exact (flat) search, with build time and latency."""
+  from orchestrator.context.numpy_context_store import NumpyContextStore  # local import
+  vecs = make_clustered(n + queries, dim, clusters=64, seed=0)
+  data, qs = vecs[:n], vecs[n:]
+  metas = [{"type": "code"} for _ in range(n)]
+  flat = NumpyContextStore()
+  flat.add(list(range(n)), data, metas)
+  t0 = time.perf_counter()
+  ann = NumpyContextStore(index="hnsw", index_params={"m": m, "ef_construction": ef_construction})
+  for start in range(0, n, 512):
+    ann.add(list(range(start, min(n, start + 512))), data[start:start + 512], metas[start:start + 512])
+  build_s = time.perf_counter() - t0
+  t0 = time.perf_counter()
+  exact = [{r.doc_id for r in flat.search(embedding=q, k=k, mode="dense")} for q in qs]
+  flat_ms = (time.perf_counter() - t0) / queries * 1000.0
+  out: Dict[str, Any] = {"docs": n, "dim": dim, "k": k, "m": m, "ef_construction": ef_construction, "build_s": build_s, "flat_avg_ms": flat_ms}
+  col = ann._scopes["default"]
+  for ef in ef_search:
+    col.ann.ef_search = ef
+    hits = 0
+    t0 = time.perf_counter()
+    for q, truth in zip(qs, exact):
+      hits += len(truth & {r.doc_id for r in ann.search(embedding=q, k=k, mode="dense")})
+    out[f"ef{ef}_avg_ms"] = (time.perf_counter() - t0) / queries * 1000.0
+    out[f"ef{ef}_recall_at_{k}"] = hits / (k * queries)
+  return out
+
+
+if __name__ == "__main__":
+  out = run_bench()
+  print(json.dumps(out))
@@ -0,0 +1,46 @@
+import json
+import time
+from typing import Any, Dict, List
+
+
+def _pct(lat: List[float], p: float) -> float:
+  lat = sorted(lat)
+  return lat[min(len(lat) - 1, int(p * len(lat)))] * 1000.0
+
+
+def run_bench(n: int = 100000, dim: int = 256, queries: int = 200, k: int = 10, rerank_factor: int = 10) -> Dict[str, Any]:
+  """Memory per vector, p50/p99 dense latency and recall@k of int8 scopes against float32."""
+  from bench.context.ivfpq_bench import make_low_rank  # local import
+  from orchestrator.context.numpy_context_store import NumpyContextStore  # local import
+  vecs = make_low_rank(n + queries, dim, rank=32, seed=0)
+  data, qs = vecs[:n], vecs[n:]
+  metas = [{"type": "code"} for _ in range(n)]
+  out: Dict[str, Any] = {"docs": n, "dim": dim, "k": k, "rerank_factor": rerank_factor}
+  exact: List[set] = []
+  for name, schema in (("float32", None),
+                       ("int8", {"quantization": "int8"}),
+                       ("int8_keep_float32", {"quantization": "int8", "keep_float32": True})):
+    store = NumpyContextStore()
+    store.open_scope("bench", json.dumps(schema) if schema else None)
+    for start in range(0, n, 4096):
+      store.add(list(range(start, min(n, start + 4096))), data[start:start + 4096], metas[start:start + 4096])
+    lat: List[float] = []
+    hits = 0
+    for i, q in enumerate(qs):
+      t0 = time.perf_counter()
+      res = store.search(embedding=q, k=k, mode="dense", rerank_factor=rerank_factor)
+      lat.append(time.perf_counter() - t0)
+      got = {r.doc_id for r in res}
+      if name == "float32":
+        exact.append(got)
+      hits += len(exact[i] & got)
+    out[f"{name}_bytes_per_vector"] = store.metrics()["bench"]["vector_bytes"] / n
+    out[f"{name}_p50_ms"] = _pct(lat, 0.50)
+    out[f"{name}_p99_ms"] = _pct(lat, 0.99)
+    out[f"{name}_recall_at_{k}"] = hits / (k * queries)
+  return out
+
+
+if __name__ == "__main__":
+  out = run_bench()
+  print(json.dumps(out))
@@ -0,0 +1,57 @@
+import json
+import time
+from typing import Any, Dict, Sequence
+
+
+def make_low_rank(n: int, dim: int, rank: int, seed: int):
+  """Vectors on a noisy rank-`rank` subspace; embeddings have low intrinsic dimension."""
+  import numpy as np  # local import
+  rng = np.random.default_rng(seed)
+  latent = rng.standard_normal((n, rank)).astype(np.float32)
+  proj = rng.standard_normal((rank, dim)).astype(np.float32)
+  return latent @ proj + 0.05 * rng.standard_normal((n, dim)).astype(np.float32)
+
+
+def run_bench(n: int = 50000,
+              dim: int = 128,
+              queries: int = 200,
+              k: int = 10,
+              nlist: int = 128,
+              m: int = 16,
+              nprobe: Sequence[int] = (4, 16, 64),
+              rerank_factor: int = 10) -> Dict[str, Any]:
+  """Memory per vector, recall@k and latency of IVF-PQ (with and without exact rerank) vs flat."""
+  from orchestrator.context.numpy_context_store import NumpyContextStore  # local import
+  vecs = make_low_rank(n + queries, dim, rank=24, seed=0)
+  data, qs = vecs[:n], vecs[n:]
+  metas = [{"type": "code"} for _ in range(n)]
+  out: Dict[str, Any] = {"docs": n, "dim": dim, "k": k, "nlist": nlist, "m": m}
+  flat = NumpyContextStore()
+  flat.add(list(range(n)), data, metas)
+  t0 = time.perf_counter()
+  exact = [{r.doc_id for r in flat.search(embedding=q, k=k, mode="dense")} for q in qs]
+  out["flat_avg_ms"] = (time.perf_counter() - t0) / queries * 1000.0
+  out["flat_bytes_per_vector"] = flat.metrics()["default"]["vector_bytes"] / n
+  for rerank in (False, True):
+    name = "ivfpq_rerank" if rerank else "ivfpq"
+    store = NumpyContextStore(index="ivfpq", index_params={"nlist": nlist, "m": m, "train_size": min(n, 20000), "rerank": rerank})
+    t0 = time.perf_counter()
+    for start in range(0, n, 1024):
+      store.add(list(range(start, min(n, start + 1024))), data[start:start + 1024], metas[start:start + 1024])
+    out[f"{name}_build_s"] = time.perf_counter() - t0
+    out[f"{name}_bytes_per_vector"] = store.metrics()["default"]["vector_bytes"] / n
+    ivf = store._scopes["default"].ivf
+    for probes in nprobe:
+      ivf.nprobe = probes
+      hits = 0
+      t0 = time.perf_counter()
+      for q, truth in zip(qs, exact):
+        hits += len(truth & {r.doc_id for r in store.search(embedding=q, k=k, mode="dense", rerank_factor=rerank_factor)})
+      out[f"{name}_nprobe{probes}_avg_ms"] = (time.perf_counter() - t0) / queries * 1000.0
+      out[f"{name}_nprobe{probes}_recall_at_{k}"] = hits / (k * queries)
+  return out
+
+
+if __name__ == "__main__":
+  out = run_bench()
+  print(json.dumps(out))
@@ -0,0 +1,65 @@
+import json
+import random
+import time
+from typing import Any, Dict, List
+
+WORDS = ["auth", "login", "token", "cache", "parser", "schema", "queue", "retry", "worker", "sandbox",
+         "diff", "coverage", "router", "registry", "journal", "scope", "vector", "index", "metrics", "config"]
+
+
+def make_corpus(n: int, dim: int, seed: int):
+  import numpy as np  # local import
+  rng = np.random.default_rng(seed)
+  words = random.Random(seed)
+  vecs = rng.standard_normal((n, dim)).astype(np.float32)
+  metas: List[Dict[str, str]] = []
+  for i in range(n):
+    kind = ("code", "text", "test_result")[i % 3]
+    title = " ".join(words.choices(WORDS, k=6))
+    meta = {"type": kind, "title": title, "path": f"src/{words.choice(WORDS)}/{words.choice(WORDS)}_{i}.py"}
+    if kind == "test_result":
+      meta["status"] = "failed" if words.random() < 0.05 else "passed"
+    metas.append(meta)
+  return vecs, metas
+
+
+def run_bench(n: int = 20000, dim: int = 128, queries: int = 200, k: int = 10, backend: str = "numpy") -> Dict[str, Any]:
+  """Ingest and query latency for a ContextStore backend ("numpy" or "vesper")."""
+  if backend == "vesper":
+    from orchestrator.context.vesper_context_store import VesperContextStore  # local import
+    store: Any = VesperContextStore()
+  else:
+    from orchestrator.context.numpy_context_store import NumpyContextStore  # local import
+    store = NumpyContextStore()
+  vecs, metas = make_corpus(n, dim, seed=0)
+  t0 = time.perf_counter()
+  for start in range(0, n, 512):
+    end = min(n, start + 512)
+    store.add(list(range(start, end)), vecs[start:end], metas[start:end])
+  ingest_s = time.perf_counter() - t0
+  rng = random.Random(1)
+  out: Dict[str, Any] = {"backend": backend, "docs": n, "dim": dim, "queries": queries, "ingest_s": ingest_s}
+  for mode in ("dense", "sparse", "hybrid"):
+    lat: List[float] = []
+    for q in range(queries):
+      text = " ".join(rng.choices(WORDS, k=2))
+      emb = vecs[rng.randrange(n)]
+      t = time.perf_counter()
+      store.search(text=text, embedding=emb, k=k, mode=mode, filters={"type": "code"} if q % 2 else None)
+      lat.append(time.perf_counter() - t)
+    lat.sort()
+    out[f"{mode}_avg_ms"] = sum(lat) / len(lat) * 1000.0
+    out[f"{mode}_p95_ms"] = lat[int(0.95 * (len(lat) - 1))] * 1000.0
+  # Selective filter (~1.7% of docs): exercises the metadata index rather than a scan
+  lat = []
+  for _ in range(queries):
+    t = time.perf_counter()
+    store.search(text=" ".join(rng.choices(WORDS, k=2)), embedding=vecs[rng.randrange(n)], k=k, filters={"type": "test_result", "status": "failed"})
+    lat.append(time.perf_counter() - t)
+  out["selective_filter_avg_ms"] = sum(lat) / len(lat) * 1000.0
+  return out
+
+
+if __name__ == "__main__":
+  out = run_bench()
+  print(json.dumps(out))
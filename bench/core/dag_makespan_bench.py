@@ -0,0 +1,76 @@
+import heapq
+import json
+import random
+from typing import Any, Dict, List, Tuple
+
+# Rough per-agent run times in seconds; sandboxed test runs dominate
+AGENT_COST_S = {"CodeGenAgent": 2.0, "StaticAnalysisAgent": 1.0, "DebugAgent": 3.0, "TestAgent": 20.0}
+
+
+def make_graph(n: int, layers: int, max_deps: int, seed: int) -> Tuple[Dict[str, List[str]], Dict[str, float]]:
+  """Random layered DAG: each node depends on up to max_deps nodes from earlier layers."""
+  rng = random.Random(seed)
+  agents = list(AGENT_COST_S)
+  deps: Dict[str, List[str]] = {}
+  cost: Dict[str, float] = {}
+  by_layer: List[List[str]] = [[] for _ in range(layers)]
+  for i in range(n):
+    layer = rng.randrange(layers)
+    nid = f"n{i}"
+    earlier = [x for lvl in by_layer[:layer] for x in lvl]
+    deps[nid] = rng.sample(earlier, min(len(earlier), rng.randint(0, max_deps))) if earlier else []
+    agent = rng.choices(agents, weights=[4, 4, 1, 1])[0]
+    cost[nid] = AGENT_COST_S[agent] * rng.uniform(0.8, 1.2)
+    by_layer[layer].append(nid)
+  return deps, cost
+
+
+def simulate(deps: Dict[str, List[str]], cost: Dict[str, float], workers: int, ordering: str) -> float:
+  """List-schedule the graph on `workers` identical workers and return the makespan."""
+  from orchestrator.core.dag import DAG  # local import
+  g = DAG()
+  for nid, ds in deps.items():
+    g.add_node(nid, ds)
+  rank = g.critical_path(cost.__getitem__) if ordering == "critical_path" else {}
+  seq = 0
+  ready: List[Tuple[float, int, str]] = []
+  for nid in g.ready():
+    ready.append((-rank.get(nid, 0.0), seq, nid))
+    seq += 1
+  heapq.heapify(ready)
+  running: List[Tuple[float, str]] = []
+  now = 0.0
+  while ready or running:
+    while ready and len(running) < workers:
+      _, _, nid = heapq.heappop(ready)
+      heapq.heappush(running, (now + cost[nid], nid))
+    now, nid = heapq.heappop(running)
+    for child in g.mark_done(nid):
+      # FIFO keeps the order nodes became ready in
+      heapq.heappush(ready, (-rank.get(child, 0.0), seq, child))
+      seq += 1
+  return now
+
+
+def run_bench(n: int = 400, layers: int = 8, max_deps: int = 3, workers: int = 8, graphs: int = 10) -> Dict[str, Any]:
+  fifo: List[float] = []
+  cp: List[float] = []
+  for seed in range(graphs):
+    deps, cost = make_graph(n, layers, max_deps, seed)
+    fifo.append(simulate(deps, cost, workers, "fifo"))
+    cp.append(simulate(deps, cost, workers, "critical_path"))
+  avg_fifo = sum(fifo) / graphs
+  avg_cp = sum(cp) / graphs
+  return {
+    "nodes": n,
+    "workers": workers,
+    "graphs": graphs,
+    "fifo_makespan_s": avg_fifo,
+    "critical_path_makespan_s": avg_cp,
+    "speedup": avg_fifo / avg_cp if avg_cp else 0.0,
+  }
+
+
+if __name__ == "__main__":
+  out = run_bench()
+  print(json.dumps(out))
@@ -6,6 +6,7 @@ import sys
 import uuid
 
 from orchestrator.core.orchestrator import Orchestrator
+from orchestrator.core.fair_queue import DEFAULT_PRIORITY_WEIGHTS
 import os
 
 
@@ -17,6 +18,8 @@ def main() -> int:
   sub = parser.add_subparsers(dest="cmd", required=True)
   run = sub.add_parser("run", help="Run a task by providing JSON on stdin or via --file")
   run.add_argument("--file", type=str, default=None, help="Path to JSON AgentTask payload")
+  run.add_argument("--priority", type=str, choices=list(DEFAULT_PRIORITY_WEIGHTS), default=None, help="Priority class (defaults per agent)")
+  run.add_argument("--tenant", type=str, default="", help="Tenant for fair queuing within a priority class")
   status = sub.add_parser("status", help="List registered agents and current redaction settings")
   reg = sub.add_parser("register", help="Register an agent")
   reg.add_argument("name", type=str)
@@ -52,7 +55,11 @@ def main() -> int:
           data = json.load(f)
       else:
         data = json.load(sys.stdin)
-      out = o.submit_task(data)
+      out = o.submit_task(data, priority=args.priority, tenant=args.tenant)
+      if not out.get("accepted", False):
+        # Admission control refused the task; surface the retry-after hint
+        print(json.dumps({"ok": False, **out}))
+        return 1
       print(json.dumps({"ok": True, **out}))
       return 0
     except Exception as e:
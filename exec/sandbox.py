@@ -748,9 +748,11 @@ def run_pytests_v2(
   paths: List[str],
   policy: SandboxPolicy | None = None,
   env_overrides: Dict[str, str] | None = None,
+  cancel: threading.Event | None = None,
 ) -> Dict[str, Any]:
   """Run pytest with OS-level resource limits (Phase 1/2).
-  Returns a structured result with normalized status and enforcement summary."""
+  Returns a structured result with normalized status and enforcement summary.
+  Setting `cancel` kills the child early; the run is then reported as a wall timeout."""
   trace_id = uuid.uuid4().hex
   if not paths:
     return {"version": 2, "status": _STATUS_INTERNAL, "rc": 1, "reason": "no test paths provided",
@@ -966,8 +968,11 @@ def run_pytests_v2(
     timed_ev = threading.Event()
     def _wd() -> None:
       try:
-        # Sleep for the wall time; if process still alive, mark timed_out and kill
-        time.sleep(max(0, float(pol.wall_time_s or 0)))
+        # Sleep for the wall time (or until cancelled); if process still alive, mark timed_out and kill
+        if cancel is not None:
+          cancel.wait(max(0, float(pol.wall_time_s or 0)))
+        else:
+          time.sleep(max(0, float(pol.wall_time_s or 0)))
         if getattr(p, "poll", None) is not None and p.poll() is None:
           timed_ev.set()
           with contextlib.suppress(Exception):
@@ -1099,13 +1104,13 @@ def run_pytests_v1(
   return result
 
 
-def run_pytests(paths: List[str], timeout_s: int = 60) -> Tuple[int, str]:
+def run_pytests(paths: List[str], timeout_s: int = 60, cancel: threading.Event | None = None) -> Tuple[int, str]:
   """Backward-compatible shim that returns (rc, combined_output).
 
   - Uses run_pytests_v2 under the hood for OS-level enforcement per ADR.
   - Prepends a single header line with traceId and duration for correlation.
   """
-  res = run_pytests_v2(paths, policy=SandboxPolicy(wall_time_s=int(timeout_s)))
+  res = run_pytests_v2(paths, policy=SandboxPolicy(wall_time_s=int(timeout_s)), cancel=cancel)
   header = f"[sandbox] traceId={res['traceId']} duration_ms={res['duration_ms']}\n"
   combined = header + (res.get("stdout", "") or "") + (res.get("stderr", "") or "")
   return int(res.get("rc", 1)), combined
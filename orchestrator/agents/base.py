@@ -8,6 +8,20 @@ class AgentContext(Protocol):
   def get(self, key: str, default: Any | None = None) -> Any: ...
 
 
+class TaskContext:
+  """Dict-backed AgentContext the orchestrator passes to agents.
+
+  Well-known keys: "trace_id" and "cancel_token" (a CancelToken carrying the task's
+  deadline; agents should stop early once it is cancelled).
+  """
+
+  def __init__(self, values: Dict[str, Any] | None = None) -> None:
+    self._values: Dict[str, Any] = dict(values or {})
+
+  def get(self, key: str, default: Any | None = None) -> Any:
+    return self._values.get(key, default)
+
+
 class Agent:
   name: str
 
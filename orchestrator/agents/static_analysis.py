@@ -9,7 +9,7 @@ class StaticAnalysisAgent(Agent):
   def __init__(self) -> None:
     super().__init__("StaticAnalysisAgent")
 
-  def run(self, task: Dict[str, Any]) -> Dict[str, Any]:
+  def run(self, task: Dict[str, Any], ctx: Any | None = None) -> Dict[str, Any]:
     payload = task.get("payload", {})
     target = payload.get("target")
     # Produce a richer analysis artifact; in real impl this would parse code
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import math
 from typing import Any, Dict
 
 from .base import Agent
@@ -17,13 +18,22 @@ class TestAgent(Agent):
     if mode == "execute":
       test_name = payload.get("test", target)
       status = "pass"
+      # Honour the task deadline: never start a sandbox run nobody will wait for, and cap
+      # its wall time by the time remaining
+      token = ctx.get("cancel_token") if ctx is not None else None
+      if token is not None:
+        token.raise_if_cancelled()
+      timeout_s = int(payload.get("timeout_s", 30))
+      remaining = token.remaining_s() if token is not None else None
+      if remaining is not None:
+        timeout_s = max(1, min(timeout_s, math.ceil(remaining)))
       # Optionally execute via sandbox when 'paths' provided
       log = ""
       try:
         paths = payload.get("paths")
         if isinstance(paths, list) and paths:
           from exec.sandbox import run_pytests
-          rc, out = run_pytests(paths, timeout_s=int(payload.get("timeout_s", 30)))
+          rc, out = run_pytests(paths, timeout_s=timeout_s, cancel=token.event if token is not None else None)
           status = "pass" if rc == 0 else ("timeout" if rc == 124 else "fail")
           log = sanitize_text(out)
       except Exception:
@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from typing import List, Optional, Sequence, Union, Dict, Any, TYPE_CHECKING
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple, Union, Dict, Any, TYPE_CHECKING
 
 from .models import SearchResult
 from .models import TestResultDocument, DiffSummaryDocument, CoverageHintDocument
@@ -12,14 +16,117 @@ from .models import CodeDocument, TextDocument
 from .idempotency import make_idempotency_key
 
 
+@dataclass
+class ContextBatch:
+  """Typed accumulator for context writes, flushed with one store call per document kind.
+
+  Collect the documents of one or many agent results, then flush() to turn N small
+  writes into at most five upserts (code, text, test results, diffs, coverage hints).
+  """
+  code: List[CodeDocument] = field(default_factory=list)
+  code_vectors: List[Any] = field(default_factory=list)
+  text: List[TextDocument] = field(default_factory=list)
+  text_vectors: List[Any] = field(default_factory=list)
+  test_results: List[TestResultDocument] = field(default_factory=list)
+  diffs: List[DiffSummaryDocument] = field(default_factory=list)
+  coverage: List[CoverageHintDocument] = field(default_factory=list)
+
+  def __len__(self) -> int:
+    return len(self.code) + len(self.text) + len(self.test_results) + len(self.diffs) + len(self.coverage)
+
+  def add_code_document(self, doc: CodeDocument, vector: Union[Sequence[float], Any]) -> None:
+    self.code.append(doc)
+    self.code_vectors.append(vector)
+
+  def add_text_document(self, doc: TextDocument, vector: Union[Sequence[float], Any]) -> None:
+    self.text.append(doc)
+    self.text_vectors.append(vector)
+
+  def add_test_result(self, result: TestResultDocument) -> None:
+    self.test_results.append(result)
+
+  def add_diff_summary(self, diff: DiffSummaryDocument) -> None:
+    self.diffs.append(diff)
+
+  def add_coverage_hint(self, hint: CoverageHintDocument) -> None:
+    self.coverage.append(hint)
+
+  def flush(self, store: "ContextStore") -> None:
+    """Write everything collected so far to store and clear the batch."""
+    if self.code:
+      store.add_code_documents(self.code, self.code_vectors)
+    if self.test_results:
+      store.add_test_results(self.test_results)
+    if self.text:
+      store.add_text_documents(self.text, self.text_vectors)
+    if self.diffs:
+      store.add_diff_summaries(self.diffs)
+    if self.coverage:
+      store.add_coverage_hints(self.coverage)
+    self.code, self.code_vectors, self.text, self.text_vectors = [], [], [], []
+    self.test_results, self.diffs, self.coverage = [], [], []
+
+
 class ContextStore:
-  def __init__(self, backend: Optional["VesperContextStore"] = None) -> None:
+  def __init__(self,
+               backend: Optional["VesperContextStore"] = None,
+               *,
+               write_behind: bool = False,
+               flush_max_rows: int = 512,
+               flush_interval_ms: float = 50.0,
+               max_buffered_rows: int = 10000) -> None:
+    """Context store facade over a vector backend.
+
+    Notes:
+    - With write_behind, add* calls only buffer rows and return; a background flusher
+      hands them to the backend as one upsert once flush_max_rows are buffered or the
+      oldest row is flush_interval_ms old. Rows for an id already buffered replace it.
+    - Writers block once max_buffered_rows are pending (backpressure).
+    - flush() is a barrier: it returns once every row added before the call reached the
+      backend. sync() additionally asks the backend to persist, when it supports that.
+      search() flushes first so reads see earlier writes.
+    - A failed flush is re-raised as RuntimeError from the next flush()/sync()/close().
+    - Without a backend, VesperContextStore is used when pyvesper imports, otherwise
+      NumpyContextStore.
+
+    Raises:
+      ValueError: on non-positive buffer limits.
+      ImportError: without a backend when neither pyvesper nor numpy is importable.
+    """
     if backend is None:
       # Lazy import to avoid importing pyvesper at module load (tests can inject mocks)
-      from .vesper_context_store import VesperContextStore  # type: ignore
-      self._backend = VesperContextStore()
+      try:
+        from .vesper_context_store import VesperContextStore  # type: ignore
+        self._backend = VesperContextStore()
+      except ImportError:
+        # Native engine not built on this box; use the in-process backend
+        try:
+          from .numpy_context_store import NumpyContextStore
+        except ImportError as e:
+          raise ImportError("ContextStore needs a backend: build pyvesper, or install numpy for the in-process NumpyContextStore") from e
+        self._backend = NumpyContextStore()
     else:
       self._backend = backend
+    if flush_max_rows < 1 or max_buffered_rows < flush_max_rows:
+      raise ValueError("flush_max_rows must be >= 1 and <= max_buffered_rows")
+    self._write_behind = write_behind
+    self._flush_max_rows = flush_max_rows
+    self._flush_interval_s = flush_interval_ms / 1000.0
+    self._max_buffered = max_buffered_rows
+    self._wb_cv = threading.Condition()
+    # id -> (vector, metadata); insertion order is flush order
+    self._wb_rows: "OrderedDict[int, Tuple[Any, Dict[str, str]]]" = OrderedDict()
+    self._wb_first_at = 0.0
+    self._wb_added = 0  # sequence of the last buffered write
+    self._wb_flushed = 0  # sequence of the last write handed to the backend
+    self._wb_urgent = False
+    self._wb_closed = False
+    self._wb_error: Optional[BaseException] = None
+    self._wb_stats = {"flushes": 0, "rows": 0, "coalesced": 0, "flush_s_total": 0.0, "flush_s_max": 0.0}
+    self._flusher: Optional[threading.Thread] = None
+    if write_behind:
+      self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="context-write-behind")
+      self._flusher.start()
 
   def initialize(self, config: Dict[str, str]) -> None:
     self._backend.initialize(config)
@@ -31,7 +138,128 @@ class ContextStore:
           ids: Sequence[int],
           vectors: Sequence[Union[Sequence[float], Any]],
           metadata: Sequence[Dict[str, str]]) -> None:
-    self._backend.add(ids, vectors, metadata)
+    self._write(ids, vectors, metadata)
+
+  def flush(self) -> None:
+    """Block until every row added so far has been handed to the backend.
+
+    Raises:
+      RuntimeError: if a background flush failed.
+    """
+    if not self._write_behind:
+      return
+    with self._wb_cv:
+      target = self._wb_added
+      self._wb_urgent = True
+      self._wb_cv.notify_all()
+      self._wb_cv.wait_for(lambda: self._wb_flushed >= target or self._wb_error is not None or self._flusher is None)
+      self._raise_flush_error()
+
+  def sync(self) -> None:
+    """flush(), then persist the backend if it exposes sync()."""
+    self.flush()
+    backend_sync = getattr(self._backend, "sync", None)
+    if callable(backend_sync):
+      backend_sync()
+
+  def close(self) -> None:
+    """Flush buffered rows and stop the background flusher."""
+    if self._flusher is None:
+      return
+    try:
+      self.flush()
+    finally:
+      with self._wb_cv:
+        self._wb_closed = True
+        self._wb_cv.notify_all()
+      self._flusher.join(timeout=5.0)
+      self._flusher = None
+
+  def write_metrics(self) -> Dict[str, Any]:
+    with self._wb_cv:
+      st = self._wb_stats
+      flushes = int(st["flushes"])
+      return {
+        "write_behind": self._write_behind,
+        "buffered": len(self._wb_rows),
+        "flushes": flushes,
+        "rows_flushed": int(st["rows"]),
+        "coalesced": int(st["coalesced"]),
+        "rows_per_flush": st["rows"] / flushes if flushes else 0.0,
+        "flush_ms_avg": (st["flush_s_total"] / flushes) * 1000.0 if flushes else 0.0,
+        "flush_ms_max": st["flush_s_max"] * 1000.0,
+        "error": str(self._wb_error) if self._wb_error is not None else None,
+      }
+
+  def _write(self,
+             ids: Sequence[int],
+             vectors: Sequence[Union[Sequence[float], Any]],
+             metadata: Sequence[Dict[str, str]]) -> None:
+    if not self._write_behind or self._flusher is None:
+      self._backend.add(ids, vectors, metadata)
+      return
+    with self._wb_cv:
+      self._wb_cv.wait_for(lambda: len(self._wb_rows) < self._max_buffered or self._wb_error is not None or self._wb_closed)
+      if not self._wb_rows:
+        self._wb_first_at = time.monotonic()
+      for doc_id, vec, meta in zip(ids, vectors, metadata):
+        if doc_id in self._wb_rows:
+          # Upsert semantics: the newer row wins and moves to the back
+          del self._wb_rows[doc_id]
+          self._wb_stats["coalesced"] += 1
+        self._wb_rows[doc_id] = (vec, meta)
+      self._wb_added += 1
+      if len(self._wb_rows) >= self._flush_max_rows:
+        self._wb_cv.notify_all()
+
+  def _raise_flush_error(self) -> None:
+    # Caller holds self._wb_cv
+    if self._wb_error is not None:
+      err, self._wb_error = self._wb_error, None
+      raise RuntimeError(f"context write-behind flush failed: {err}") from err
+
+  def _flush_loop(self) -> None:
+    while True:
+      with self._wb_cv:
+        while True:
+          if self._wb_rows and (self._wb_urgent or self._wb_closed or len(self._wb_rows) >= self._flush_max_rows):
+            break
+          if self._wb_closed:
+            return
+          if not self._wb_rows:
+            # Nothing buffered: a barrier on an empty buffer is already satisfied
+            self._wb_flushed = self._wb_added
+            self._wb_urgent = False
+            self._wb_cv.notify_all()
+            self._wb_cv.wait()
+            continue
+          wait_s = self._wb_first_at + self._flush_interval_s - time.monotonic()
+          if wait_s <= 0:
+            break
+          self._wb_cv.wait(wait_s)
+        rows = self._wb_rows
+        self._wb_rows = OrderedDict()
+        seq = self._wb_added
+        self._wb_urgent = False
+        self._wb_cv.notify_all()  # wake writers blocked on a full buffer
+      start = time.perf_counter()
+      try:
+        self._backend.add(list(rows.keys()), [v for v, _ in rows.values()], [m for _, m in rows.values()])
+      except Exception as e:
+        with self._wb_cv:
+          self._wb_error = e
+          self._wb_flushed = seq
+          self._wb_cv.notify_all()
+        continue
+      elapsed = time.perf_counter() - start
+      with self._wb_cv:
+        st = self._wb_stats
+        st["flushes"] += 1
+        st["rows"] += len(rows)
+        st["flush_s_total"] += elapsed
+        st["flush_s_max"] = max(st["flush_s_max"], elapsed)
+        self._wb_flushed = seq
+        self._wb_cv.notify_all()
 
   def add_code_documents(self,
                          docs: Sequence[CodeDocument],
@@ -50,7 +278,7 @@ class ContextStore:
       }
       m["idempotency_key"] = make_idempotency_key("add_code_document", {"id": d.id, "path": d.path, "content": d.content})
       meta.append(m)
-    self._backend.add(ids, vectors, meta)
+    self._write(ids, vectors, meta)
 
   def add_text_documents(self,
                          docs: Sequence[TextDocument],
@@ -68,7 +296,7 @@ class ContextStore:
       }
       m["idempotency_key"] = make_idempotency_key("add_text_document", {"id": d.id, "title": d.title, "content": d.content})
       meta.append(m)
-    self._backend.add(ids, vectors, meta)
+    self._write(ids, vectors, meta)
 
   def add_test_results(self, results: Sequence[TestResultDocument]) -> None:
     ids: List[int] = []
@@ -89,7 +317,7 @@ class ContextStore:
         import hashlib
         m["log_hash"] = hashlib.sha256(r.log.encode("utf-8")).hexdigest()
       meta.append(m)
-    self._backend.add(ids, vectors, meta)
+    self._write(ids, vectors, meta)
 
   def add_diff_summaries(self, diffs: Sequence[DiffSummaryDocument]) -> None:
     ids: List[int] = []
@@ -107,7 +335,7 @@ class ContextStore:
         "deletions": str(d.deletions),
       }
       meta.append(m)
-    self._backend.add(ids, vectors, meta)
+    self._write(ids, vectors, meta)
 
   def add_coverage_hints(self, hints: Sequence[CoverageHintDocument]) -> None:
     ids: List[int] = []
@@ -123,7 +351,7 @@ class ContextStore:
         "line_rate": str(h.line_rate),
       }
       meta.append(m)
-    self._backend.add(ids, vectors, meta)
+    self._write(ids, vectors, meta)
 
   def search(self,
              text: str = "",
@@ -132,6 +360,7 @@ class ContextStore:
              k: int = 10,
              mode: Mode = "hybrid",
              filters: Optional[Union[Dict[str, str], str]] = None) -> List[SearchResult]:
+    self.flush()
     return self._backend.search(text, embedding, k=k, mode=mode, filters=filters)
 
   def structured_query(self,
@@ -149,6 +378,7 @@ class ContextStore:
 
     This forwards to the backend search with explicit fusion/strategy parameters.
     """
+    self.flush()
     # Delegate to backend with extended parameters if available
     backend = getattr(self._backend, "search")
     return backend(text, embedding, k=k, mode=mode, filters=filters,
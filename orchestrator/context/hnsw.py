@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import heapq
+import math
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (similarity, row) pairs; similarity is the inner product of unit vectors (cosine)
+Scored = List[Tuple[float, int]]
+
+
+class HNSWIndex:
+  """Hierarchical navigable small world graph over rows of an external vector matrix.
+
+  Notes:
+  - Vectors are not copied: vectors() returns the current matrix (it may be reallocated
+    as the owner grows it) and rows are expected to be unit-normalized.
+  - m links per node on upper layers, 2 * m on layer 0; neighbours are chosen with the
+    diversity heuristic (a candidate is kept only if it is closer to the new node than to
+    every neighbour already kept). Distances to a node's unvisited neighbours are
+    computed in one matrix-vector product.
+  - add() on a row that is already in the graph re-links it with its new vector; links
+    pointing at it from other nodes are kept and only serve as extra routes.
+  - search() traverses every node but returns only rows where allowed is True, so
+    filters and deletions are handled by the caller's mask.
+
+  Raises:
+    ValueError: on non-positive m, ef_construction or ef_search.
+  """
+
+  def __init__(self,
+               vectors: Callable[[], np.ndarray],
+               *,
+               m: int = 16,
+               ef_construction: int = 200,
+               ef_search: int = 64,
+               seed: int = 0) -> None:
+    if m < 2 or ef_construction < 1 or ef_search < 1:
+      raise ValueError("m must be >= 2 and ef_construction/ef_search >= 1")
+    self.m = m
+    self.m0 = 2 * m
+    self.ef_construction = max(ef_construction, m)
+    self.ef_search = ef_search
+    self._vectors = vectors
+    self._ml = 1.0 / math.log(m)
+    self._rng = random.Random(seed)
+    self._links: List[Dict[int, List[int]]] = []  # layer -> row -> neighbour rows
+    self._level: Dict[int, int] = {}
+    self._entry: Optional[int] = None
+
+  def __len__(self) -> int:
+    return len(self._level)
+
+  def stats(self) -> Dict[str, int]:
+    return {"nodes": len(self._level), "layers": len(self._links), "edges": sum(len(n) for layer in self._links for n in layer.values())}
+
+  def add(self, row: int) -> None:
+    """Insert row (or re-link it after its vector changed)."""
+    vecs = self._vectors()
+    q = vecs[row]
+    level = self._level.get(row)
+    if level is None:
+      level = int(-math.log(1.0 - self._rng.random()) * self._ml)
+      self._level[row] = level
+    while len(self._links) <= level:
+      self._links.append({})
+    if self._entry is None or self._entry == row and len(self._level) == 1:
+      self._entry = row
+      for layer in range(level + 1):
+        self._links[layer][row] = []
+      return
+    top = self._level[self._entry]
+    ep: Scored = [(float(vecs[self._entry] @ q), self._entry)]
+    for layer in range(top, level, -1):
+      ep = self._search_layer(vecs, q, ep, 1, layer)[:1]
+    for layer in range(min(level, top), -1, -1):
+      found = [(s, r) for s, r in self._search_layer(vecs, q, ep, self.ef_construction, layer) if r != row]
+      links = self._links[layer]
+      nbrs = self._select(vecs, found, self.m)
+      links[row] = nbrs
+      cap = self.m0 if layer == 0 else self.m
+      for n in nbrs:
+        back = links.setdefault(n, [])
+        if row in back:
+          continue
+        back.append(row)
+        if len(back) > cap:
+          sims = vecs[back] @ vecs[n]
+          order = np.argsort(-sims, kind="stable")
+          links[n] = self._select(vecs, [(float(sims[i]), back[i]) for i in order], cap)
+      ep = found or ep
+    for layer in range(top + 1, level + 1):
+      self._links[layer].setdefault(row, [])
+    if level > top:
+      self._entry = row
+
+  def search(self, q: np.ndarray, k: int, *, ef: Optional[int] = None, allowed: Optional[np.ndarray] = None) -> Scored:
+    """Approximate top-k (similarity, row) pairs for a unit query, best first."""
+    if self._entry is None or k <= 0:
+      return []
+    vecs = self._vectors()
+    ep: Scored = [(float(vecs[self._entry] @ q), self._entry)]
+    for layer in range(self._level[self._entry], 0, -1):
+      ep = self._search_layer(vecs, q, ep, 1, layer)[:1]
+    found = self._search_layer(vecs, q, ep, max(ef or self.ef_search, k), 0, allowed)
+    return found[:k]
+
+  def _search_layer(self, vecs: np.ndarray, q: np.ndarray, entry: Scored, ef: int, layer: int, allowed: Optional[np.ndarray] = None) -> Scored:
+    links = self._links[layer]
+    visited = {r for _, r in entry}
+    cand = [(-s, r) for s, r in entry]
+    heapq.heapify(cand)
+    res = [(s, r) for s, r in entry if allowed is None or allowed[r]]
+    heapq.heapify(res)
+    while cand:
+      neg, c = heapq.heappop(cand)
+      if len(res) >= ef and -neg < res[0][0]:
+        break
+      nbrs = [n for n in links.get(c, ()) if n not in visited]
+      if not nbrs:
+        continue
+      visited.update(nbrs)
+      sims = (vecs[nbrs] @ q).tolist()
+      for n, s in zip(nbrs, sims):
+        if len(res) < ef or s > res[0][0]:
+          heapq.heappush(cand, (-s, n))
+          if allowed is None or allowed[n]:
+            heapq.heappush(res, (s, n))
+            if len(res) > ef:
+              heapq.heappop(res)
+    return sorted(res, key=lambda sr: (-sr[0], sr[1]))
+
+  @staticmethod
+  def _select(vecs: np.ndarray, cands: Scored, m: int) -> List[int]:
+    """Diversity heuristic over candidates sorted best first."""
+    if len(cands) <= m:
+      return [r for _, r in cands]
+    rows = [r for _, r in cands]
+    pair = vecs[rows] @ vecs[rows].T
+    kept: List[int] = []
+    for i, (s, _) in enumerate(cands):
+      if not kept or float(pair[i, kept].max()) < s:
+        kept.append(i)
+        if len(kept) == m:
+          break
+    return [rows[i] for i in kept]
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (similarity, row) pairs, best first
+Scored = List[Tuple[float, int]]
+
+
+def kmeans(x: np.ndarray, k: int, *, iters: int = 20, seed: int = 0) -> np.ndarray:
+  """Lloyd's k-means (L2) with random-sample init; empty clusters keep their centroid."""
+  rng = np.random.default_rng(seed)
+  k = min(k, len(x))
+  cent = x[rng.choice(len(x), size=k, replace=False)].copy()
+  for _ in range(iters):
+    d = (cent * cent).sum(1)[None, :] - 2.0 * (x @ cent.T)
+    assign = d.argmin(1)
+    counts = np.bincount(assign, minlength=k)
+    sums = np.zeros_like(cent)
+    np.add.at(sums, assign, x)
+    nz = counts > 0
+    cent[nz] = sums[nz] / counts[nz, None]
+  return cent
+
+
+class IVFPQIndex:
+  """Inverted file over coarse centroids with product-quantized residuals.
+
+  Notes:
+  - Vectors are buffered as float32 (and searched exactly) until train_size have been
+    added; then nlist coarse centroids and one codebook of 2**nbits centroids per
+    subspace are trained on them, the buffer is encoded and dropped, and later vectors
+    are encoded on add. Per vector the index then holds m code bytes, a list id and its
+    int32 entry in a growable inverted-list array; nbytes() counts allocated capacity.
+  - Scores approximate the inner product: q . centroid + sum over subspaces of an
+    asymmetric distance table (codebook_j @ q_j), looked up by code.
+  - search() probes the nprobe lists whose centroids are closest to the query and only
+    returns rows where allowed is True.
+  - Codes alone are lossy: on the low-rank data of bench/context/ivfpq_bench.py recall@10
+    stays near 0.5 even at nprobe=64, so this is not a drop-in for exact search without
+    a float32 rerank of the candidates.
+
+  Raises:
+    ValueError: on invalid parameters, or if dim is not a multiple of m.
+  """
+
+  def __init__(self,
+               *,
+               nlist: int = 64,
+               m: int = 8,
+               nbits: int = 8,
+               nprobe: int = 8,
+               train_size: int = 4096,
+               seed: int = 0) -> None:
+    if nlist < 1 or m < 1 or not 1 <= nbits <= 8 or nprobe < 1 or train_size < 1:
+      raise ValueError("nlist, m, nprobe, train_size must be >= 1 and nbits within [1, 8]")
+    self.nlist = nlist
+    self.m = m
+    self.ksub = 1 << nbits
+    self.nprobe = nprobe
+    self.train_size = train_size
+    self._seed = seed
+    self.dim: Optional[int] = None
+    self.centroids: Optional[np.ndarray] = None  # (nlist, dim)
+    self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dim // m)
+    self._pending: Dict[int, np.ndarray] = {}  # row -> vector, before training
+    self._codes = np.zeros((0, m), dtype=np.uint8)  # row -> PQ code
+    self._list_of = np.full(0, -1, dtype=np.int32)  # row -> inverted list, -1 if absent
+    # Inverted lists: rows of list li are _lists[li][:_list_len[li]], capacity doubles
+    self._lists: List[np.ndarray] = []
+    self._list_len = np.zeros(0, dtype=np.int64)
+
+  @property
+  def trained(self) -> bool:
+    return self.centroids is not None
+
+  def __len__(self) -> int:
+    return len(self._pending) + int((self._list_of >= 0).sum())
+
+  def nbytes(self) -> int:
+    """Resident bytes for vectors, codes, list assignments, inverted lists and trained tables."""
+    total = self._codes.nbytes + self._list_of.nbytes + self._list_len.nbytes + sum(lst.nbytes for lst in self._lists)
+    total += sum(v.nbytes for v in self._pending.values())
+    if self.centroids is not None and self.codebooks is not None:
+      total += self.centroids.nbytes + self.codebooks.nbytes
+    return total
+
+  def add(self, row: int, vec: np.ndarray) -> None:
+    if self.dim is None:
+      if vec.size % self.m:
+        raise ValueError(f"dimension {vec.size} is not a multiple of m={self.m}")
+      self.dim = int(vec.size)
+    if not self.trained:
+      self._pending[row] = np.array(vec, dtype=np.float32)
+      if len(self._pending) >= self.train_size:
+        self._train()
+      return
+    self._encode(np.array([row], dtype=np.int64), vec[None, :])
+
+  def search(self, q: np.ndarray, k: int, *, nprobe: Optional[int] = None, allowed: Optional[np.ndarray] = None) -> Scored:
+    if not self.trained:
+      return self._search_pending(q, k, allowed)
+    assert self.centroids is not None
+    coarse = self.centroids @ q
+    probe = np.argsort(-coarse)[:nprobe or self.nprobe]
+    table = self._table(q)
+    rows = [self._list_rows(int(li)) for li in probe]
+    scores = [coarse[li] + self._adc(table, r) for li, r in zip(probe, rows)]
+    all_rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    all_scores = np.concatenate(scores) if scores else np.zeros(0, dtype=np.float32)
+    if allowed is not None and all_rows.size:
+      keep = allowed[all_rows]
+      all_rows, all_scores = all_rows[keep], all_scores[keep]
+    return _best(all_scores, all_rows, k)
+
+  def score_rows(self, q: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """Approximate scores for specific rows (-inf where a row is not indexed)."""
+    out = np.full(rows.size, -np.inf, dtype=np.float32)
+    if not self.trained:
+      for i, r in enumerate(rows.tolist()):
+        v = self._pending.get(r)
+        if v is not None:
+          out[i] = float(v @ q)
+      return out
+    assert self.centroids is not None
+    lists = self._list_of[rows] if rows.size else np.zeros(0, dtype=np.int32)
+    ok = lists >= 0
+    if ok.any():
+      out[ok] = (self.centroids[lists[ok]] @ q) + self._adc(self._table(q), rows[ok])
+    return out
+
+  def _train(self) -> None:
+    rows = np.fromiter(self._pending.keys(), dtype=np.int64, count=len(self._pending))
+    x = np.stack([self._pending[int(r)] for r in rows])
+    self.centroids = kmeans(x, self.nlist, seed=self._seed).astype(np.float32)
+    assign = self._assign(x)
+    resid = x - self.centroids[assign]
+    sub = resid.reshape(len(x), self.m, -1)
+    books = np.zeros((self.m, self.ksub, sub.shape[2]), dtype=np.float32)
+    for j in range(self.m):
+      cb = kmeans(sub[:, j, :], self.ksub, seed=self._seed + j + 1)
+      books[j, :len(cb)] = cb
+      # Pad small training sets by repeating centroids so every code decodes sensibly
+      books[j, len(cb):] = cb[0]
+    self.codebooks = books
+    self._lists = [np.zeros(0, dtype=np.int32) for _ in range(len(self.centroids))]
+    self._list_len = np.zeros(len(self.centroids), dtype=np.int64)
+    self._pending.clear()
+    self._encode(rows, x)
+
+  def _assign(self, x: np.ndarray) -> np.ndarray:
+    assert self.centroids is not None
+    c = self.centroids
+    return ((c * c).sum(1)[None, :] - 2.0 * (x @ c.T)).argmin(1)
+
+  def _encode(self, rows: np.ndarray, x: np.ndarray) -> None:
+    assert self.centroids is not None and self.codebooks is not None
+    need = int(rows.max()) + 1
+    if need > self._codes.shape[0]:
+      cap = max(need, 2 * self._codes.shape[0], 16)
+      codes = np.zeros((cap, self.m), dtype=np.uint8)
+      codes[:self._codes.shape[0]] = self._codes
+      self._codes = codes
+      list_of = np.full(cap, -1, dtype=np.int32)
+      list_of[:self._list_of.size] = self._list_of
+      self._list_of = list_of
+    assign = self._assign(x)
+    sub = (x - self.centroids[assign]).reshape(len(x), self.m, -1)
+    for j in range(self.m):
+      cb = self.codebooks[j]
+      d = (cb * cb).sum(1)[None, :] - 2.0 * (sub[:, j, :] @ cb.T)
+      self._codes[rows, j] = d.argmin(1)
+    for r, li in zip(rows.tolist(), assign.tolist()):
+      old = int(self._list_of[r])
+      if old == li:
+        continue
+      if old >= 0:
+        self._list_remove(old, r)
+      self._list_append(li, r)
+      self._list_of[r] = li
+
+  def _list_rows(self, li: int) -> np.ndarray:
+    return self._lists[li][:self._list_len[li]]
+
+  def _list_append(self, li: int, row: int) -> None:
+    n = int(self._list_len[li])
+    lst = self._lists[li]
+    if n == lst.size:
+      grown = np.empty(max(16, 2 * n), dtype=np.int32)
+      grown[:n] = lst
+      self._lists[li] = lst = grown
+    lst[n] = row
+    self._list_len[li] = n + 1
+
+  def _list_remove(self, li: int, row: int) -> None:
+    # Order within a list does not matter; fill the hole with the last entry
+    n = int(self._list_len[li])
+    lst = self._lists[li]
+    i = int(np.flatnonzero(lst[:n] == row)[0])
+    lst[i] = lst[n - 1]
+    self._list_len[li] = n - 1
+
+  def _table(self, q: np.ndarray) -> np.ndarray:
+    """Asymmetric distance table: (m, ksub) inner products of query subvectors with codewords."""
+    assert self.codebooks is not None
+    return np.einsum("jkd,jd->jk", self.codebooks, q.reshape(self.m, -1))
+
+  def _adc(self, table: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    if not rows.size:
+      return np.zeros(0, dtype=np.float32)
+    return table[np.arange(self.m), self._codes[rows]].sum(1)
+
+  def _search_pending(self, q: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> Scored:
+    rows = np.array([r for r in self._pending if allowed is None or allowed[r]], dtype=np.int64)
+    if not rows.size:
+      return []
+    x = np.stack([self._pending[int(r)] for r in rows])
+    return _best(x @ q, rows, k)
+
+
+def _best(scores: np.ndarray, rows: np.ndarray, k: int) -> Scored:
+  if not rows.size or k <= 0:
+    return []
+  k = min(k, rows.size)
+  idx = np.argpartition(-scores, k - 1)[:k] if k < rows.size else np.arange(rows.size)
+  order = np.lexsort((rows[idx], -scores[idx]))
+  return [(float(scores[idx[i]]), int(rows[idx[i]])) for i in order]
@@ -0,0 +1,590 @@
+from __future__ import annotations
+
+import json
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Literal, Optional, Sequence, Set, Tuple, Union
+
+import numpy as np
+
+from .hnsw import HNSWIndex
+from .ivfpq import IVFPQIndex
+from .models import SearchResult
+from .quantize import int8_scales, int8_scores, quantize_int8
+
+Mode = Literal["dense", "sparse", "hybrid"]
+Fusion = Literal["rrf", "weighted"]
+Index = Literal["flat", "hnsw", "ivfpq"]
+
+# Metadata fields whose values feed the BM25 index (the backend never sees raw content
+# unless a caller puts it in metadata under one of these keys)
+DEFAULT_TEXT_FIELDS = ("content", "text", "title", "path", "test_name", "target", "files")
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+  """Lowercased alphanumeric runs; snake_case, paths and dotted names split into parts."""
+  return [t.lower() for t in _TOKEN_RE.findall(text)]
+
+
+class _BM25:
+  """Inverted index with Okapi BM25 scoring over collection rows."""
+
+  def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+    self.k1 = k1
+    self.b = b
+    self.postings: Dict[str, Dict[int, int]] = {}  # term -> row -> term frequency
+    self.doc_terms: Dict[int, Counter[str]] = {}
+    self.doc_len: Dict[int, int] = {}
+    self.total_len = 0
+
+  def upsert(self, row: int, tokens: List[str]) -> None:
+    self.remove(row)
+    counts = Counter(tokens)
+    for term, tf in counts.items():
+      self.postings.setdefault(term, {})[row] = tf
+    self.doc_terms[row] = counts
+    self.doc_len[row] = len(tokens)
+    self.total_len += len(tokens)
+
+  def remove(self, row: int) -> None:
+    old = self.doc_terms.pop(row, None)
+    if old is None:
+      return
+    for term in old:
+      plist = self.postings[term]
+      del plist[row]
+      if not plist:
+        del self.postings[term]
+    self.total_len -= self.doc_len.pop(row)
+
+  def scores(self, query: str, n_rows: int, doc_len: np.ndarray) -> np.ndarray:
+    """BM25 score for every row (0 where no query term occurs)."""
+    out = np.zeros(n_rows, dtype=np.float32)
+    n_docs = len(self.doc_terms)
+    if not n_docs:
+      return out
+    avgdl = self.total_len / n_docs or 1.0
+    norm = self.k1 * (1.0 - self.b + self.b * doc_len[:n_rows] / avgdl)
+    for term in set(tokenize(query)):
+      plist = self.postings.get(term)
+      if not plist:
+        continue
+      rows = np.fromiter(plist.keys(), dtype=np.int64, count=len(plist))
+      tfs = np.fromiter(plist.values(), dtype=np.float32, count=len(plist))
+      out[rows] += self._idf(len(plist), n_docs) * tfs * (self.k1 + 1.0) / (tfs + norm[rows])
+    return out
+
+  def scores_for(self, query: str, rows: np.ndarray, doc_len: np.ndarray) -> np.ndarray:
+    """BM25 scores for the given rows only; cost scales with len(rows), not the collection."""
+    out = np.zeros(rows.size, dtype=np.float32)
+    n_docs = len(self.doc_terms)
+    if not n_docs or not rows.size:
+      return out
+    avgdl = self.total_len / n_docs or 1.0
+    norm = self.k1 * (1.0 - self.b + self.b * doc_len[rows] / avgdl)
+    for term in set(tokenize(query)):
+      plist = self.postings.get(term)
+      if not plist:
+        continue
+      tfs = np.fromiter((plist.get(r, 0) for r in rows.tolist()), dtype=np.float32, count=rows.size)
+      out += self._idf(len(plist), n_docs) * tfs * (self.k1 + 1.0) / (tfs + norm)
+    return out
+
+  @staticmethod
+  def _idf(df: int, n_docs: int) -> float:
+    return math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+class _MetaIndex:
+  """Posting lists per metadata (key, value), kept as sets and snapshotted as sorted arrays."""
+
+  def __init__(self) -> None:
+    self.rows: Dict[Tuple[str, str], Set[int]] = {}
+    self._arrays: Dict[Tuple[str, str], np.ndarray] = {}  # built on first lookup after a change
+
+  def update(self, row: int, old: Dict[str, str], new: Dict[str, str]) -> None:
+    for kv in old.items():
+      if new.get(kv[0]) != kv[1]:
+        plist = self.rows[kv]
+        plist.discard(row)
+        if not plist:
+          del self.rows[kv]
+        self._arrays.pop(kv, None)
+    for kv in new.items():
+      if old.get(kv[0]) != kv[1]:
+        self.rows.setdefault(kv, set()).add(row)
+        self._arrays.pop(kv, None)
+
+  def lookup(self, key: str, value: str) -> np.ndarray:
+    kv = (key, value)
+    arr = self._arrays.get(kv)
+    if arr is None:
+      plist = self.rows.get(kv, ())
+      arr = np.fromiter(plist, dtype=np.int64, count=len(plist))
+      arr.sort()
+      self._arrays[kv] = arr
+    return arr
+
+  def match(self, want: Dict[str, str]) -> np.ndarray:
+    """Sorted rows matching every pair; intersects from the shortest list up."""
+    lists = sorted((self.lookup(k, v) for k, v in want.items()), key=len)
+    out = lists[0]
+    for arr in lists[1:]:
+      if not out.size:
+        break
+      out = np.intersect1d(out, arr, assume_unique=True)
+    return out
+
+
+class _Collection:
+  """One scope: a growable float32 matrix of unit vectors plus BM25 and metadata rows."""
+
+  def __init__(self,
+               dim: Optional[int],
+               text_fields: Sequence[str],
+               prefilter_selectivity: float,
+               index: Index = "flat",
+               index_params: Optional[Dict[str, Any]] = None,
+               quantization: Optional[str] = None,
+               keep_float32: bool = False,
+               calibrate_rows: int = 1024) -> None:
+    if quantization not in (None, "int8"):
+      raise ValueError(f"unknown quantization {quantization!r}; expected 'int8' or none")
+    if quantization is not None and index != "flat":
+      raise ValueError("int8 quantization is only supported with the flat index")
+    if calibrate_rows < 1:
+      raise ValueError("calibrate_rows must be >= 1")
+    self.dim = dim
+    self.text_fields = tuple(text_fields)
+    self.prefilter_selectivity = prefilter_selectivity
+    self.options = {"quantization": quantization, "keep_float32": keep_float32, "calibrate_rows": calibrate_rows}
+    self.quantization = quantization
+    self.keep_float32 = keep_float32
+    self.calibrate_rows = calibrate_rows
+    self.scale: Optional[np.ndarray] = None  # per-dimension int8 scales, once calibrated
+    params = dict(index_params or {})
+    self.ann: Optional[HNSWIndex] = None
+    self.ivf: Optional[IVFPQIndex] = None
+    # Without exact rerank an IVF-PQ scope keeps only codes, never the float32 rows
+    self.keep_vectors = True
+    if index == "hnsw":
+      self.ann = HNSWIndex(lambda: self.matrix, **params)
+    elif index == "ivfpq":
+      self.keep_vectors = bool(params.pop("rerank", False))
+      self.ivf = IVFPQIndex(**params)
+    self.matrix = np.zeros((0, self._width()), dtype=np.float32)
+    self.codes = np.zeros((0, self._code_width()), dtype=np.int8)
+    self.has_vec = np.zeros(0, dtype=bool)
+    self.doc_len = np.zeros(0, dtype=np.float32)
+    self.ids: List[int] = []
+    self.meta: List[Dict[str, str]] = []
+    self.row_of: Dict[int, int] = {}
+    self.bm25 = _BM25()
+    self.meta_index = _MetaIndex()
+    self.plans = {"prefilter": 0, "postfilter": 0, "empty": 0}
+
+  def __len__(self) -> int:
+    return len(self.ids)
+
+  def _width(self) -> int:
+    return (self.dim or 0) if self.keep_vectors else 0
+
+  def _code_width(self) -> int:
+    return (self.dim or 0) if self.quantization == "int8" else 0
+
+  def vector_bytes(self) -> int:
+    """Resident bytes of stored vectors and vector indexes (excluding BM25 and metadata)."""
+    total = self.matrix[:len(self)].nbytes + self.codes[:len(self)].nbytes
+    if self.ivf is not None:
+      total += self.ivf.nbytes()
+    return total
+
+  def upsert(self, ids: Sequence[int], vectors: Sequence[Any], metadata: Sequence[Dict[str, str]]) -> None:
+    if not (len(ids) == len(vectors) == len(metadata)):
+      raise ValueError("ids, vectors and metadata must have same length")
+    for doc_id, vec, meta in zip(ids, vectors, metadata):
+      arr = np.asarray(vec, dtype=np.float32).reshape(-1)
+      # 1-element placeholders (test results, diffs, coverage hints) carry no embedding
+      if self.dim is None and arr.size > 1:
+        self.dim = int(arr.size)
+        self.matrix = np.zeros((self.matrix.shape[0], self._width()), dtype=np.float32)
+        self.codes = np.zeros((self.codes.shape[0], self._code_width()), dtype=np.int8)
+      row = self.row_of.get(int(doc_id))
+      if row is None:
+        row = self._append_row(int(doc_id))
+      norm = float(np.linalg.norm(arr)) if arr.size == self.dim else 0.0
+      if norm > 0.0:
+        unit = arr / norm
+        if self.keep_vectors:
+          self.matrix[row] = unit
+        if self.scale is not None:
+          self.codes[row] = quantize_int8(unit, self.scale)
+        self.has_vec[row] = True
+        if self.ann is not None:
+          self.ann.add(row)
+        if self.ivf is not None:
+          self.ivf.add(row, unit)
+      else:
+        if self.keep_vectors:
+          self.matrix[row] = 0.0
+        if self.scale is not None:
+          self.codes[row] = 0
+        self.has_vec[row] = False
+      new_meta = {str(k): str(v) for k, v in meta.items()}
+      self.meta_index.update(row, self.meta[row], new_meta)
+      self.meta[row] = new_meta
+      tokens = tokenize(" ".join(str(meta[f]) for f in self.text_fields if f in meta))
+      self.bm25.upsert(row, tokens)
+      self.doc_len[row] = len(tokens)
+    if self.quantization == "int8" and self.scale is None and int(self.has_vec.sum()) >= self.calibrate_rows:
+      self._calibrate()
+
+  def _calibrate(self) -> None:
+    """Fix per-dimension scales from the rows seen so far and switch the scope to int8 codes."""
+    rows = len(self)
+    self.scale = int8_scales(self.matrix[:rows][self.has_vec[:rows]])
+    self.codes[:rows] = quantize_int8(self.matrix[:rows], self.scale)
+    if not self.keep_float32:
+      self.keep_vectors = False
+      self.matrix = np.zeros((self.matrix.shape[0], 0), dtype=np.float32)
+
+  def _rescore(self, q: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    """float32 scores for rows of an int8 scope: exact if the originals are kept, else dequantized."""
+    if self.keep_vectors:
+      return self.matrix[rows] @ q
+    return self.codes[rows].astype(np.float32) @ (self.scale * q)
+
+  def _append_row(self, doc_id: int) -> int:
+    row = len(self.ids)
+    if row == self.matrix.shape[0]:
+      # Amortized O(1) appends: grow the contiguous buffers geometrically
+      cap = max(16, 2 * row)
+      matrix = np.zeros((cap, self._width()), dtype=np.float32)
+      matrix[:row] = self.matrix[:row]
+      self.matrix = matrix
+      self.has_vec = np.concatenate([self.has_vec, np.zeros(cap - row, dtype=bool)])
+      self.doc_len = np.concatenate([self.doc_len, np.zeros(cap - row, dtype=np.float32)])
+      codes = np.zeros((cap, self._code_width()), dtype=np.int8)
+      codes[:row] = self.codes[:row]
+      self.codes = codes
+    self.ids.append(doc_id)
+    self.meta.append({})
+    self.row_of[doc_id] = row
+    return row
+
+  def plan(self, filters: Optional[Union[Dict[str, str], str]]) -> Optional[_FilterPlan]:
+    """Resolve exact-match filters through the metadata index; None means no filter.
+
+    Raises:
+      ValueError: if filters is neither a dict nor a JSON object string.
+    """
+    if not filters:
+      return None
+    spec = json.loads(filters) if isinstance(filters, str) else filters
+    if not isinstance(spec, dict):
+      raise ValueError("filters must be a dict or a JSON object string")
+    if not spec:
+      return None
+    rows = self.meta_index.match({str(k): str(v) for k, v in spec.items()})
+    if not rows.size:
+      kind = "empty"
+    elif rows.size <= self.prefilter_selectivity * len(self):
+      kind = "prefilter"
+    else:
+      kind = "postfilter"
+    self.plans[kind] += 1
+    return _FilterPlan(kind, rows)
+
+  def dense(self, embedding: Any, n: int, plan: Optional[_FilterPlan], rerank: int = 0) -> List[Tuple[int, float]]:
+    """Top-n rows by cosine similarity.
+
+    IVF-PQ scopes with kept vectors and int8 scopes pick max(n, rerank) candidates from
+    the compressed representation and rescore them in float32.
+    """
+    if self.dim is None or not len(self) or (plan is not None and plan.kind == "empty"):
+      return []
+    q = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if q.size != self.dim:
+      raise ValueError(f"embedding has dimension {q.size}, collection expects {self.dim}")
+    qn = float(np.linalg.norm(q))
+    if qn == 0.0:
+      return []
+    q = q / qn
+    if plan is not None and plan.kind == "prefilter":
+      if self.scale is not None:
+        sims = self._rescore(q, plan.rows)
+      elif self.keep_vectors:
+        sims = self.matrix[plan.rows] @ q
+      else:
+        sims = self.ivf.score_rows(q, plan.rows)  # type: ignore[union-attr]
+      return _top(np.where(self.has_vec[plan.rows], sims, -np.inf), n, plan.rows)
+    rows = len(self)
+    ok = self.has_vec[:rows] if plan is None else (self.has_vec[:rows] & plan.mask(rows))
+    if self.scale is not None:
+      # Query in code space: score_i ~ sum_j code_ij * scale_j * q_j, requantized to int8
+      w = self.scale * q
+      coarse = int8_scores(self.codes[:rows], quantize_int8(w, np.float32(np.abs(w).max() / 127.0)))
+      cands = np.sort(np.array([r for r, _ in _top(np.where(ok, coarse, -np.inf), max(n, rerank))], dtype=np.int64))
+      return _top(self._rescore(q, cands), n, cands) if cands.size else []
+    if self.ivf is not None:
+      if not self.keep_vectors:
+        return [(r, s) for s, r in self.ivf.search(q, n, allowed=ok)]
+      cands = np.sort(np.array([r for _, r in self.ivf.search(q, max(n, rerank), allowed=ok)], dtype=np.int64))
+      return _top(self.matrix[cands] @ q, n, cands) if cands.size else []
+    if self.ann is not None:
+      # Rows whose vector was cleared stay in the graph as routing nodes; the mask hides them
+      return [(r, s) for s, r in self.ann.search(q, n, ef=max(self.ann.ef_search, n), allowed=ok)]
+    sims = self.matrix[:rows] @ q
+    return _top(np.where(ok, sims, -np.inf), n)
+
+  def sparse(self, text: str, n: int, plan: Optional[_FilterPlan]) -> List[Tuple[int, float]]:
+    if not text or not len(self) or (plan is not None and plan.kind == "empty"):
+      return []
+    if plan is not None and plan.kind == "prefilter":
+      scores = self.bm25.scores_for(text, plan.rows, self.doc_len)
+      return _top(np.where(scores > 0.0, scores, -np.inf), n, plan.rows)
+    scores = self.bm25.scores(text, len(self), self.doc_len)
+    ok = scores > 0.0 if plan is None else (scores > 0.0) & plan.mask(len(self))
+    return _top(np.where(ok, scores, -np.inf), n)
+
+
+@dataclass
+class _FilterPlan:
+  kind: str  # "prefilter": score only rows; "postfilter": full scan, then mask; "empty"
+  rows: np.ndarray  # sorted matching rows
+
+  def mask(self, n_rows: int) -> np.ndarray:
+    m = np.zeros(n_rows, dtype=bool)
+    m[self.rows] = True
+    return m
+
+
+def _top(scores: np.ndarray, n: int, rows: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+  """(row, score) for the n best finite scores, best first, ties by row.
+
+  scores[i] belongs to rows[i] when rows is given (sorted), else to row i.
+  """
+  finite = int(np.isfinite(scores).sum())
+  n = min(n, finite)
+  if n <= 0:
+    return []
+  idx = np.argpartition(-scores, n - 1)[:n] if n < scores.size else np.arange(scores.size)
+  idx = idx[np.isfinite(scores[idx])]
+  order = np.lexsort((idx, -scores[idx]))
+  ids = idx if rows is None else rows[idx]
+  return [(int(ids[i]), float(scores[idx[i]])) for i in order[:n]]
+
+
+class NumpyContextStore:
+  """In-process ContextStore backend: dense cosine search plus BM25, fused.
+
+  Notes:
+  - Each scope keeps its vectors as rows of one contiguous float32 matrix (normalized,
+    so cosine similarity is a single matrix-vector product) that grows geometrically.
+    Vectors of the wrong size (the facade's [0.0] placeholders) are stored as "no
+    embedding" and never returned by dense search.
+  - Text for BM25 comes from the metadata fields in text_fields.
+  - mode="hybrid" takes k * rerank_factor candidates from each retriever and fuses them
+    with reciprocal rank fusion (sum of weight / (rrf_k + rank)) or, with
+    fusion="weighted", a weighted sum of min-max normalized scores.
+  - filters are exact matches on metadata values (dict, or a JSON object string),
+    resolved through per-(key, value) posting lists maintained on upsert. When the
+    matching rows are at most prefilter_selectivity of the scope, only those rows are
+    scored (pre-filter); otherwise the full contiguous scan runs and non-matching rows
+    are masked out (post-filter), which is cheaper than a gather at low selectivity.
+  - index="hnsw" answers unfiltered and post-filtered dense queries from an HNSWIndex
+    built over the same matrix (index_params: m, ef_construction, ef_search); pre-filtered
+    queries stay exact since they only touch the matching rows.
+  - index="ivfpq" stores product-quantized codes in an IVFPQIndex (index_params: nlist,
+    m, nbits, nprobe, train_size, rerank). With rerank=True the float32 rows are kept too
+    and the top k * rerank_factor approximate candidates are rescored exactly; without
+    it the scope holds codes only (m code bytes plus 8 bytes of list bookkeeping per
+    vector once trained), but recall@10 then stays near 0.5 even at nprobe=64, so
+    codes-only is not a drop-in replacement for the flat index.
+  - A scope opened with {"quantization": "int8"} stores per-dimension-scaled int8 rows
+    (a quarter of float32) once its first calibrate_rows vectors have fixed the scales;
+    candidates are scored with int8 dot products and the top k * rerank_factor rescored
+    in float32, from the dequantized rows or, with keep_float32, the originals.
+  - Same add/search surface as VesperContextStore; thread-safe.
+  """
+
+  def __init__(self,
+               *,
+               dim: Optional[int] = None,
+               fusion: Fusion = "rrf",
+               text_fields: Sequence[str] = DEFAULT_TEXT_FIELDS,
+               prefilter_selectivity: float = 0.3,
+               index: Index = "flat",
+               index_params: Optional[Dict[str, Any]] = None) -> None:
+    if fusion not in ("rrf", "weighted"):
+      raise ValueError(f"unknown fusion {fusion!r}; expected 'rrf' or 'weighted'")
+    if index not in ("flat", "hnsw", "ivfpq"):
+      raise ValueError(f"unknown index {index!r}; expected 'flat', 'hnsw' or 'ivfpq'")
+    self._index = index
+    self._index_params = dict(index_params or {})
+    if not 0.0 <= prefilter_selectivity <= 1.0:
+      raise ValueError("prefilter_selectivity must be within [0, 1]")
+    self._prefilter_selectivity = prefilter_selectivity
+    self._dim = dim
+    self._fusion = fusion
+    self._text_fields = tuple(text_fields)
+    self._lock = threading.RLock()
+    self._scopes: Dict[str, _Collection] = {"default": self._new_collection()}
+    self._scope = "default"
+
+  def initialize(self, config: Dict[str, str]) -> None:
+    """Accepts the Vesper config keys; "dim" and "fusion" are honoured here."""
+    with self._lock:
+      if "fusion" in config:
+        if config["fusion"] not in ("rrf", "weighted"):
+          raise ValueError(f"unknown fusion {config['fusion']!r}")
+        self._fusion = config["fusion"]  # type: ignore[assignment]
+      if "dim" in config and not len(self._scopes[self._scope]):
+        self._dim = int(config["dim"])
+        self._scopes[self._scope] = self._new_collection()
+
+  def open_scope(self, name: str, schema_json: Optional[str] = None) -> None:
+    """Switch reads and writes to the named scope, creating it on first use.
+
+    schema_json may be a JSON object carrying scope settings (other keys are ignored):
+    "quantization" ("int8" or "none"), "keep_float32" (keep the originals for exact
+    rescoring) and "calibrate_rows" (vectors buffered in float32 before the int8 scales
+    are fixed).
+
+    Raises:
+      ValueError: on malformed settings, or settings that differ from an existing scope's.
+    """
+    opts = _scope_options(schema_json)
+    with self._lock:
+      col = self._scopes.get(name)
+      if col is None:
+        self._scopes[name] = self._new_collection(**opts)
+      elif opts and any(col.options[k] != v for k, v in opts.items()):
+        raise ValueError(f"scope {name!r} is already open with settings {col.options}")
+      self._scope = name
+
+  def _new_collection(self, **options: Any) -> _Collection:
+    return _Collection(self._dim, self._text_fields, self._prefilter_selectivity, self._index, self._index_params, **options)
+
+  def __len__(self) -> int:
+    with self._lock:
+      return len(self._scopes[self._scope])
+
+  def metrics(self) -> Dict[str, Any]:
+    """Per-scope document counts and how filtered searches were planned."""
+    with self._lock:
+      out: Dict[str, Any] = {}
+      for name, col in self._scopes.items():
+        out[name] = {"docs": len(col), "filter_plans": dict(col.plans), "vector_bytes": col.vector_bytes()}
+        if col.ann is not None:
+          out[name]["hnsw"] = col.ann.stats()
+        if col.ivf is not None:
+          out[name]["ivfpq"] = {"trained": col.ivf.trained, "exact_rerank": col.keep_vectors}
+        if col.quantization is not None:
+          out[name]["int8"] = {"calibrated": col.scale is not None, "exact_rerank": col.keep_float32}
+      return out
+
+  def add(self,
+          ids: Sequence[int],
+          vectors: Sequence[Union[Sequence[float], Any]],
+          metadata: Sequence[Dict[str, str]]) -> None:
+    """Upsert rows by id.
+
+    Raises:
+      ValueError: if the three sequences differ in length.
+    """
+    with self._lock:
+      self._scopes[self._scope].upsert(ids, vectors, metadata)
+
+  def search(self,
+             text: str = "",
+             embedding: Optional[Union[Sequence[float], Any]] = None,
+             *,
+             k: int = 10,
+             mode: Mode = "hybrid",
+             filters: Optional[Union[Dict[str, str], str]] = None,
+             rrf_k: float = 60.0,
+             dense_weight: float = 0.5,
+             sparse_weight: float = 0.5,
+             rerank_factor: int = 10) -> List[SearchResult]:
+    """Top-k rows for the query; ranks are 1-based, 0 when a retriever did not return the row.
+
+    Raises:
+      ValueError: on a malformed filter or an embedding of the wrong dimension.
+    """
+    with self._lock:
+      col = self._scopes[self._scope]
+      plan = col.plan(filters)
+      pool = max(k, k * max(1, rerank_factor)) if mode == "hybrid" else k
+      dense = col.dense(embedding, pool, plan, k * max(1, rerank_factor)) if embedding is not None and mode != "sparse" else []
+      sparse = col.sparse(text, pool, plan) if mode != "dense" else []
+      if mode == "dense":
+        fused = [(row, s) for row, s in dense]
+      elif mode == "sparse":
+        fused = [(row, s) for row, s in sparse]
+      elif self._fusion == "rrf":
+        fused = _rrf(dense, sparse, rrf_k, dense_weight, sparse_weight)
+      else:
+        fused = _weighted(dense, sparse, dense_weight, sparse_weight)
+      d_rank = {row: i + 1 for i, (row, _) in enumerate(dense)}
+      s_rank = {row: i + 1 for i, (row, _) in enumerate(sparse)}
+      d_score = dict(dense)
+      s_score = dict(sparse)
+      return [
+        SearchResult(
+          doc_id=col.ids[row],
+          score=float(score),
+          dense_score=float(d_score.get(row, 0.0)),
+          sparse_score=float(s_score.get(row, 0.0)),
+          dense_rank=d_rank.get(row, 0),
+          sparse_rank=s_rank.get(row, 0),
+          metadata=dict(col.meta[row]),
+        )
+        for row, score in fused[:k]
+      ]
+
+
+def _scope_options(schema_json: Optional[str]) -> Dict[str, Any]:
+  if not schema_json:
+    return {}
+  try:
+    spec = json.loads(schema_json)
+  except ValueError as e:
+    raise ValueError(f"schema_json is not valid JSON: {e}") from None
+  if not isinstance(spec, dict):
+    raise ValueError("schema_json must be a JSON object")
+  opts: Dict[str, Any] = {}
+  if "quantization" in spec:
+    opts["quantization"] = None if spec["quantization"] in (None, "none") else spec["quantization"]
+  if "keep_float32" in spec:
+    opts["keep_float32"] = bool(spec["keep_float32"])
+  if "calibrate_rows" in spec:
+    opts["calibrate_rows"] = int(spec["calibrate_rows"])
+  return opts
+
+
+def _rrf(dense: List[Tuple[int, float]], sparse: List[Tuple[int, float]], rrf_k: float, dw: float, sw: float) -> List[Tuple[int, float]]:
+  fused: Dict[int, float] = {}
+  for weight, ranked in ((dw, dense), (sw, sparse)):
+    for rank, (row, _) in enumerate(ranked, start=1):
+      fused[row] = fused.get(row, 0.0) + weight / (rrf_k + rank)
+  return sorted(fused.items(), key=lambda rs: (-rs[1], rs[0]))
+
+
+def _weighted(dense: List[Tuple[int, float]], sparse: List[Tuple[int, float]], dw: float, sw: float) -> List[Tuple[int, float]]:
+  fused: Dict[int, float] = {}
+  for weight, ranked in ((dw, dense), (sw, sparse)):
+    if not ranked:
+      continue
+    hi = ranked[0][1]
+    lo = ranked[-1][1]
+    span = hi - lo
+    for row, s in ranked:
+      fused[row] = fused.get(row, 0.0) + weight * ((s - lo) / span if span > 0 else 1.0)
+  return sorted(fused.items(), key=lambda rs: (-rs[1], rs[0]))
+
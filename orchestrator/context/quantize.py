@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import numpy as np
+
+# Rows widened per block in int8_scores; small enough to stay in cache
+_BLOCK_ROWS = 1024
+
+
+def int8_scales(x: np.ndarray) -> np.ndarray:
+  """Per-dimension symmetric scales mapping the observed absolute maximum to 127."""
+  absmax = np.abs(x).max(axis=0) if len(x) else np.zeros(x.shape[1], dtype=np.float32)
+  return np.maximum(absmax, 1e-12).astype(np.float32) / 127.0
+
+
+def quantize_int8(x: np.ndarray, scale: np.ndarray) -> np.ndarray:
+  """Round x / scale to int8; values beyond the calibrated range are clipped."""
+  return np.clip(np.rint(x / scale), -127, 127).astype(np.int8)
+
+
+def int8_scores(codes: np.ndarray, q_codes: np.ndarray) -> np.ndarray:
+  """Integer dot products of int8 rows with an int8 query, returned as float32.
+
+  Notes:
+  - Rows are widened to float32 one cache-sized block at a time and multiplied with
+    BLAS; every product and partial sum is an integer below 2**24 for dim <= 1040, so
+    the result equals int32 accumulation while reading a quarter of the float32 bytes.
+  """
+  n = codes.shape[0]
+  out = np.empty(n, dtype=np.float32)
+  q = q_codes.astype(np.float32)
+  buf = np.empty((min(n, _BLOCK_ROWS), codes.shape[1]), dtype=np.float32)
+  for start in range(0, n, _BLOCK_ROWS):
+    end = min(n, start + _BLOCK_ROWS)
+    block = buf[:end - start]
+    np.copyto(block, codes[start:end], casting="unsafe")
+    np.matmul(block, q, out=out[start:end])
+  return out
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import threading
+from typing import Any, Dict, List, Optional
+
+from orchestrator.schemas.types import AgentResult
+
+from .errors import BudgetExceededError, QueueFullError, TaskFailedError
+from .orchestrator import Orchestrator
+from .results import STATE_BUDGET_EXCEEDED, STATE_SUCCEEDED, TaskOutcome
+
+
+class AsyncOrchestrator:
+  """asyncio front end over Orchestrator.
+
+  Notes:
+  - Tasks run on the wrapped orchestrator's Scheduler and handler table; completion comes
+    from its results table and is delivered to the event loop via call_soon_threadsafe,
+    so no thread waits per task.
+  - A semaphore bounds in-flight tasks: submit() suspends once max_in_flight tasks are
+    outstanding and resumes as they complete. The submission itself (validation,
+    admission, journaling) runs in the loop's default executor.
+  - Coalesced duplicates (same idempotency key) each get their own future and slot; all
+    of them resolve when the shared task completes.
+  - Futures resolve with the validated AgentResult (None if the agent returned another
+    message type), raise BudgetExceededError when the task overran its timeoutMs, and
+    TaskFailedError once retries are exhausted or the task was dropped.
+  """
+
+  def __init__(self, orchestrator: Optional[Orchestrator] = None, *, max_in_flight: int = 1024) -> None:
+    if max_in_flight < 1:
+      raise ValueError("max_in_flight must be >= 1")
+    self._owns = orchestrator is None
+    self._orch = orchestrator or Orchestrator()
+    self._sem = asyncio.Semaphore(max_in_flight)
+    self._lock = threading.Lock()
+    # traceId -> one future per submitter; coalesced duplicates share a traceId
+    self._pending: Dict[str, List["asyncio.Future[Optional[AgentResult]]"]] = {}
+
+  @property
+  def orchestrator(self) -> Orchestrator:
+    return self._orch
+
+  @property
+  def in_flight(self) -> int:
+    with self._lock:
+      return sum(len(futs) for futs in self._pending.values())
+
+  async def submit(self, task: Dict[str, Any], *, priority: Optional[str] = None, tenant: str = "") -> "asyncio.Future[Optional[AgentResult]]":
+    """Submit a task once an in-flight slot is free and return a future for its result.
+
+    Raises:
+      ValueError: if the task fails schema validation (the slot is released).
+      QueueFullError: if the scheduler's admission policy rejected the task; carries
+        retry_after_s (the slot is released).
+    """
+    await self._sem.acquire()
+    loop = asyncio.get_running_loop()
+    fut: "asyncio.Future[Optional[AgentResult]]" = loop.create_future()
+    try:
+      # Admission may block (policy "block") and journaling may fsync; keep both off the loop
+      out = await loop.run_in_executor(None, functools.partial(self._orch.submit_task, task, priority=priority, tenant=tenant))
+    except BaseException:
+      self._sem.release()
+      raise
+    if not out.get("accepted"):
+      self._sem.release()
+      raise QueueFullError(f"taskId={out.get('taskId')} rejected ({out.get('reason')}): {out.get('error', '')}", retry_after_s=out.get("retryAfterMs", 0) / 1000.0)
+    trace_id = str(out["traceId"])
+    with self._lock:
+      futs = self._pending.setdefault(trace_id, [])
+      first = not futs
+      futs.append(fut)
+    fut.add_done_callback(lambda _f: self._sem.release())
+    if first:
+      # One callback per traceId resolves every submitter's future
+      self._orch.add_result_callback(trace_id, lambda outcome: self._on_done(loop, outcome))
+    return fut
+
+  async def run(self, task: Dict[str, Any], *, priority: Optional[str] = None, tenant: str = "") -> Optional[AgentResult]:
+    """Submit a task and wait for its result."""
+    fut = await self.submit(task, priority=priority, tenant=tenant)
+    return await fut
+
+  async def aclose(self) -> None:
+    """Cancel outstanding futures; shuts down the orchestrator if this instance created it."""
+    with self._lock:
+      pending = [fut for futs in self._pending.values() for fut in futs]
+      self._pending.clear()
+    for fut in pending:
+      fut.cancel()
+    if self._owns:
+      await asyncio.get_running_loop().run_in_executor(None, self._orch.shutdown)
+
+  async def __aenter__(self) -> "AsyncOrchestrator":
+    return self
+
+  async def __aexit__(self, *exc: Any) -> None:
+    await self.aclose()
+
+  def _on_done(self, loop: asyncio.AbstractEventLoop, outcome: TaskOutcome) -> None:
+    # Runs on a scheduler worker thread (or inline if the task had already finished)
+    with self._lock:
+      futs = self._pending.pop(outcome.trace_id, [])
+    if not futs:
+      return
+    try:
+      for fut in futs:
+        loop.call_soon_threadsafe(_resolve, fut, outcome)
+    except RuntimeError:
+      # Event loop already closed; nobody is waiting any more
+      pass
+
+
+def _resolve(fut: "asyncio.Future[Optional[AgentResult]]", outcome: TaskOutcome) -> None:
+  if fut.done():
+    return
+  if outcome.state == STATE_SUCCEEDED:
+    fut.set_result(outcome.result)
+  elif outcome.state == STATE_BUDGET_EXCEEDED:
+    fut.set_exception(BudgetExceededError(f"traceId={outcome.trace_id} exceeded its time budget"))
+  else:
+    fut.set_exception(TaskFailedError(f"traceId={outcome.trace_id} {outcome.state} after {outcome.attempts} attempt(s): {outcome.error}"))
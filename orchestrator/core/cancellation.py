@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+from .errors import BudgetExceededError
+
+
+class CancelToken:
+  """Cooperative cancellation signal with an optional absolute deadline (time.time()).
+
+  Agents poll cancelled/raise_if_cancelled between steps and cap blocking work (e.g.
+  sandbox wall time) by remaining_s(). The event is exposed for code that can wait on it.
+  """
+
+  def __init__(self, deadline: Optional[float] = None) -> None:
+    self.deadline = deadline
+    self._event = threading.Event()
+
+  @property
+  def event(self) -> threading.Event:
+    return self._event
+
+  def cancel(self) -> None:
+    self._event.set()
+
+  @property
+  def cancelled(self) -> bool:
+    return self._event.is_set() or (self.deadline is not None and time.time() >= self.deadline)
+
+  def remaining_s(self) -> Optional[float]:
+    """Seconds until the deadline (never negative), or None without a deadline."""
+    if self.deadline is None:
+      return None
+    return max(0.0, self.deadline - time.time())
+
+  def raise_if_cancelled(self) -> None:
+    """Raises BudgetExceededError once cancelled or past the deadline."""
+    if self._event.is_set():
+      raise BudgetExceededError("task cancelled")
+    if self.cancelled:
+      raise BudgetExceededError("task deadline exceeded")
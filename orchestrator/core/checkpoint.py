@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence
+
+# Record types; one JSON object per line
+OP_NODE = "node"
+OP_DONE = "done"
+
+
+def result_digest(result: Optional[Dict[str, Any]]) -> str:
+  """sha256 of the canonical JSON encoding of a stored result."""
+  raw = json.dumps(result, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+  return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class NodeState:
+  node: Dict[str, Any]  # WorkflowNode fields: trace_id, task, parent, priority, tenant, deps
+  outcome: Optional[str] = None  # None while pending
+  result: Optional[Dict[str, Any]] = None  # AgentResult as a dict, digest-verified
+
+
+@dataclass
+class WorkflowCheckpoint:
+  workflow_id: str
+  nodes: Dict[str, NodeState] = field(default_factory=dict)  # trace ID -> state, in record order
+
+  def pending(self) -> List[Dict[str, Any]]:
+    return [s.node for s in self.nodes.values() if s.outcome is None]
+
+
+class WorkflowCheckpoints:
+  """Incremental on-disk checkpoints of workflow DAGs, one JSON-lines file per workflow.
+
+  Notes:
+  - A workflow is checkpointed from the moment its root first emits newTasks. Records
+    are node (a task joined the workflow) and done (terminal outcome, the produced
+    AgentResult and its sha256 digest). A done record carries the nodes it spawned, so
+    a parent's output and its follow-ups become durable together.
+  - Every record is written and fsynced before the orchestrator acts on it.
+  - load() cuts off a torn final line (a crash mid-append; never acknowledged) so later
+    appends start on a fresh line, skips any other unparseable line and ignores results
+    whose digest does not match; those nodes count as pending and run again.
+  - A file is removed once every node in it is terminal.
+  """
+
+  def __init__(self, directory: str, *, fsync: bool = True) -> None:
+    self._dir = directory
+    self._fsync = fsync
+    os.makedirs(directory, exist_ok=True)
+    self._lock = threading.Lock()
+    self._workflow_of: Dict[str, str] = {}  # trace ID of a non-terminal node -> workflow ID
+    self._open: Dict[str, int] = {}  # workflow ID -> non-terminal node count
+    self._written = 0
+    for wf in self.workflow_ids():
+      for trace_id in (s.node["trace_id"] for s in self.load(wf).nodes.values() if s.outcome is None):
+        self._track(wf, trace_id)
+
+  def workflow_ids(self) -> List[str]:
+    """IDs of workflows with a checkpoint on disk, oldest first."""
+    paths = [os.path.join(self._dir, n) for n in os.listdir(self._dir) if n.endswith(".jsonl")]
+    paths.sort(key=os.path.getmtime)
+    return [os.path.basename(p)[:-len(".jsonl")] for p in paths]
+
+  def workflow_of(self, trace_id: str) -> Optional[str]:
+    with self._lock:
+      return self._workflow_of.get(trace_id)
+
+  def start(self, workflow_id: str, root: Dict[str, Any]) -> None:
+    """Begin checkpointing a workflow with its (already running) root node."""
+    with self._lock:
+      if workflow_id in self._open:
+        return
+      self._append(workflow_id, [{"op": OP_NODE, "node": root}])
+      self._track(workflow_id, root["trace_id"])
+
+  def record_done(self, trace_id: str, outcome: str, result: Optional[Dict[str, Any]] = None, *, children: Sequence[Dict[str, Any]] = ()) -> None:
+    """Record a node's terminal outcome and the nodes it spawned; no-op outside checkpointed workflows."""
+    with self._lock:
+      wf = self._workflow_of.get(trace_id)
+      if wf is None:
+        return
+      rec = {"op": OP_DONE, "trace_id": trace_id, "outcome": outcome, "result": result, "digest": result_digest(result)}
+      if children:
+        rec["children"] = list(children)
+      self._append(wf, [rec])
+      for child in children:
+        self._track(wf, child["trace_id"])
+      del self._workflow_of[trace_id]
+      self._open[wf] -= 1
+      if self._open[wf] == 0:
+        del self._open[wf]
+        os.remove(self._path(wf))
+
+  def load(self, workflow_id: str) -> WorkflowCheckpoint:
+    """Replay a workflow's checkpoint file.
+
+    Raises:
+      KeyError: if there is no checkpoint for the workflow.
+    """
+    cp = WorkflowCheckpoint(workflow_id=workflow_id)
+    with self._lock:
+      try:
+        f = open(self._path(workflow_id), "r+b")
+      except FileNotFoundError:
+        raise KeyError(workflow_id) from None
+      with f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+          # Torn tail from a crash mid-append: it was never acknowledged, and _append()
+          # would otherwise glue the next record onto it and lose that record too
+          f.truncate(complete)
+          f.flush()
+          if self._fsync:
+            os.fsync(f.fileno())
+    for raw in data[:complete].splitlines():
+      try:
+        rec = json.loads(raw)
+      except ValueError:
+        # A line mangled some other way; skip it, later records are still valid
+        continue
+      if rec.get("op") == OP_NODE:
+        cp.nodes.setdefault(rec["node"]["trace_id"], NodeState(node=rec["node"]))
+      elif rec.get("op") == OP_DONE:
+        state = cp.nodes.get(rec["trace_id"])
+        if state is None or rec.get("digest") != result_digest(rec.get("result")):
+          continue
+        state.outcome = rec["outcome"]
+        state.result = rec.get("result")
+        for child in rec.get("children") or []:
+          cp.nodes.setdefault(child["trace_id"], NodeState(node=child))
+    return cp
+
+  def metrics(self) -> Dict[str, Any]:
+    with self._lock:
+      return {"open_workflows": len(self._open), "open_nodes": len(self._workflow_of), "records_written": self._written}
+
+  def _track(self, workflow_id: str, trace_id: str) -> None:
+    if trace_id not in self._workflow_of:
+      self._workflow_of[trace_id] = workflow_id
+      self._open[workflow_id] = self._open.get(workflow_id, 0) + 1
+
+  def _path(self, workflow_id: str) -> str:
+    if not workflow_id or os.path.basename(workflow_id) != workflow_id:
+      raise KeyError(workflow_id)
+    return os.path.join(self._dir, f"{workflow_id}.jsonl")
+
+  def _append(self, workflow_id: str, records: List[Dict[str, Any]]) -> None:
+    with open(self._path(workflow_id), "a", encoding="utf-8") as f:
+      f.write("".join(json.dumps(r, separators=(",", ":"), sort_keys=True) + "\n" for r in records))
+      f.flush()
+      if self._fsync:
+        os.fsync(f.fileno())
+    self._written += len(records)
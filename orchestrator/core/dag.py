@@ -1,33 +1,154 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, List, Set
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
 
 
 @dataclass
 class Node:
   id: str
-  deps: Set[str] = field(default_factory=set)
+  deps: Set[str] = field(default_factory=set)  # unfinished dependencies
+  dependents: Set[str] = field(default_factory=set)  # reverse edges
 
 
 class DAG:
+  """Dependency graph of pending nodes with an incrementally maintained ready set.
+
+  Notes:
+  - Each node keeps its unfinished dependencies and its dependents (reverse edges), so
+    mark_done() and ready() cost O(out-degree) and O(ready) instead of O(nodes).
+  - Depending on a node that was already marked done is a satisfied edge; depending on
+    an unknown id creates a placeholder node for it (ready until marked done).
+  - add_node() rejects edges that would close a cycle; the check only walks nodes
+    downstream of the new node, so building a graph dependencies-first stays O(edges).
+  """
+
   def __init__(self) -> None:
     self._nodes: Dict[str, Node] = {}
+    self._ready: Dict[str, None] = {}  # insertion-ordered set
+    self._done: Set[str] = set()
+
+  def __len__(self) -> int:
+    return len(self._nodes)
+
+  def __contains__(self, node_id: object) -> bool:
+    return node_id in self._nodes
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self._nodes)
 
   def add_node(self, node_id: str, deps: List[str] | None = None) -> None:
-    if node_id not in self._nodes:
-      self._nodes[node_id] = Node(id=node_id)
-    if deps:
-      self._nodes[node_id].deps.update(deps)
-      for d in deps:
-        if d not in self._nodes:
-          self._nodes[d] = Node(id=d)
-
-  def mark_done(self, node_id: str) -> None:
-    if node_id in self._nodes:
-      del self._nodes[node_id]
-      for n in self._nodes.values():
-        n.deps.discard(node_id)
+    """Add a node (or more dependencies to an existing one).
+
+    Raises:
+      ValueError: if the new edges would create a cycle (including a self-dependency).
+    """
+    new_deps = [d for d in dict.fromkeys(deps or []) if d not in self._done]
+    node = self._nodes.get(node_id)
+    if node is not None and new_deps:
+      self._check_acyclic(node_id, new_deps)
+    elif node_id in new_deps:
+      raise ValueError(f"dependency cycle: {node_id} -> {node_id}")
+    if node is None:
+      node = self._nodes[node_id] = Node(id=node_id)
+      self._done.discard(node_id)
+      self._ready[node_id] = None
+    for d in new_deps:
+      if d in node.deps:
+        continue
+      dep = self._nodes.get(d)
+      if dep is None:
+        dep = self._nodes[d] = Node(id=d)
+        self._ready[d] = None
+      node.deps.add(d)
+      dep.dependents.add(node_id)
+    if node.deps:
+      self._ready.pop(node_id, None)
+
+  def mark_done(self, node_id: str) -> List[str]:
+    """Remove a finished node and return the dependents that just became ready."""
+    node = self._nodes.pop(node_id, None)
+    if node is None:
+      return []
+    self._ready.pop(node_id, None)
+    self._done.add(node_id)
+    for d in node.deps:
+      dep = self._nodes.get(d)
+      if dep is not None:
+        dep.dependents.discard(node_id)
+    newly_ready: List[str] = []
+    for child_id in node.dependents:
+      child = self._nodes[child_id]
+      child.deps.discard(node_id)
+      if not child.deps:
+        self._ready[child_id] = None
+        newly_ready.append(child_id)
+    return newly_ready
 
   def ready(self) -> List[str]:
-    return [n.id for n in self._nodes.values() if not n.deps]
+    """Pending nodes whose dependencies are all done, in the order they became ready."""
+    return list(self._ready)
+
+  def deps(self, node_id: str) -> Set[str]:
+    node = self._nodes.get(node_id)
+    return set(node.deps) if node is not None else set()
+
+  def dependents(self, node_id: str) -> Set[str]:
+    node = self._nodes.get(node_id)
+    return set(node.dependents) if node is not None else set()
+
+  def is_done(self, node_id: str) -> bool:
+    return node_id in self._done
+
+  def levels(self) -> List[List[str]]:
+    """Pending nodes grouped by topological level (level 0 is the ready set)."""
+    remaining = {nid: len(n.deps) for nid, n in self._nodes.items()}
+    level = [nid for nid, deg in remaining.items() if deg == 0]
+    out: List[List[str]] = []
+    while level:
+      out.append(level)
+      nxt: List[str] = []
+      for nid in level:
+        for child in self._nodes[nid].dependents:
+          remaining[child] -= 1
+          if remaining[child] == 0:
+            nxt.append(child)
+      level = nxt
+    return out
+
+  def critical_path(self, cost: Callable[[str], float], roots: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Longest cost-weighted path from each node to a sink, counting the node itself.
+
+    Only nodes downstream of roots (default: every pending node) are evaluated, in
+    O(nodes + edges) of that subgraph. Dispatching the ready node with the largest value
+    first starts long chains early and shortens the makespan.
+    """
+    memo: Dict[str, float] = {}
+    for root in list(roots) if roots is not None else list(self._nodes):
+      stack = [(root, False)]
+      while stack:
+        nid, expanded = stack.pop()
+        node = self._nodes.get(nid)
+        if node is None or nid in memo:
+          continue
+        if expanded:
+          memo[nid] = cost(nid) + max((memo[c] for c in node.dependents), default=0.0)
+        else:
+          stack.append((nid, True))
+          stack.extend((c, False) for c in node.dependents if c not in memo)
+    return memo
+
+  def _check_acyclic(self, node_id: str, new_deps: List[str]) -> None:
+    # A cycle appears iff a new dependency is node_id itself or downstream of it
+    targets = set(new_deps)
+    if node_id in targets:
+      raise ValueError(f"dependency cycle: {node_id} -> {node_id}")
+    seen = {node_id}
+    stack = [node_id]
+    while stack:
+      for child in self._nodes[stack.pop()].dependents:
+        if child in targets:
+          raise ValueError(f"dependency cycle: {node_id} depends on its dependent {child}")
+        if child not in seen:
+          seen.add(child)
+          stack.append(child)
@@ -6,3 +6,11 @@ class BudgetExceededError(Exception):
   pass
 
 
+class TaskFailedError(Exception):
+  pass
+
+
+class QueueFullError(Exception):
+  def __init__(self, message: str, *, retry_after_s: float) -> None:
+    super().__init__(message)
+    self.retry_after_s = retry_after_s
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import importlib
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Optional, Protocol
+
+from orchestrator.agents.base import TaskContext
+
+from .cancellation import CancelToken
+from .errors import BudgetExceededError
+
+# Agent.run(task, ctx); ctx is a TaskContext carrying the trace ID and cancel token
+AgentHandler = Callable[[Dict[str, Any], Optional[TaskContext]], Dict[str, Any]]
+
+
+@dataclass(frozen=True)
+class TaskEnvelope:
+  """Picklable unit of work shipped to an executor worker."""
+  trace_id: str
+  agent: str
+  agent_ref: str  # "module:Class" of an Agent with a no-arg constructor
+  task: Dict[str, Any]
+  deadline: Optional[float] = None  # absolute time.time(); workers rebuild a CancelToken from it
+
+
+@dataclass(frozen=True)
+class ResultEnvelope:
+  trace_id: str
+  result: Optional[Dict[str, Any]] = None
+  error: Optional[str] = None
+  duration_ms: int = 0
+
+
+class AgentExecutor(Protocol):
+  def execute(self, envelope: TaskEnvelope, handler: AgentHandler, ctx: Optional[TaskContext] = None) -> Dict[str, Any]: ...
+
+  def shutdown(self) -> None: ...
+
+
+def agent_ref_for(handler: AgentHandler) -> str:
+  """Return the "module:Class" reference of the agent behind a bound run() handler.
+
+  Raises:
+    ValueError: if the handler is not a bound method of an importable class.
+  """
+  owner = getattr(handler, "__self__", None)
+  if owner is None:
+    raise ValueError("handler must be a bound Agent.run method to run out of process")
+  cls = type(owner)
+  if "<locals>" in cls.__qualname__:
+    raise ValueError(f"agent class {cls.__qualname__} is not importable")
+  return f"{cls.__module__}:{cls.__qualname__}"
+
+
+# Per-process agent instances, reused across tasks so workers stay warm
+_worker_agents: Dict[str, Any] = {}
+
+
+def _load_agent(agent_ref: str) -> Any:
+  agent = _worker_agents.get(agent_ref)
+  if agent is None:
+    module_name, _, qualname = agent_ref.partition(":")
+    obj: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+      obj = getattr(obj, part)
+    agent = obj()
+    _worker_agents[agent_ref] = agent
+  return agent
+
+
+def _warm_worker(agent_refs: tuple[str, ...]) -> None:
+  for ref in agent_refs:
+    _load_agent(ref)
+
+
+def run_envelope(envelope: TaskEnvelope) -> ResultEnvelope:
+  """Worker entry point: run the agent and capture the result or error as data."""
+  start = time.perf_counter()
+  try:
+    ctx = TaskContext({"trace_id": envelope.trace_id, "cancel_token": CancelToken(envelope.deadline), "deadline": envelope.deadline})
+    result = _load_agent(envelope.agent_ref).run(envelope.task, ctx)
+    return ResultEnvelope(trace_id=envelope.trace_id, result=result, duration_ms=int((time.perf_counter() - start) * 1000))
+  except Exception as e:
+    return ResultEnvelope(trace_id=envelope.trace_id, error=f"{type(e).__name__}: {e}", duration_ms=int((time.perf_counter() - start) * 1000))
+
+
+class InlineExecutor:
+  """Runs the handler on the calling scheduler worker thread (the default)."""
+
+  def execute(self, envelope: TaskEnvelope, handler: AgentHandler, ctx: Optional[TaskContext] = None) -> Dict[str, Any]:
+    return handler(envelope.task, ctx)
+
+  def shutdown(self) -> None:
+    return
+
+
+class ProcessPoolAgentExecutor:
+  """Runs agents in a pool of long-lived worker processes.
+
+  Notes:
+  - The scheduler worker thread blocks on the child's result without holding the GIL,
+    so CPU-bound agents scale across cores.
+  - Workers are started with forkserver where available (spawn otherwise) and keep one
+    agent instance per class for the lifetime of the process.
+  - Errors raised in the child come back as data and are re-raised here as RuntimeError
+    so the scheduler's retry policy applies unchanged; a BudgetExceededError in the
+    child is chained as the cause, which keeps it terminal.
+  - The child sees the task deadline but not explicit cancel() calls on the parent token.
+  """
+
+  def __init__(self, *, max_workers: Optional[int] = None, warm_agent_refs: Iterable[str] = (), start_method: Optional[str] = None) -> None:
+    if start_method is None:
+      start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    self._pool = ProcessPoolExecutor(
+      max_workers=max_workers,
+      mp_context=multiprocessing.get_context(start_method),
+      initializer=_warm_worker,
+      initargs=(tuple(warm_agent_refs),),
+    )
+
+  def execute(self, envelope: TaskEnvelope, handler: AgentHandler, ctx: Optional[TaskContext] = None) -> Dict[str, Any]:
+    out: ResultEnvelope = self._pool.submit(run_envelope, envelope).result()
+    if out.error is not None:
+      cause = BudgetExceededError(out.error) if out.error.startswith(f"{BudgetExceededError.__name__}:") else None
+      raise RuntimeError(f"traceId={envelope.trace_id} agent {envelope.agent} failed in worker: {out.error}") from cause
+    return out.result or {}
+
+  def shutdown(self) -> None:
+    self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Generic, List, Mapping, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Default priority classes and their relative dispatch weights. An "interactive" class
+# receives 8 dispatches for every 1 "batch" dispatch while both have work queued.
+DEFAULT_PRIORITY_WEIGHTS: Dict[str, int] = {
+  "interactive": 8,
+  "normal": 4,
+  "batch": 1,
+}
+DEFAULT_PRIORITY = "normal"
+
+
+class _FifoLane(Generic[T]):
+  __slots__ = ("_q",)
+
+  def __init__(self) -> None:
+    self._q: Deque[T] = deque()
+
+  def __len__(self) -> int:
+    return len(self._q)
+
+  def push(self, item: T) -> None:
+    self._q.append(item)
+
+  def pop(self) -> T:
+    return self._q.popleft()
+
+  def pop_last(self) -> T:
+    return self._q.pop()
+
+
+class _KeyedLane(Generic[T]):
+  """Tenant lane ordered by a sort key (FIFO among equal keys)."""
+  __slots__ = ("_h", "_key", "_seq")
+
+  def __init__(self, key: Callable[[T], Any], seq: "itertools.count[int]") -> None:
+    self._h: List[Tuple[Any, int, T]] = []
+    self._key = key
+    self._seq = seq
+
+  def __len__(self) -> int:
+    return len(self._h)
+
+  def push(self, item: T) -> None:
+    heapq.heappush(self._h, (self._key(item), next(self._seq), item))
+
+  def pop(self) -> T:
+    return heapq.heappop(self._h)[2]
+
+  def pop_last(self) -> T:
+    # Least urgent entry; O(n) but only used for load shedding
+    i = max(range(len(self._h)), key=lambda j: self._h[j][:2])
+    entry = self._h[i]
+    last = self._h.pop()
+    if i < len(self._h):
+      self._h[i] = last
+      heapq.heapify(self._h)
+    return entry[2]
+
+
+class _Class(Generic[T]):
+  __slots__ = ("weight", "pass_", "tenants", "size")
+
+  def __init__(self, weight: int) -> None:
+    self.weight = weight
+    self.pass_ = 0.0
+    self.tenants: "OrderedDict[str, Any]" = OrderedDict()
+    self.size = 0
+
+
+class FairQueue(Generic[T]):
+  """Weighted fair queue over priority classes with round-robin tenants per class.
+
+  Notes:
+  - Classes are served by stride scheduling: each dispatch advances the class's pass by
+    1/weight and the non-empty class with the lowest pass is served next.
+  - A class that was idle re-enters at the current virtual time so it cannot bank credit.
+  - Within a class, tenants are served round-robin. Each tenant queue is FIFO, or ordered
+    by order_key (smallest first, FIFO among ties) when one is given, e.g. a deadline for
+    earliest-deadline-first dispatch.
+  - Not thread-safe; callers provide locking.
+  """
+
+  def __init__(self, weights: Optional[Mapping[str, int]] = None, *, order_key: Optional[Callable[[T], Any]] = None) -> None:
+    w = dict(weights or DEFAULT_PRIORITY_WEIGHTS)
+    if not w:
+      raise ValueError("at least one priority class is required")
+    for name, weight in w.items():
+      if int(weight) <= 0:
+        raise ValueError(f"priority class '{name}' weight must be positive")
+    self._classes: Dict[str, _Class[T]] = {name: _Class(int(weight)) for name, weight in w.items()}
+    self._vtime = 0.0
+    self._size = 0
+    self._order_key = order_key
+    self._seq = itertools.count()
+
+  def __len__(self) -> int:
+    return self._size
+
+  def has_class(self, name: str) -> bool:
+    return name in self._classes
+
+  def push(self, item: T, *, priority: str, tenant: str = "") -> None:
+    c = self._classes.get(priority)
+    if c is None:
+      raise ValueError(f"unknown priority class '{priority}'")
+    if c.size == 0:
+      c.pass_ = max(c.pass_, self._vtime)
+    q = c.tenants.get(tenant)
+    if q is None:
+      q = _KeyedLane(self._order_key, self._seq) if self._order_key is not None else _FifoLane()
+      c.tenants[tenant] = q
+    q.push(item)
+    c.size += 1
+    self._size += 1
+
+  def pop(self) -> Optional[Tuple[str, T]]:
+    """Remove and return (priority, item) for the next item to dispatch, or None if empty."""
+    best: Optional[str] = None
+    best_c: Optional[_Class[T]] = None
+    for name, c in self._classes.items():
+      if c.size and (best_c is None or c.pass_ < best_c.pass_):
+        best, best_c = name, c
+    if best is None or best_c is None:
+      return None
+    tenant, q = next(iter(best_c.tenants.items()))
+    item = q.pop()
+    if q:
+      best_c.tenants.move_to_end(tenant)
+    else:
+      del best_c.tenants[tenant]
+    best_c.size -= 1
+    self._size -= 1
+    self._vtime = best_c.pass_
+    best_c.pass_ += 1.0 / best_c.weight
+    return best, item
+
+  def lowest_weight(self) -> Optional[int]:
+    """Weight of the lowest-weight non-empty class, or None if empty."""
+    weights = [c.weight for c in self._classes.values() if c.size]
+    return min(weights) if weights else None
+
+  def pop_lowest(self) -> Optional[Tuple[str, T]]:
+    """Remove the newest (or least urgent, when ordered) item of the lowest-weight non-empty class."""
+    victim: Optional[str] = None
+    for name, c in self._classes.items():
+      if c.size and (victim is None or c.weight <= self._classes[victim].weight):
+        victim = name
+    if victim is None:
+      return None
+    c = self._classes[victim]
+    tenant, q = next(reversed(c.tenants.items()))
+    item = q.pop_last()
+    if not q:
+      del c.tenants[tenant]
+    c.size -= 1
+    self._size -= 1
+    return victim, item
+
+  def depths(self) -> Dict[str, int]:
+    return {name: c.size for name, c in self._classes.items()}
+
+  def weights(self) -> Dict[str, int]:
+    return {name: c.weight for name, c in self._classes.items()}
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Record types; one JSON object per line
+OP_ENQUEUE = "enqueue"
+OP_ATTEMPT = "attempt"
+OP_COMPLETE = "complete"
+
+
+class TaskJournal:
+  """Append-only write-ahead log of scheduler task state with group commit.
+
+  Notes:
+  - Records are JSON lines: enqueue (full task), attempt (retry count and next_at) and
+    complete (terminal outcome). Replaying them yields every task that was admitted but
+    never finished, with its retry state.
+  - Appends are buffered and written by a single flusher thread; every record that
+    arrives while a write+fsync is in progress shares the next fsync (group commit).
+    durable=True blocks the caller until its record is on disk.
+  - recover() tolerates a torn final line left by a crash mid-write and rewrites the log
+    with only the live tasks, so the file stays proportional to the backlog.
+  """
+
+  def __init__(self, path: str, *, fsync: bool = True) -> None:
+    self._path = path
+    self._fsync = fsync
+    d = os.path.dirname(os.path.abspath(path))
+    os.makedirs(d, exist_ok=True)
+    self._f = open(path, "a", encoding="utf-8")
+    self._cv = threading.Condition()
+    self._pending: List[str] = []
+    self._appended = 0  # sequence number of the last buffered record
+    self._synced = 0  # sequence number of the last record on disk
+    self._closed = False
+    self._error: Optional[BaseException] = None
+    self._commits = 0
+    self._commit_s_total = 0.0
+    self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="task-journal")
+    self._flusher.start()
+
+  @property
+  def path(self) -> str:
+    return self._path
+
+  def append(self, record: Dict[str, Any], *, durable: bool = False) -> None:
+    """Buffer a record; with durable=True wait until it has been written and fsynced.
+
+    Raises:
+      ValueError: if the journal is closed.
+      OSError: if a durable append's commit failed.
+    """
+    line = json.dumps(record, separators=(",", ":"), sort_keys=True)
+    with self._cv:
+      if self._closed:
+        raise ValueError("journal is closed")
+      self._pending.append(line)
+      self._appended += 1
+      seq = self._appended
+      self._cv.notify_all()
+      if durable:
+        self._cv.wait_for(lambda: self._synced >= seq or self._error is not None or self._closed)
+        if self._synced < seq:
+          raise OSError(f"journal commit failed: {self._error}")
+
+  def log_enqueue(self, task: Dict[str, Any], **fields: Any) -> None:
+    self.append({"op": OP_ENQUEUE, "task": task, **fields}, durable=True)
+
+  def log_attempt(self, trace_id: str, *, attempts: int, runs: int, next_at: float) -> None:
+    self.append({"op": OP_ATTEMPT, "trace_id": trace_id, "attempts": attempts, "runs": runs, "next_at": next_at})
+
+  def log_complete(self, trace_id: str, outcome: str) -> None:
+    self.append({"op": OP_COMPLETE, "trace_id": trace_id, "outcome": outcome})
+
+  def sync(self) -> None:
+    """Block until every record appended so far is on disk."""
+    with self._cv:
+      seq = self._appended
+      self._cv.wait_for(lambda: self._synced >= seq or self._error is not None or self._closed)
+
+  def recover(self) -> List[Dict[str, Any]]:
+    """Replay the log and return the enqueue records of unfinished tasks, oldest first.
+
+    Each record carries the latest "attempts", "runs" and "next_at" seen for the task.
+    The log is compacted to just those records; appends wait until that is done.
+    """
+    with self._cv:
+      self._cv.wait_for(lambda: (not self._pending and self._synced >= self._appended) or self._error is not None)
+      live: Dict[str, Dict[str, Any]] = {}
+      with open(self._path, "r", encoding="utf-8") as f:
+        for raw in f:
+          try:
+            rec = json.loads(raw)
+          except ValueError:
+            # Torn tail from a crash mid-append; nothing after it was acknowledged
+            break
+          op = rec.get("op")
+          trace_id = rec.get("trace_id")
+          if op == OP_ENQUEUE:
+            live[trace_id] = rec
+          elif op == OP_ATTEMPT and trace_id in live:
+            live[trace_id].update(attempts=rec["attempts"], runs=rec["runs"], next_at=rec["next_at"])
+          elif op == OP_COMPLETE:
+            live.pop(trace_id, None)
+      records = list(live.values())
+      self._rewrite(records)
+    return records
+
+  def close(self) -> None:
+    """Flush outstanding records and stop the flusher thread."""
+    with self._cv:
+      if self._closed:
+        return
+      seq = self._appended
+      self._cv.wait_for(lambda: self._synced >= seq or self._error is not None)
+      self._closed = True
+      self._cv.notify_all()
+    self._flusher.join(timeout=5.0)
+    self._f.close()
+
+  def metrics(self) -> Dict[str, Any]:
+    with self._cv:
+      return {
+        "appended": self._appended,
+        "synced": self._synced,
+        "commits": self._commits,
+        "records_per_commit": self._synced / self._commits if self._commits else 0.0,
+        "commit_ms_avg": (self._commit_s_total / self._commits) * 1000.0 if self._commits else 0.0,
+      }
+
+  def _rewrite(self, records: List[Dict[str, Any]]) -> None:
+    # Caller holds self._cv with nothing buffered, so the flusher is idle during the swap
+    tmp = self._path + ".compact"
+    with open(tmp, "w", encoding="utf-8") as f:
+      for rec in records:
+        f.write(json.dumps(rec, separators=(",", ":"), sort_keys=True) + "\n")
+      f.flush()
+      if self._fsync:
+        os.fsync(f.fileno())
+    self._f.close()
+    os.replace(tmp, self._path)
+    self._f = open(self._path, "a", encoding="utf-8")
+
+  def _flush_loop(self) -> None:
+    while True:
+      with self._cv:
+        self._cv.wait_for(lambda: bool(self._pending) or self._closed)
+        if not self._pending and self._closed:
+          return
+        batch = self._pending
+        self._pending = []
+        seq = self._appended
+        f = self._f
+      start = time.perf_counter()
+      try:
+        f.write("\n".join(batch) + "\n")
+        f.flush()
+        if self._fsync:
+          os.fsync(f.fileno())
+      except BaseException as e:
+        with self._cv:
+          self._error = e
+          self._cv.notify_all()
+        return
+      with self._cv:
+        self._synced = seq
+        self._commits += 1
+        self._commit_s_total += time.perf_counter() - start
+        self._cv.notify_all()
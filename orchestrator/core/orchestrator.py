@@ -1,23 +1,62 @@
 from __future__ import annotations
 
-from typing import Any, Dict, Optional, cast
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, cast
+import threading
 import time
+import uuid
 
 from orchestrator.schemas.validators import validate_agent_task, validate_agent_result
-from .scheduler import Scheduler, ScheduledTask
-from .registry import AgentRegistry
+from orchestrator.schemas.types import AgentResult
+from .scheduler import ADMISSION_BLOCK, ORDERING_FIFO, OUTCOME_DROPPED, OUTCOME_FAILED, OUTCOME_SUCCEEDED, Scheduler, ScheduledTask
+from .errors import BudgetExceededError, QueueFullError
+from .results import STATE_PENDING, OutcomeCallback, ResultsTable, TaskOutcome
+from .registry import ROUTING_LEAST_LOADED, AgentListener, AgentRegistry
+from .fair_queue import DEFAULT_PRIORITY
+from .journal import TaskJournal
+from .checkpoint import WorkflowCheckpoints
+from .workflow import WorkflowNode, WorkflowTracker
+from .executors import AgentExecutor, InlineExecutor, ProcessPoolAgentExecutor, TaskEnvelope, agent_ref_for
 from orchestrator.agents.codegen import CodeGenAgent
 from orchestrator.agents.test_agent import TestAgent
 from orchestrator.agents.static_analysis import StaticAnalysisAgent
 from orchestrator.agents.debug_agent import DebugAgent
-from orchestrator.context.context_store import ContextStore
+from orchestrator.agents.base import TaskContext
+from orchestrator.context.context_store import ContextBatch, ContextStore
+from orchestrator.context.idempotency import make_idempotency_key
 from orchestrator.context.models import CodeDocument
 from orchestrator.obs.redaction import sanitize_text, sanitize_artifact
 
 
+# Default priority class per agent when the caller does not pass one: interactive agents
+# must not queue behind bulk analysis scans.
+DEFAULT_AGENT_PRIORITY: Dict[str, str] = {
+  "CodeGenAgent": "interactive",
+  "DebugAgent": "interactive",
+  "TestAgent": "normal",
+  "StaticAnalysisAgent": "batch",
+}
+
+
 class Orchestrator:
-  def __init__(self) -> None:
-    self._registry = AgentRegistry()
+  def __init__(self,
+               *,
+               result_retention: int = 10000,
+               result_ttl_s: float = 3600.0,
+               queue_capacity: Optional[int] = None,
+               admission: str = ADMISSION_BLOCK,
+               ordering: str = ORDERING_FIFO,
+               idempotency_ttl_s: float = 300.0,
+               derive_idempotency_keys: bool = False,
+               journal_path: Optional[str] = None,
+               max_fanout: int = 8,
+               checkpoint_dir: Optional[str] = None,
+               routing: str = ROUTING_LEAST_LOADED,
+               affinity: bool = False) -> None:
+    # routing="least_expected" picks agent instances by measured service time
+    self._registry = AgentRegistry(routing=routing)
+    # With affinity, tasks for the same payload.target stick to one agent instance
+    self._affinity = affinity
     # seed default agents for routing demo
     self._registry.register("CodeGenAgent", ["codegen"]) 
     self._registry.register("TestAgent", ["testgen", "testexec"]) 
@@ -29,49 +68,344 @@ class Orchestrator:
       "StaticAnalysisAgent": StaticAnalysisAgent().run,
       "DebugAgent": DebugAgent().run,
     }
-    self._scheduler = Scheduler(max_concurrency=2)
-    self._scheduler.start(self._handle_scheduled, router=self._route_agent)
+    # Agents not listed here run inline on the scheduler worker thread
+    self._inline_executor = InlineExecutor()
+    self._agent_executors: Dict[str, AgentExecutor] = {}
+    self._agent_refs: Dict[str, str] = {}
+    # With a journal path, queued and retrying tasks survive a restart
+    self._journal = TaskJournal(journal_path) if journal_path else None
+    self._scheduler = Scheduler(max_concurrency=2,
+                                capacity=queue_capacity,
+                                admission=admission,
+                                ordering=ordering,
+                                # A coalesced submitter reads the shared outcome from the results table
+                                idempotency_ttl_s=min(idempotency_ttl_s, result_ttl_s),
+                                journal=self._journal)
+    self._derive_idempotency_keys = derive_idempotency_keys
+    # Sandboxed test execution runs up to SandboxPolicy.wall_time_s; keep it off the
+    # default pool so it cannot starve the fast agents.
+    self._scheduler.configure_pool("sandbox", max_concurrency=2, agents=["TestAgent"])
+    self._results = ResultsTable(max_entries=result_retention, ttl_s=result_ttl_s)
+    self._completion_listeners: List[Callable[[str, str, Optional[AgentResult], Optional[BaseException]], None]] = []
+    self._listeners_lock = threading.Lock()
+    self._recovered = 0
+    # Follow-up tasks emitted in results (newTasks) wait here until their dependencies succeed
+    self._workflows = WorkflowTracker(max_fanout=max_fanout)
+    # With a checkpoint directory, workflows interrupted by a crash can be resumed by ID
+    self._checkpoints = WorkflowCheckpoints(checkpoint_dir) if checkpoint_dir else None
     self._ctx: Optional[ContextStore] = None
+    # Workers start in start(), once the caller has configured agents, pools and stores
+    self._started = False
+    self._start_lock = threading.Lock()
+
+  def start(self) -> None:
+    """Re-queue tasks recovered from the journal and start the scheduler workers.
+
+    Call after configuring agents, executors, pools and the context store, so recovered
+    tasks never run against a half-configured orchestrator. submit_task() and
+    resume_workflow() call it on first use; later calls do nothing.
+    """
+    with self._start_lock:
+      if self._started:
+        return
+      self._started = True
+      for item in self._scheduler.recover():
+        self._results.track(item.trace_id, task_id=str(item.task.get("id", "")), agent=item.agent or "")
+        if item.agent:
+          # Counted like a fresh routing decision; _on_task_done() releases it
+          self._registry.begin(item.agent)
+        self._recovered += 1
+      self._scheduler.start(self._handle_scheduled, router=self._route_agent, on_done=self._on_task_done, unroute=self._registry.end)
+
+  def submit_task(self, task: Dict[str, Any], *, priority: Optional[str] = None, tenant: str = "") -> Dict[str, Any]:
+    """Validate and queue a task.
 
-  def submit_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+    Tasks sharing constraints.idempotencyKey (or, with derive_idempotency_keys, the same
+    agent and payload) are coalesced: only one runs and every submitter gets its traceId,
+    with "coalesced": True on the duplicates.
+    """
     # Validate schema first; raises ValueError on failure
     validated = validate_agent_task(task)
+    self.start()
+    if priority is None:
+      priority = DEFAULT_AGENT_PRIORITY.get(validated.agent, DEFAULT_PRIORITY)
     max_attempts = 3
     budget_ms = None
+    deadline = None
     c = validated.constraints
     if c and c.timeoutMs is not None:
+      # timeoutMs bounds each attempt and, as an absolute deadline, the task as a whole
       budget_ms = int(c.timeoutMs)
-    trace_id = self._scheduler.enqueue(task, max_attempts=max_attempts, budget_ms=budget_ms)
-    return {"accepted": True, "taskId": validated.id, "agent": validated.agent, "traceId": trace_id}
+      deadline = time.time() + budget_ms / 1000.0
+    idem_key = None
+    if c and c.idempotencyKey:
+      idem_key = make_idempotency_key(validated.agent, {"idempotencyKey": c.idempotencyKey})
+    elif self._derive_idempotency_keys:
+      idem_key = make_idempotency_key(validated.agent, {"payload": validated.payload})
+    # Track before enqueueing so a fast completion cannot race ahead of the results entry
+    trace_id = str(uuid.uuid4())
+    self._results.track(trace_id, task_id=validated.id, agent=validated.agent)
+    try:
+      enqueued = self._scheduler.enqueue(task, max_attempts=max_attempts, budget_ms=budget_ms, priority=priority, tenant=tenant, trace_id=trace_id, deadline=deadline, idempotency_key=idem_key)
+      if enqueued != trace_id and idem_key is not None and self._results.get(enqueued) is None:
+        # The shared outcome was already evicted from the results table; run it again
+        self._scheduler.forget_idempotency_key(idem_key)
+        enqueued = self._scheduler.enqueue(task, max_attempts=max_attempts, budget_ms=budget_ms, priority=priority, tenant=tenant, trace_id=trace_id, deadline=deadline, idempotency_key=idem_key)
+    except QueueFullError as e:
+      self._results.forget(trace_id)
+      return {"accepted": False, "taskId": validated.id, "agent": validated.agent, "reason": "queue_full", "error": str(e), "retryAfterMs": int(e.retry_after_s * 1000)}
+    except Exception:
+      self._results.forget(trace_id)
+      raise
+    if enqueued != trace_id:
+      self._results.forget(trace_id)
+      return {"accepted": True, "taskId": validated.id, "agent": validated.agent, "traceId": enqueued, "priority": priority, "coalesced": True}
+    return {"accepted": True, "taskId": validated.id, "agent": validated.agent, "traceId": trace_id, "priority": priority, "coalesced": False}
 
   def handle_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
     validated = validate_agent_result(result)
     return {"ok": True, "resultId": validated.id, "agent": validated.agent}
 
-  def _handle_scheduled(self, item: ScheduledTask) -> None:
+  def add_completion_listener(self, fn: Callable[[str, str, Optional[AgentResult], Optional[BaseException]], None]) -> None:
+    """Register fn(trace_id, outcome, result, error), called once per task on a worker thread."""
+    with self._listeners_lock:
+      self._completion_listeners.append(fn)
+
+  def get_result(self, trace_id: str) -> Optional[TaskOutcome]:
+    """Return the task's outcome (state "pending" while queued/running), or None if unknown or evicted."""
+    return self._results.get(trace_id)
+
+  def result_future(self, trace_id: str) -> "Future[TaskOutcome]":
+    """Return a concurrent.futures.Future resolved with the task's terminal TaskOutcome.
+
+    Raises:
+      KeyError: if the trace ID is unknown or its outcome was already evicted.
+    """
+    return self._results.future(trace_id)
+
+  def add_result_callback(self, trace_id: str, fn: OutcomeCallback) -> None:
+    """Call fn(outcome) when the task is terminal (immediately if it already is).
+
+    Raises:
+      KeyError: if the trace ID is unknown or its outcome was already evicted.
+    """
+    self._results.add_done_callback(trace_id, fn)
+
+  def resumable_workflows(self) -> List[str]:
+    """IDs of checkpointed workflows that have not finished (empty without checkpoint_dir)."""
+    return self._checkpoints.workflow_ids() if self._checkpoints is not None else []
+
+  def resume_workflow(self, workflow_id: str) -> Dict[str, Any]:
+    """Continue a checkpointed workflow after a restart, reusing finished nodes' outputs.
+
+    Nodes that reached a terminal state before the crash are not run again; their stored
+    outcome and AgentResult are served from the results table under the original trace
+    IDs. Pending nodes are dispatched as their dependencies allow, except those already
+    queued from the task journal; nodes behind a failed dependency are dropped.
+
+    Raises:
+      ValueError: if the orchestrator has no checkpoint_dir.
+      KeyError: if there is no checkpoint for the workflow.
+    """
+    if self._checkpoints is None:
+      raise ValueError("workflow checkpoints are not enabled (checkpoint_dir)")
+    self.start()
+    cp = self._checkpoints.load(workflow_id)
+    states: Dict[str, Optional[str]] = {}  # trace ID -> terminal outcome, None while pending
+    running: set[str] = set()
+    reused = 0
+    for trace_id, st in cp.nodes.items():
+      task = st.node["task"]
+      current = self._results.get(trace_id)
+      if current is not None:
+        # Still queued from the journal, or finished since the restart
+        if current.state == STATE_PENDING:
+          running.add(trace_id)
+        states[trace_id] = None if current.state == STATE_PENDING else current.state
+        continue
+      states[trace_id] = st.outcome
+      self._results.track(trace_id, task_id=str(task.get("id", "")), agent=str(task.get("agent", "")))
+      if st.outcome is not None:
+        result = validate_agent_result(st.result) if st.result else None
+        self._results.complete(trace_id, st.outcome, result=result, error=None if st.outcome == OUTCOME_SUCCEEDED else "restored from checkpoint")
+        reused += 1
+    blocked: set[str] = set()
+    changed = True
+    while changed:
+      changed = False
+      for trace_id, st in cp.nodes.items():
+        if states[trace_id] is None and trace_id not in blocked and trace_id not in running:
+          if any(states.get(d) not in (None, OUTCOME_SUCCEEDED) or d in blocked for d in st.node.get("deps") or []):
+            blocked.add(trace_id)
+            changed = True
+    nodes = [WorkflowNode.from_record(n) for n in cp.pending() if states[n["trace_id"]] is None and n["trace_id"] not in blocked]
+    for node in nodes:
+      # Finished dependencies are satisfied (blocked ones were excluded above)
+      node.deps = [d for d in node.deps if states.get(d) is None]
+    released = self._workflows.restore(nodes, running=running)
+    cancelled: List[WorkflowNode] = []
+    for trace_id in blocked:
+      self._complete_node(trace_id, OUTCOME_DROPPED, "a dependency did not succeed")
+    for trace_id in running:
+      # A journal-recovered node may have finished before restore() registered it
+      outcome = self._results.get(trace_id)
+      if outcome is not None and outcome.state != STATE_PENDING:
+        more, dropped = self._workflows.on_done(trace_id, outcome.state == OUTCOME_SUCCEEDED)
+        released.extend(more)
+        cancelled.extend(dropped)
+    self._dispatch_workflow(released, cancelled)
+    return {"workflowId": workflow_id, "reused": reused, "resumed": len(nodes), "dropped": len(blocked)}
+
+  def _on_task_done(self, item: ScheduledTask, outcome: str, value: Any) -> None:
+    if item.agent:
+      # Every terminal outcome (ran, dropped, shed, expired while queued) ends the load
+      # counted when the task was routed
+      self._registry.end(item.agent)
+    result = value if isinstance(value, AgentResult) else None
+    error = value if isinstance(value, BaseException) else None
+    workflow_id = self._workflow_id(item.trace_id)
+    released, cancelled = self._workflows.on_done(item.trace_id, outcome == OUTCOME_SUCCEEDED)
+    children: List[WorkflowNode] = []
+    if outcome == OUTCOME_SUCCEEDED and result is not None and result.payload.get("newTasks"):
+      children, runnable = self._spawn_new_tasks(item, workflow_id, result)
+      released = released + runnable
+    if self._checkpoints is not None:
+      # Durable before anyone sees the outcome or a follow-up starts
+      self._checkpoint_done(item, workflow_id, outcome, result, children)
+    self._results.complete(item.trace_id, outcome, result=result, error=str(error) if error is not None else None, attempts=item.runs)
+    self._notify_listeners(item.trace_id, outcome, result, error)
+    self._dispatch_workflow(released, cancelled)
+
+  def _workflow_id(self, trace_id: str) -> str:
+    workflow_id = self._workflows.workflow_of(trace_id)
+    if workflow_id == trace_id and self._checkpoints is not None:
+      # Journal-recovered nodes of a workflow that was not resumed yet
+      workflow_id = self._checkpoints.workflow_of(trace_id) or trace_id
+    return workflow_id
+
+  def _checkpoint_done(self, item: ScheduledTask, workflow_id: str, outcome: str, result: Optional[AgentResult], children: List[WorkflowNode]) -> None:
+    assert self._checkpoints is not None
+    if children and workflow_id == item.trace_id:
+      root = WorkflowNode(trace_id=item.trace_id, task=item.task, workflow_id=workflow_id, parent="", priority=item.priority, tenant=item.tenant)
+      self._checkpoints.start(workflow_id, root.record())
+    dumped = None
+    if result is not None:
+      dumped = result.model_dump() if hasattr(result, "model_dump") else result.dict()
+    self._checkpoints.record_done(item.trace_id, outcome, dumped, children=[c.record() for c in children])
+
+  def _complete_node(self, trace_id: str, outcome: str, error: str) -> None:
+    if self._checkpoints is not None:
+      self._checkpoints.record_done(trace_id, outcome)
+    self._results.complete(trace_id, outcome, error=error)
+
+  def _notify_listeners(self, trace_id: str, outcome: str, result: Optional[AgentResult], error: Optional[BaseException]) -> None:
+    with self._listeners_lock:
+      listeners = list(self._completion_listeners)
+    for fn in listeners:
+      try:
+        fn(trace_id, outcome, result, error)
+      except Exception:
+        # Listeners are isolated from each other and from the scheduler
+        pass
+
+  def _spawn_new_tasks(self, item: ScheduledTask, workflow_id: str, result: AgentResult) -> Tuple[List[WorkflowNode], List[WorkflowNode]]:
+    """Turn a result's newTasks into workflow nodes; returns (all nodes, those runnable now).
+
+    Each follow-up gets its own traceId (tracked in the results table right away) and a
+    task id of "<parent task id>/<newTask id or index>". If any follow-up is invalid,
+    none of them run and all are reported as failed.
+    """
+    parent_task_id = str(item.task.get("id", ""))
+    refs: List[Dict[str, Any]] = [r for r in result.payload.get("newTasks") or [] if isinstance(r, dict)]
+    trace_by_ref: Dict[str, str] = {}
+    for i, ref in enumerate(refs):
+      trace_by_ref[str(ref.get("id") or i)] = str(uuid.uuid4())
+    nodes: List[WorkflowNode] = []
+    for i, ref in enumerate(refs):
+      ref_id = str(ref.get("id") or i)
+      agent = str(ref.get("agent", ""))
+      task = {"type": "AgentTask", "id": f"{parent_task_id}/{ref_id}", "parentId": parent_task_id, "agent": agent, "payload": ref.get("payload") or {}}
+      deps = [trace_by_ref.get(str(d), str(d)) for d in ref.get("dependsOn") or []]
+      nodes.append(WorkflowNode(trace_id=trace_by_ref[ref_id], task=task, workflow_id=workflow_id, parent=item.trace_id, priority=DEFAULT_AGENT_PRIORITY.get(agent, DEFAULT_PRIORITY), tenant=item.tenant, deps=deps))
+    for node in nodes:
+      self._results.track(node.trace_id, task_id=node.task["id"], agent=node.task["agent"])
+    try:
+      for node in nodes:
+        validate_agent_task(node.task)
+      return nodes, self._workflows.add_children(item.trace_id, nodes)
+    except ValueError as e:
+      for node in nodes:
+        self._results.complete(node.trace_id, OUTCOME_FAILED, error=f"invalid newTasks from traceId={item.trace_id}: {e}")
+      return [], []
+
+  def _dispatch_workflow(self, released: List[WorkflowNode], cancelled: List[WorkflowNode]) -> None:
+    pending = list(released)
+    while pending or cancelled:
+      for node in cancelled:
+        self._complete_node(node.trace_id, OUTCOME_DROPPED, "a dependency did not succeed")
+      cancelled = []
+      while pending:
+        node = pending.pop()
+        try:
+          self._scheduler.enqueue(node.task, max_attempts=3, priority=node.priority, tenant=node.tenant, trace_id=node.trace_id, rank=node.rank)
+        except (QueueFullError, ValueError) as e:
+          self._complete_node(node.trace_id, OUTCOME_DROPPED, str(e))
+          more, dropped = self._workflows.on_done(node.trace_id, False)
+          pending.extend(more)
+          cancelled.extend(dropped)
+
+  def _handle_scheduled(self, item: ScheduledTask) -> Optional[AgentResult]:
     # Placeholder dispatch; in Task 11 we would route to agents by type
     # For now we only validate again to simulate guarded processing
     try:
       validate_agent_task(item.task)
-      agent = item.agent or self._route_agent(item.task)
+      if not item.agent:
+        # Nobody was available at enqueue; route now so _on_task_done() releases it
+        item.agent = self._route_agent(item.task)
+      agent = item.agent
       handler = self._agent_handlers.get(agent, self._handle_noop)
-      result: Dict[str, Any] = handler(item.task)
+      executor = self._agent_executors.get(agent, self._inline_executor)
+      envelope = TaskEnvelope(trace_id=item.trace_id, agent=agent, agent_ref=self._agent_refs.get(agent, ""), task=item.task, deadline=item.deadline)
+      ctx = TaskContext({"trace_id": item.trace_id, "cancel_token": item.cancel, "deadline": item.deadline})
+      started = time.perf_counter()
+      try:
+        result: Dict[str, Any] = executor.execute(envelope, handler, ctx)
+      finally:
+        # Feeds latency-aware routing and the per-agent estimates behind critical-path ranks
+        elapsed = time.perf_counter() - started
+        self._registry.record_service(agent, elapsed, wait_s=item.wait_s)
+        self._workflows.estimates.observe(agent, elapsed)
       # Validate and accept AgentResult shape
       if result.get("type") == "AgentResult":
-        validate_agent_result(result)
+        validated = validate_agent_result(result)
         self.apply_agent_result(result)
+        return validated
+      return None
+    except BudgetExceededError:
+      # Deadline/cancellation is terminal; keep the type so the scheduler does not retry
+      raise
     except Exception as e:
       # Surface validation with trace ID
       raise ValueError(f"traceId={item.trace_id} validation failed: {e}")
 
   def _route_agent(self, task: Dict[str, Any]) -> str:
+    """Pick the agent for a task and count it against that agent's load right away.
+
+    Routing happens at enqueue, long before dispatch, so the load has to be counted here
+    for a burst to spread; the scheduler's unroute hook or _on_task_done() releases it.
+    """
     agent = task.get("agent", "")
     if agent:
-      info = self._registry.get(agent)
-      if info is None or info.status == "down" or (info.last_heartbeat and (time.time() - info.last_heartbeat) > 60):
+      if not self._registry.is_active(agent):
         raise ValueError(f"Requested agent '{agent}' not available")
-      return agent
-    return self._registry.select_for("")
+    else:
+      target = (task.get("payload") or {}).get("target")
+      if self._affinity and isinstance(target, str) and target:
+        agent = self._registry.select_affine(target)
+      agent = agent or self._registry.select_for("")
+    if agent:
+      self._registry.begin(agent)
+    return agent
 
   # --- Agent registry operations ---
   def register_agent(self, name: str, capabilities: list[str]) -> None:
@@ -80,12 +414,76 @@ class Orchestrator:
   def update_agent(self, name: str, *, status: str | None = None, load: int | None = None) -> None:
     self._registry.update_status(name, status=status, load=load)
 
+  def add_agent_listener(self, fn: AgentListener) -> None:
+    """Register fn(agent_name, event), called once when an agent's heartbeat lapses ("stale") or resumes ("alive")."""
+    self._registry.add_listener(fn)
+
+  def configure_pool(self,
+                     name: str,
+                     *,
+                     max_concurrency: int,
+                     agents: Iterable[str] = (),
+                     capabilities: Iterable[str] = ()) -> None:
+    """Create or resize a scheduler pool for the given agents and/or capabilities.
+
+    Capabilities are resolved against the registry at call time; agents registered later
+    must be assigned explicitly or by calling this again.
+    """
+    names = list(agents)
+    for cap in capabilities:
+      names.extend(self._registry.agents_with_capability(cap))
+    self._scheduler.configure_pool(name, max_concurrency=max_concurrency, agents=names)
+
+  def set_agent_executor(self, agent: str, executor: AgentExecutor) -> None:
+    """Run the given agent's handler through a custom executor (results still apply here)."""
+    if agent in self._agent_handlers:
+      self._agent_refs[agent] = agent_ref_for(self._agent_handlers[agent])
+    self._agent_executors[agent] = executor
+
+  def use_process_pool(self, agents: Iterable[str], *, max_workers: Optional[int] = None) -> ProcessPoolAgentExecutor:
+    """Dispatch the given agents to a shared pool of warm worker processes.
+
+    Validation and apply_agent_result stay on this process; only the agent run moves.
+
+    Raises:
+      ValueError: if an agent has no handler or its class cannot be imported by workers.
+    """
+    names = list(agents)
+    refs: Dict[str, str] = {}
+    for name in names:
+      if name not in self._agent_handlers:
+        raise ValueError(f"No handler registered for agent '{name}'")
+      refs[name] = agent_ref_for(self._agent_handlers[name])
+    executor = ProcessPoolAgentExecutor(max_workers=max_workers, warm_agent_refs=sorted(set(refs.values())))
+    for name in names:
+      self.set_agent_executor(name, executor)
+    return executor
+
+  def shutdown(self) -> None:
+    """Stop scheduler workers and release executor resources."""
+    self._scheduler.stop()
+    if self._journal is not None:
+      self._journal.close()
+    seen: set[int] = set()
+    for ex in self._agent_executors.values():
+      if id(ex) not in seen:
+        seen.add(id(ex))
+        ex.shutdown()
+    if self._ctx is not None:
+      # Results applied by the last tasks may still sit in a write-behind buffer
+      self._ctx.flush()
+
   # --- Agent stub handlers ---
-  def _handle_noop(self, item: ScheduledTask) -> None:
+  def _handle_noop(self, task: Dict[str, Any], ctx: Optional[TaskContext] = None) -> None:
     return
 
   def queue_metrics(self) -> Dict[str, Any]:
-    return self._scheduler.metrics()
+    m = {**self._scheduler.metrics(), "results": self._results.metrics(), "workflows": self._workflows.metrics(), "agents": self._registry.agent_stats()}
+    if self._journal is not None:
+      m["journal"] = {**self._journal.metrics(), "recovered": self._recovered}
+    if self._checkpoints is not None:
+      m["checkpoints"] = self._checkpoints.metrics()
+    return m
 
   def set_context_store(self, store: ContextStore) -> None:
     self._ctx = store
@@ -96,6 +494,21 @@ class Orchestrator:
     return self._ctx
 
   def apply_agent_result(self, result: Dict[str, Any]) -> None:
+    """Persist a result's delta and artifacts with one context write per document kind.
+
+    The whole result is validated before anything is written.
+    """
+    self.apply_agent_results([result])
+
+  def apply_agent_results(self, results: Sequence[Dict[str, Any]]) -> None:
+    """Apply several results with a single flush of their combined documents."""
+    batch = ContextBatch()
+    for result in results:
+      self._collect_agent_result(result, batch)
+    if batch:
+      batch.flush(self._ensure_ctx())
+
+  def _collect_agent_result(self, result: Dict[str, Any], batch: ContextBatch) -> None:
     # Apply delta.doc to context as code/text documents (code path first)
     payload: Dict[str, Any] = result.get("payload", {})
     delta_obj: Any = payload.get("delta")
@@ -110,7 +523,7 @@ class Orchestrator:
       content = str(doc.get("content") or "")
       if path or content:
         code_doc = CodeDocument(id=hash(path) & 0x7FFFFFFF, path=path, language="", content=content, metadata={"origin": str(result.get("agent", ""))})
-        self._ensure_ctx().add_code_documents([code_doc], [[0.0]])
+        batch.add_code_document(code_doc, [0.0])
     # Artifacts handling: text docs and test results
     artifacts_any: Any = payload.get("artifacts")
     from typing import List as _List
@@ -133,7 +546,7 @@ class Orchestrator:
           content = str(content_val) if content_val is not None else ""
           doc_id = hash(title + content) & 0x7FFFFFFF
           text_doc = TextDocument(id=doc_id, title=title, content=content, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_text_documents([text_doc], [[0.0]])
+          batch.add_text_document(text_doc, [0.0])
         elif kind == "test_result":
           from orchestrator.context.models import TestResultDocument, TextDocument
           tn_val: Any = art.get("test_name")
@@ -150,10 +563,10 @@ class Orchestrator:
             raise ValueError("AgentResult artifact 'test_result' missing required field 'status'")
           tr = TestResultDocument(id=doc_id, test_name=test_name, status=status, log=redacted_log, metadata={"origin": str(result.get("agent", ""))})
           # Persist via dedicated helper, and also render a text doc for retrieval
-          self._ensure_ctx().add_test_results([tr])
+          batch.add_test_result(tr)
           rendered = f"[{status}] {test_name}\n{redacted_log or ''}"
           text_doc = TextDocument(id=doc_id, title=f"test:{test_name}", content=rendered, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_text_documents([text_doc], [[0.0]])
+          batch.add_text_document(text_doc, [0.0])
         elif kind == "analysis":
           from orchestrator.context.models import TextDocument
           target_val: Any = art.get("target")
@@ -180,7 +593,7 @@ class Orchestrator:
           doc_id = hash(title + details) & 0x7FFFFFFF
           content = f"[{severity}]\n{details}" if severity else details
           text_doc = TextDocument(id=doc_id, title=title, content=content, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_text_documents([text_doc], [[0.0]])
+          batch.add_text_document(text_doc, [0.0])
         elif kind == "diff_summary":
           from orchestrator.context.models import TextDocument, DiffSummaryDocument
           target_val2: Any = art.get("target")
@@ -195,10 +608,10 @@ class Orchestrator:
           content = f"files_changed={files_changed}, insertions={insertions}, deletions={deletions}"
           doc_id = hash(title + content) & 0x7FFFFFFF
           text_doc = TextDocument(id=doc_id, title=title, content=content, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_text_documents([text_doc], [[0.0]])
+          batch.add_text_document(text_doc, [0.0])
           # Persist structured
           diff_doc = DiffSummaryDocument(id=doc_id, target=target, files_changed=files_changed, insertions=insertions, deletions=deletions, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_diff_summaries([diff_doc])
+          batch.add_diff_summary(diff_doc)
         elif kind == "coverage_hint":
           from orchestrator.context.models import TextDocument, CoverageHintDocument
           files_any: Any = art.get("files")
@@ -214,6 +627,6 @@ class Orchestrator:
           content = f"line_rate={rate}, files={','.join(files_val)}"
           doc_id = hash(title + content) & 0x7FFFFFFF
           text_doc = TextDocument(id=doc_id, title=title, content=content, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_text_documents([text_doc], [[0.0]])
+          batch.add_text_document(text_doc, [0.0])
           cov_doc = CoverageHintDocument(id=doc_id, files=files_val, line_rate=rate, metadata={"origin": str(result.get("agent", ""))})
-          self._ensure_ctx().add_coverage_hints([cov_doc])
+          batch.add_coverage_hint(cov_doc)
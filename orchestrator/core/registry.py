@@ -1,9 +1,37 @@
 from __future__ import annotations
 
+from bisect import bisect_left, insort
+from collections import deque
 from dataclasses import dataclass, field
+import hashlib
+import heapq
+import math
 import threading
 import time
-from typing import Dict, List, Optional, Set
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+# Selection order within an index: idle agents before busy ones, then (score, name)
+_TIER_IDLE = 0
+_TIER_BUSY = 1
+
+# (tier, score, name, version); entries whose version is not the agent's current one are stale
+_Entry = Tuple[int, float, str, int]
+
+# How selection scores agents within a tier (lower is better)
+ROUTING_LEAST_LOADED = "least_loaded"  # caller-reported load
+ROUTING_LEAST_EXPECTED = "least_expected"  # (in flight + 1) * EWMA service time
+ROUTINGS = (ROUTING_LEAST_LOADED, ROUTING_LEAST_EXPECTED)
+
+# Heartbeat events passed to listeners as fn(agent_name, event)
+EVENT_STALE = "stale"  # heartbeat lapsed; the agent is skipped by routing
+EVENT_ALIVE = "alive"  # a stale agent sent a heartbeat again
+
+AgentListener = Callable[[str, str], None]
+
+
+def _ring_hash(value: str) -> int:
+    # Stable across processes (unlike hash()), so affinity survives restarts
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
 
 
 @dataclass
@@ -13,18 +41,83 @@ class AgentInfo:
     status: str = "idle"  # idle|busy|down
     load: int = 0  # lower is better
     last_heartbeat: float = 0.0
+    stale: bool = False  # heartbeat older than the registry TTL
+
+
+@dataclass
+class _ServiceStats:
+    service_s_ewma: Optional[float] = None
+    wait_s_ewma: float = 0.0
+    inflight: int = 0
+    samples: Deque[float] = field(default_factory=lambda: deque(maxlen=64))  # recent service times
 
 
 class AgentRegistry:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        *,
+        heartbeat_ttl_s: float = 60.0,
+        clock: Callable[[], float] = time.time,
+        routing: str = ROUTING_LEAST_LOADED,
+        ewma_alpha: float = 0.2,
+        ring_vnodes: int = 64,
+        affinity_load_factor: float = 1.25,
+    ) -> None:
         """Thread-safe in-memory registry of agents and their status.
 
         Notes:
         - Duplicate registrations are rejected to avoid accidental overwrites.
-        - Heartbeats are used to filter out stale agents during selection.
+        - Heartbeat expiry is tracked in a min-heap holding at most one deadline per
+          agent. Each lookup first pops the deadlines that are due: an agent that
+          heartbeated since is re-armed at its new deadline, otherwise it turns stale
+          exactly once and listeners get EVENT_STALE. The next heartbeat brings it back
+          (EVENT_ALIVE). Routing then reads the precomputed healthy set.
+        - Selection uses a min-heap per capability (plus one over all agents) keyed by
+          (idle first, score, name). Any change to an agent's score pushes a fresh entry
+          and bumps the agent's version; older entries are discarded lazily when they
+          reach the top, and a heap is rebuilt once stale entries outnumber live ones.
+        - The score is the reported load, or with ROUTING_LEAST_EXPECTED the expected
+          completion time of one more task: (in flight + 1) * EWMA service time. In flight
+          counts tasks from begin() to end(), which callers should bracket around the
+          routing decision and the task's terminal outcome rather than the run itself, so
+          a burst routed before anything dispatches still sees its own load;
+          record_service() feeds the EWMA. Agents without samples use the mean of the
+          others, so a slow or overloaded instance stops attracting work.
+        - Status and load must change through update_status() to be seen by selection.
+        - select_affine() maps a key (e.g. a target path) onto a consistent-hash ring of
+          ring_vnodes points per agent and walks clockwise to the first healthy agent
+          whose in-flight count is below affinity_load_factor times the mean (bounded
+          loads). An agent joining or leaving only moves the keys on its own arcs.
+        - Passing ttl_s to a lookup applies a stricter (or looser) heartbeat window to
+          that call only, by checking the candidates it returns.
         """
+        if routing not in ROUTINGS:
+            raise ValueError(f"unknown routing {routing!r}; expected one of {', '.join(ROUTINGS)}")
+        if ring_vnodes < 1 or affinity_load_factor < 1.0:
+            raise ValueError("ring_vnodes must be >= 1 and affinity_load_factor >= 1.0")
         self._agents: Dict[str, AgentInfo] = {}
         self._lock = threading.RLock()
+        self._routing = routing
+        self._alpha = ewma_alpha
+        self._stats: Dict[str, _ServiceStats] = {}
+        self._ewma_sum = 0.0  # over agents with at least one sample
+        self._ewma_count = 0
+        self._ttl_s = heartbeat_ttl_s
+        self._clock = clock
+        # capability -> agent names; None indexes every agent
+        self._by_cap: Dict[Optional[str], Set[str]] = {None: set()}
+        self._heaps: Dict[Optional[str], List[_Entry]] = {None: []}
+        self._version: Dict[str, int] = {}
+        self._healthy: Dict[str, None] = {}  # not down and not stale, insertion-ordered
+        self._expiry: List[Tuple[float, str]] = []  # (deadline, name), one per armed agent
+        self._armed: Set[str] = set()
+        self._listeners: List[AgentListener] = []
+        self._vnodes = ring_vnodes
+        self._load_factor = affinity_load_factor
+        # Per index key: consistent-hash ring of (point, name), healthy agents and their in-flight total
+        self._rings: Dict[Optional[str], List[Tuple[int, str]]] = {None: []}
+        self._healthy_n: Dict[Optional[str], int] = {}
+        self._inflight_n: Dict[Optional[str], int] = {}
 
     def register(self, name: str, capabilities: List[str]) -> None:
         """Register a new agent name with capabilities.
@@ -35,17 +128,37 @@ class AgentRegistry:
         with self._lock:
             if name in self._agents:
                 raise ValueError(f"Agent '{name}' already registered")
-            self._agents[name] = AgentInfo(
-                name=name, capabilities=set(capabilities), last_heartbeat=time.time()
+            a = self._agents[name] = AgentInfo(
+                name=name, capabilities=set(capabilities), last_heartbeat=self._clock()
             )
+            for key in self._keys(a):
+                self._by_cap.setdefault(key, set()).add(name)
+                ring = self._rings.setdefault(key, [])
+                for i in range(self._vnodes):
+                    insort(ring, (_ring_hash(f"{name}#{i}"), name))
+            self._arm(a)
+            self._index(a)
+
+    def add_listener(self, fn: AgentListener) -> None:
+        """Register fn(agent_name, event) for EVENT_STALE / EVENT_ALIVE transitions.
+
+        Listeners run on the thread whose call noticed the transition, outside the lock.
+        """
+        with self._lock:
+            self._listeners.append(fn)
 
     def list(self) -> List[AgentInfo]:
         with self._lock:
             return list(self._agents.values())
 
+    def agents_with_capability(self, capability: str) -> List[str]:
+        with self._lock:
+            return sorted(self._by_cap.get(capability, ()))
+
     def update_status(
         self, name: str, *, status: str | None = None, load: int | None = None
     ) -> None:
+        events: List[Tuple[str, str]] = []
         with self._lock:
             if name not in self._agents:
                 return
@@ -54,41 +167,300 @@ class AgentRegistry:
                 a.status = status
             if load is not None:
                 a.load = load
-            a.last_heartbeat = time.time()
+            revived = self._heartbeat(a, events)
+            if revived or status is not None or load is not None:
+                self._index(a)
+        self._emit(events)
 
     def update_heartbeat(self, name: str) -> None:
+        events: List[Tuple[str, str]] = []
         with self._lock:
-            if name in self._agents:
-                self._agents[name].last_heartbeat = time.time()
+            a = self._agents.get(name)
+            if a is not None and self._heartbeat(a, events):
+                self._index(a)
+        self._emit(events)
 
     def get(self, name: str) -> Optional[AgentInfo]:
         with self._lock:
             return self._agents.get(name)
 
-    def list_active(self, ttl_s: int = 60) -> List[AgentInfo]:
-        now = time.time()
-        with self._lock:
-            return [
-                a
-                for a in self._agents.values()
-                if (now - a.last_heartbeat) <= ttl_s and a.status != "down"
-            ]
-
-    def select_for(self, agent_name: str, ttl_s: int = 60) -> str:
-        # Prefer exact name if healthy
-        with self._lock:
-            if agent_name:
-                a = self._agents.get(agent_name)
-                if (
-                    a
-                    and a.status != "down"
-                    and (time.time() - a.last_heartbeat) <= ttl_s
-                ):
-                    return agent_name
-            # Otherwise pick least-loaded idle among active
-            active = self.list_active(ttl_s)
-            candidates = [a for a in active if a.status == "idle"] or active
-            if not candidates:
-                return ""
-            candidates.sort(key=lambda a: (a.load, a.name))
-            return candidates[0].name
+    def begin(self, name: str) -> None:
+        """Count a task as assigned to the agent until the matching end()."""
+        with self._lock:
+            if name in self._agents:
+                self._stats.setdefault(name, _ServiceStats()).inflight += 1
+                self._add_inflight(name, 1)
+                if self._routing == ROUTING_LEAST_EXPECTED:
+                    self._index(self._agents[name])
+
+    def end(self, name: str) -> None:
+        """Release a task counted by begin(), whether or not it ever ran."""
+        with self._lock:
+            st = self._stats.get(name)
+            if name not in self._agents or st is None or st.inflight == 0:
+                return
+            st.inflight -= 1
+            self._add_inflight(name, -1)
+            if self._routing == ROUTING_LEAST_EXPECTED:
+                self._index(self._agents[name])
+
+    def record_service(self, name: str, service_s: float, *, wait_s: float = 0.0) -> None:
+        """Record one finished run: its handler time and how long it waited in the queue."""
+        with self._lock:
+            a = self._agents.get(name)
+            if a is None:
+                return
+            st = self._stats.setdefault(name, _ServiceStats())
+            if st.service_s_ewma is None:
+                st.service_s_ewma = service_s
+                self._ewma_sum += service_s
+                self._ewma_count += 1
+            else:
+                prev = st.service_s_ewma
+                st.service_s_ewma = (1.0 - self._alpha) * prev + self._alpha * service_s
+                self._ewma_sum += st.service_s_ewma - prev
+            st.wait_s_ewma = (1.0 - self._alpha) * st.wait_s_ewma + self._alpha * wait_s
+            st.samples.append(service_s)
+            if self._routing == ROUTING_LEAST_EXPECTED:
+                self._index(a)
+
+    def agent_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Service-time estimates per agent that has run at least one task."""
+        with self._lock:
+            out: Dict[str, Dict[str, Any]] = {}
+            for name, st in self._stats.items():
+                if st.service_s_ewma is None:
+                    continue
+                ordered = sorted(st.samples)
+                out[name] = {
+                    "inflight": st.inflight,
+                    "service_ms_ewma": st.service_s_ewma * 1000.0,
+                    "wait_ms_ewma": st.wait_s_ewma * 1000.0,
+                    "service_ms_p50": ordered[len(ordered) // 2] * 1000.0,
+                    "service_ms_p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000.0,
+                    "expected_ms": self._score_expected(name) * 1000.0,
+                }
+            return out
+
+    def select_affine(self, key: str, capability: Optional[str] = None) -> str:
+        """Healthy agent (with the capability, if given) that owns key on the hash ring.
+
+        The same key keeps landing on the same agent while it is healthy and not
+        overloaded; otherwise the next agent clockwise takes it. Returns "" when no
+        healthy agent qualifies. O(log n) plus the skipped ring points.
+        """
+        events: List[Tuple[str, str]] = []
+        with self._lock:
+            self._expire_due(events)
+            found = self._walk_ring(key, capability)
+        self._emit(events)
+        return found
+
+    def expire(self) -> List[str]:
+        """Mark agents whose heartbeat lapsed as stale; returns their names.
+
+        Lookups do this on their own; call it periodically to get EVENT_STALE promptly
+        even when nothing is being routed.
+        """
+        events: List[Tuple[str, str]] = []
+        with self._lock:
+            self._expire_due(events)
+        self._emit(events)
+        return [name for name, _ in events]
+
+    def is_active(self, name: str) -> bool:
+        """True if the agent is registered, not down and its heartbeat has not lapsed."""
+        events: List[Tuple[str, str]] = []
+        with self._lock:
+            self._expire_due(events)
+            active = name in self._healthy
+        self._emit(events)
+        return active
+
+    def list_active(self, ttl_s: Optional[float] = None) -> List[AgentInfo]:
+        events: List[Tuple[str, str]] = []
+        with self._lock:
+            self._expire_due(events)
+            active = [self._agents[n] for n in self._healthy]
+        self._emit(events)
+        if ttl_s is not None:
+            now = self._clock()
+            active = [a for a in active if (now - a.last_heartbeat) <= ttl_s]
+        return active
+
+    def select_for(self, agent_name: str, ttl_s: Optional[float] = None) -> str:
+        events: List[Tuple[str, str]] = []
+        with self._lock:
+            self._expire_due(events)
+            found = ""
+            # Prefer exact name if healthy
+            if agent_name and agent_name in self._healthy and self._fresh(self._agents[agent_name], ttl_s):
+                found = agent_name
+            else:
+                # Otherwise pick least-loaded idle among active
+                found = self._select(None, ttl_s)
+        self._emit(events)
+        return found
+
+    def select_for_capability(self, capability: str, ttl_s: Optional[float] = None) -> str:
+        """Least-loaded active agent with the capability, preferring idle ones.
+
+        Returns "" when no active agent has the capability. O(log n) per call, plus the
+        superseded entries discarded on the way.
+        """
+        events: List[Tuple[str, str]] = []
+        with self._lock:
+            self._expire_due(events)
+            found = self._select(capability, ttl_s)
+        self._emit(events)
+        return found
+
+    def _keys(self, a: AgentInfo) -> List[Optional[str]]:
+        return [None, *a.capabilities]
+
+    def _score(self, a: AgentInfo) -> float:
+        if self._routing == ROUTING_LEAST_EXPECTED:
+            return self._score_expected(a.name)
+        return float(a.load)
+
+    def _score_expected(self, name: str) -> float:
+        st = self._stats.get(name)
+        prior = self._ewma_sum / self._ewma_count if self._ewma_count else 1.0
+        if st is None:
+            return prior
+        est = st.service_s_ewma if st.service_s_ewma is not None else prior
+        return (st.inflight + 1) * est
+
+    def _fresh(self, a: AgentInfo, ttl_s: Optional[float]) -> bool:
+        ttl = self._ttl_s if ttl_s is None else ttl_s
+        return (self._clock() - a.last_heartbeat) <= ttl
+
+    def _heartbeat(self, a: AgentInfo, events: List[Tuple[str, str]]) -> bool:
+        # Caller holds the lock; returns True if the agent was stale
+        a.last_heartbeat = self._clock()
+        self._arm(a)
+        if not a.stale:
+            return False
+        a.stale = False
+        events.append((a.name, EVENT_ALIVE))
+        return True
+
+    def _arm(self, a: AgentInfo) -> None:
+        if a.name not in self._armed:
+            self._armed.add(a.name)
+            heapq.heappush(self._expiry, (a.last_heartbeat + self._ttl_s, a.name))
+
+    def _expire_due(self, events: List[Tuple[str, str]]) -> None:
+        # O(1) when nothing is due; each heartbeat costs at most one re-arm here
+        now = self._clock()
+        while self._expiry and self._expiry[0][0] < now:
+            _, name = heapq.heappop(self._expiry)
+            a = self._agents[name]
+            deadline = a.last_heartbeat + self._ttl_s
+            if deadline >= now:
+                heapq.heappush(self._expiry, (deadline, name))
+                continue
+            self._armed.discard(name)
+            a.stale = True
+            self._index(a)
+            events.append((name, EVENT_STALE))
+
+    def _emit(self, events: List[Tuple[str, str]]) -> None:
+        if not events:
+            return
+        with self._lock:
+            listeners = list(self._listeners)
+        for name, event in events:
+            for fn in listeners:
+                try:
+                    fn(name, event)
+                except Exception:
+                    # Listeners are isolated from each other and from routing
+                    pass
+
+    def _walk_ring(self, key: str, capability: Optional[str]) -> str:
+        ring = self._rings.get(capability)
+        n = self._healthy_n.get(capability, 0)
+        if not ring or n == 0:
+            return ""
+        # Bounded loads: nobody takes more than load_factor x the mean in-flight count.
+        # In flight starts at begin(), i.e. the routing decision, so a burst routed before
+        # anything dispatches still spills off a hot key's owner.
+        cap = math.ceil(self._load_factor * (self._inflight_n.get(capability, 0) + 1) / n)
+        start = bisect_left(ring, (_ring_hash(key), ""))
+        seen: Set[str] = set()
+        fallback = ""
+        for i in range(len(ring)):
+            name = ring[(start + i) % len(ring)][1]
+            if name in seen:
+                continue
+            seen.add(name)
+            if name not in self._healthy:
+                continue
+            st = self._stats.get(name)
+            if (st.inflight if st is not None else 0) < cap:
+                return name
+            fallback = fallback or name
+            if len(seen) == len(self._by_cap[capability]):
+                break
+        return fallback
+
+    def _add_inflight(self, name: str, delta: int) -> None:
+        # In-flight totals only count healthy agents; _index() moves them on transitions
+        if name in self._healthy:
+            for key in self._keys(self._agents[name]):
+                self._inflight_n[key] = self._inflight_n.get(key, 0) + delta
+
+    def _index(self, a: AgentInfo) -> None:
+        # Caller holds the lock
+        version = self._version[a.name] = self._version.get(a.name, 0) + 1
+        healthy = a.status != "down" and not a.stale
+        if healthy != (a.name in self._healthy):
+            st = self._stats.get(a.name)
+            sign = 1 if healthy else -1
+            for key in self._keys(a):
+                self._healthy_n[key] = self._healthy_n.get(key, 0) + sign
+                self._inflight_n[key] = self._inflight_n.get(key, 0) + sign * (st.inflight if st is not None else 0)
+        if not healthy:
+            self._healthy.pop(a.name, None)
+            return
+        self._healthy[a.name] = None
+        entry = (_TIER_IDLE if a.status == "idle" else _TIER_BUSY, self._score(a), a.name, version)
+        for key in self._keys(a):
+            heap = self._heaps.setdefault(key, [])
+            heapq.heappush(heap, entry)
+            if len(heap) > 2 * len(self._by_cap[key]) + 16:
+                self._rebuild(key)
+
+    def _rebuild(self, key: Optional[str]) -> None:
+        heap = [e for e in self._heaps[key] if self._version.get(e[2]) == e[3]]
+        heapq.heapify(heap)
+        self._heaps[key] = heap
+
+    def _select(self, key: Optional[str], ttl_s: Optional[float]) -> str:
+        heap = self._heaps.get(key)
+        if not heap:
+            return ""
+        lapsed: List[_Entry] = []
+        found = ""
+        while heap:
+            tier, score, name, version = heap[0]
+            a = self._agents[name]
+            if self._version.get(name) != version:
+                heapq.heappop(heap)
+                continue
+            if a.status == "down" or score != self._score(a) or tier != (_TIER_IDLE if a.status == "idle" else _TIER_BUSY):
+                # Changed without update_status(), or the prior moved; reindex from the live record
+                heapq.heappop(heap)
+                self._index(a)
+                heap = self._heaps[key]  # _index() may have rebuilt it
+                continue
+            if not self._fresh(a, ttl_s):
+                # Outside this call's window (or backdated); keep it indexed
+                lapsed.append(heapq.heappop(heap))
+                continue
+            found = name
+            break
+        for e in lapsed:
+            heapq.heappush(heap, e)
+        return found
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+from orchestrator.schemas.types import AgentResult
+
+from .scheduler import OUTCOME_BUDGET_EXCEEDED, OUTCOME_DROPPED, OUTCOME_FAILED, OUTCOME_SUCCEEDED
+
+STATE_PENDING = "pending"
+STATE_SUCCEEDED = OUTCOME_SUCCEEDED
+STATE_FAILED = OUTCOME_FAILED
+STATE_BUDGET_EXCEEDED = OUTCOME_BUDGET_EXCEEDED
+STATE_DROPPED = OUTCOME_DROPPED
+
+TERMINAL_STATES = frozenset({STATE_SUCCEEDED, STATE_FAILED, STATE_BUDGET_EXCEEDED, STATE_DROPPED})
+
+
+@dataclass(frozen=True)
+class TaskOutcome:
+  trace_id: str
+  task_id: str
+  agent: str
+  state: str
+  result: Optional[AgentResult] = None
+  error: Optional[str] = None
+  attempts: int = 0
+  submitted_at: float = 0.0
+  finished_at: Optional[float] = None
+
+
+OutcomeCallback = Callable[[TaskOutcome], None]
+
+
+@dataclass
+class _Pending:
+  outcome: TaskOutcome
+  futures: List["Future[TaskOutcome]"] = field(default_factory=list)
+  callbacks: List[OutcomeCallback] = field(default_factory=list)
+
+
+class ResultsTable:
+  """Task outcomes keyed by trace ID, with futures/callbacks and bounded retention.
+
+  Notes:
+  - Pending entries live until their task reaches a terminal state.
+  - Terminal outcomes are retained for at most ttl_s seconds and at most max_entries
+    entries (oldest completion evicted first), so memory stays flat at high task rates.
+  - Futures resolve with the TaskOutcome (they never raise); inspect outcome.state.
+  - Callbacks run on the thread that completes the task, outside the table lock.
+  """
+
+  def __init__(self, *, max_entries: int = 10000, ttl_s: float = 3600.0) -> None:
+    if max_entries < 1:
+      raise ValueError("max_entries must be >= 1")
+    self._max = max_entries
+    self._ttl_s = ttl_s
+    self._lock = threading.Lock()
+    self._pending: Dict[str, _Pending] = {}
+    self._done: "OrderedDict[str, TaskOutcome]" = OrderedDict()
+    self._evicted = 0
+    self._completed: Dict[str, int] = {}
+
+  def track(self, trace_id: str, *, task_id: str = "", agent: str = "") -> None:
+    with self._lock:
+      self._pending[trace_id] = _Pending(TaskOutcome(trace_id=trace_id, task_id=task_id, agent=agent, state=STATE_PENDING, submitted_at=time.time()))
+
+  def forget(self, trace_id: str) -> None:
+    """Drop a pending entry whose task never made it onto the queue."""
+    with self._lock:
+      self._pending.pop(trace_id, None)
+
+  def complete(self, trace_id: str, state: str, *, result: Optional[AgentResult] = None, error: Optional[str] = None, attempts: int = 0) -> None:
+    """Record a terminal state and wake waiters; unknown trace IDs are ignored."""
+    if state not in TERMINAL_STATES:
+      raise ValueError(f"not a terminal state: {state}")
+    now = time.time()
+    with self._lock:
+      entry = self._pending.pop(trace_id, None)
+      if entry is None:
+        return
+      outcome = replace(entry.outcome, state=state, result=result, error=error, attempts=attempts, finished_at=now)
+      self._done[trace_id] = outcome
+      self._completed[state] = self._completed.get(state, 0) + 1
+      self._evict(now)
+    for fut in entry.futures:
+      fut.set_result(outcome)
+    for cb in entry.callbacks:
+      try:
+        cb(outcome)
+      except Exception:
+        pass
+
+  def get(self, trace_id: str) -> Optional[TaskOutcome]:
+    """Return the outcome (state "pending" while running), or None if unknown or evicted."""
+    with self._lock:
+      self._evict(time.time())
+      entry = self._pending.get(trace_id)
+      if entry is not None:
+        return entry.outcome
+      return self._done.get(trace_id)
+
+  def future(self, trace_id: str) -> "Future[TaskOutcome]":
+    """Return a future resolved with the task's terminal outcome.
+
+    Raises:
+      KeyError: if the trace ID is unknown or its outcome was already evicted.
+    """
+    fut: "Future[TaskOutcome]" = Future()
+    with self._lock:
+      entry = self._pending.get(trace_id)
+      if entry is not None:
+        entry.futures.append(fut)
+        return fut
+      done = self._done.get(trace_id)
+    if done is None:
+      raise KeyError(trace_id)
+    fut.set_result(done)
+    return fut
+
+  def add_done_callback(self, trace_id: str, fn: OutcomeCallback) -> None:
+    """Call fn(outcome) once the task is terminal (immediately if it already is).
+
+    Raises:
+      KeyError: if the trace ID is unknown or its outcome was already evicted.
+    """
+    with self._lock:
+      entry = self._pending.get(trace_id)
+      if entry is not None:
+        entry.callbacks.append(fn)
+        return
+      done = self._done.get(trace_id)
+    if done is None:
+      raise KeyError(trace_id)
+    fn(done)
+
+  def metrics(self) -> Dict[str, Any]:
+    with self._lock:
+      return {"pending": len(self._pending), "retained": len(self._done), "evicted": self._evicted, "completed": dict(self._completed)}
+
+  def _evict(self, now: float) -> None:
+    # Caller holds self._lock; _done is in completion order so expired entries are at the front
+    cutoff = now - self._ttl_s
+    while self._done:
+      trace_id, oldest = next(iter(self._done.items()))
+      if len(self._done) > self._max or (oldest.finished_at or 0.0) < cutoff:
+        del self._done[trace_id]
+        self._evicted += 1
+      else:
+        break
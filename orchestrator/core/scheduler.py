@@ -1,11 +1,39 @@
 from __future__ import annotations
 
-import queue
+import heapq
+import itertools
 import threading
 import time
 import uuid
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import CancelledError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from .cancellation import CancelToken
+from .errors import BudgetExceededError, QueueFullError
+from .fair_queue import DEFAULT_PRIORITY, FairQueue
+from .journal import TaskJournal
+
+DEFAULT_POOL = "default"
+
+# Admission policies applied when the scheduler is at capacity
+ADMISSION_BLOCK = "block"    # wait up to admission_timeout_s for a slot, then reject
+ADMISSION_REJECT = "reject"  # fail fast with a retry-after hint
+ADMISSION_SHED = "shed"      # drop the newest queued task of a lower priority class
+ADMISSION_POLICIES = (ADMISSION_BLOCK, ADMISSION_REJECT, ADMISSION_SHED)
+
+# Ready-queue ordering within a tenant lane
+ORDERING_FIFO = "fifo"
+ORDERING_EDF = "edf"  # earliest deadline first; tasks without a deadline go last
+ORDERING_CRITICAL_PATH = "critical_path"  # largest rank (critical-path length) first, then EDF
+ORDERINGS = (ORDERING_FIFO, ORDERING_EDF, ORDERING_CRITICAL_PATH)
+
+# Terminal outcomes reported to the on_done hook
+OUTCOME_SUCCEEDED = "succeeded"
+OUTCOME_FAILED = "failed"  # retries exhausted
+OUTCOME_BUDGET_EXCEEDED = "budget_exceeded"
+OUTCOME_DROPPED = "dropped"  # discarded without completing (e.g. still queued at stop)
 
 
 @dataclass
@@ -17,73 +45,613 @@ class ScheduledTask:
   max_attempts: int = 3
   next_at: float = 0.0
   budget_ms: Optional[int] = None
+  priority: str = DEFAULT_PRIORITY
+  tenant: str = ""
+  enqueued_at: float = 0.0
+  pool: str = DEFAULT_POOL
+  deadline: Optional[float] = None  # absolute time.time(); expired tasks are skipped
+  runs: int = 0  # handler invocations so far (attempts counts failed ones)
+  cancel: CancelToken = field(default_factory=CancelToken)
+  idempotency_key: Optional[str] = None
+  rank: float = 0.0  # estimated seconds of work downstream of this task, itself included
+  wait_s: float = 0.0  # queue wait before the current run, set at dispatch
+
+
+def _deadline_key(item: ScheduledTask) -> float:
+  return item.deadline if item.deadline is not None else float("inf")
+
+
+def _rank_key(item: ScheduledTask) -> Tuple[float, float]:
+  return (-item.rank, _deadline_key(item))
+
+
+def _non_retryable(e: BaseException) -> bool:
+  # Budget and cancellation errors are terminal even when a child handler or an executor
+  # wrapped them (raise ... from e, or raised while handling them)
+  seen: set[int] = set()
+  cur: Optional[BaseException] = e
+  while cur is not None and id(cur) not in seen:
+    if isinstance(cur, (BudgetExceededError, CancelledError)):
+      return True
+    seen.add(id(cur))
+    cur = cur.__cause__ or cur.__context__
+  return False
+
+
+_ORDER_KEYS: Dict[str, Optional[Callable[[ScheduledTask], Any]]] = {
+  ORDERING_FIFO: None,
+  ORDERING_EDF: _deadline_key,
+  ORDERING_CRITICAL_PATH: _rank_key,
+}
+
+
+@dataclass
+class _ClassStats:
+  dispatched: int = 0
+  wait_s_total: float = 0.0
+  wait_s_max: float = 0.0
+
+
+class _Pool:
+  """Worker pool with its own ready queue, retry timer heap and concurrency cap.
+
+  Ready items are handed to workers by a weighted fair queue over priority classes
+  (round-robin across tenants within a class); items whose next_at lies in the future
+  (retry backoff) wait in a min-heap keyed on next_at and are promoted once due, so a
+  pending retry never occupies a worker thread.
+  """
+
+  def __init__(self, name: str, max_concurrency: int, priority_weights: Optional[Mapping[str, int]], ordering: str) -> None:
+    self.name = name
+    self.max = max_concurrency
+    self.cv = threading.Condition()
+    self.ready: FairQueue[ScheduledTask] = FairQueue(priority_weights, order_key=_ORDER_KEYS[ordering])
+    self.class_stats: Dict[str, _ClassStats] = {c: _ClassStats() for c in self.ready.weights()}
+    self.delayed: List[Tuple[float, int, ScheduledTask]] = []
+    self.seq = itertools.count()
+    self.workers: List[threading.Thread] = []
+    self.busy = 0
+    self.completed = 0
+    self.expired = 0
+
+  def push(self, item: ScheduledTask) -> None:
+    with self.cv:
+      if item.next_at > time.time():
+        heapq.heappush(self.delayed, (item.next_at, next(self.seq), item))
+      else:
+        self.ready.push(item, priority=item.priority, tenant=item.tenant)
+      # A new heap head may shorten the sleep of a worker waiting on the timer
+      self.cv.notify()
+
+  def _promote_due(self, now: float) -> None:
+    # Caller holds self.cv
+    while self.delayed and self.delayed[0][0] <= now:
+      _, _, item = heapq.heappop(self.delayed)
+      self.ready.push(item, priority=item.priority, tenant=item.tenant)
+
+  def next(self, stop: threading.Event) -> Optional[ScheduledTask]:
+    """Block until a task is due; None tells the calling worker to exit.
+
+    Workers exit on shutdown and when the pool was resized below its current size.
+    """
+    me = threading.current_thread()
+    with self.cv:
+      while not stop.is_set():
+        if len(self.workers) > self.max:
+          self.workers.remove(me)
+          return None
+        now = time.time()
+        self._promote_due(now)
+        popped = self.ready.pop()
+        if popped is not None:
+          cls, item = popped
+          # Wait is measured from when the item last became due (enqueue or retry time)
+          wait_s = max(0.0, now - max(item.enqueued_at, item.next_at))
+          item.wait_s = wait_s
+          st = self.class_stats[cls]
+          st.dispatched += 1
+          st.wait_s_total += wait_s
+          st.wait_s_max = max(st.wait_s_max, wait_s)
+          self.busy += 1
+          if self.ready:
+            # Pass the baton so other idle workers drain remaining ready items
+            self.cv.notify()
+          return item
+        timeout = None
+        if self.delayed:
+          timeout = max(0.0, self.delayed[0][0] - time.time())
+        self.cv.wait(timeout)
+      return None
+
+  def drain(self) -> List[ScheduledTask]:
+    """Remove and return every queued (ready or delayed) item."""
+    with self.cv:
+      items: List[ScheduledTask] = []
+      while True:
+        popped = self.ready.pop()
+        if popped is None:
+          break
+        items.append(popped[1])
+      items.extend(item for _, _, item in sorted(self.delayed))
+      self.delayed.clear()
+      return items
+
+  def done(self) -> None:
+    with self.cv:
+      self.busy -= 1
+      self.completed += 1
+
+  def metrics(self) -> Dict[str, Any]:
+    with self.cv:
+      depths = self.ready.depths()
+      weights = self.ready.weights()
+      classes: Dict[str, Any] = {}
+      for name, st in self.class_stats.items():
+        classes[name] = {
+          "weight": weights[name],
+          "depth": depths[name],
+          "dispatched": st.dispatched,
+          "wait_ms_avg": (st.wait_s_total / st.dispatched) * 1000.0 if st.dispatched else 0.0,
+          "wait_ms_max": st.wait_s_max * 1000.0,
+        }
+      ready = len(self.ready)
+      delayed = len(self.delayed)
+      return {
+        "max_concurrency": self.max,
+        "workers": len(self.workers),
+        "busy": self.busy,
+        "completed": self.completed,
+        "expired": self.expired,
+        "queued": ready + delayed,
+        "ready": ready,
+        "delayed": delayed,
+        "classes": classes,
+      }
 
 
 class Scheduler:
-  def __init__(self, *, max_concurrency: int = 2, backoff_fn: Optional[Callable[[int], float]] = None) -> None:
-    self._q: "queue.Queue[ScheduledTask]" = queue.Queue()
-    self._max = max_concurrency
-    self._workers: list[threading.Thread] = []
+  def __init__(self,
+               *,
+               max_concurrency: int = 2,
+               backoff_fn: Optional[Callable[[int], float]] = None,
+               priority_weights: Optional[Mapping[str, int]] = None,
+               capacity: Optional[int] = None,
+               admission: str = ADMISSION_BLOCK,
+               admission_timeout_s: float = 5.0,
+               ordering: str = ORDERING_FIFO,
+               idempotency_ttl_s: float = 300.0,
+               idempotency_max_entries: int = 10000,
+               journal: Optional[TaskJournal] = None) -> None:
+    """Multi-pool task scheduler.
+
+    Notes:
+    - Every task runs in exactly one pool; agents not assigned to a named pool use the
+      default pool sized by max_concurrency.
+    - Pools are isolated: a saturated pool never delays tasks routed to another pool.
+    - capacity bounds admitted-but-unfinished tasks (queued, retrying or running) across
+      all pools; None means unbounded. Retries never count twice.
+    - Tasks past their deadline are completed as budget_exceeded at dequeue instead of
+      being started, and a retry that could only start after the deadline is not queued.
+    - Tasks enqueued with the same idempotency key are coalesced: while one is queued or
+      running, and for idempotency_ttl_s after it succeeds, further enqueues return its
+      trace ID instead of queueing another copy. Failed, expired and dropped tasks are
+      not cached, so a later submission runs again.
+    - With a journal, every admitted task is logged (durably) before enqueue returns, and
+      retries and terminal outcomes are logged as they happen; recover() re-queues what
+      was unfinished. Tasks still queued at stop() are not logged as dropped, so they
+      survive a restart.
+
+    Raises:
+      ValueError: on an unknown admission policy or ordering, or a capacity below 1.
+    """
+    if admission not in ADMISSION_POLICIES:
+      raise ValueError(f"unknown admission policy '{admission}'")
+    if ordering not in ORDERINGS:
+      raise ValueError(f"unknown ordering '{ordering}'")
+    self._ordering = ordering
+    if capacity is not None and capacity < 1:
+      raise ValueError("capacity must be >= 1")
+    self._capacity = capacity
+    self._admission = admission
+    self._admission_timeout_s = admission_timeout_s
+    self._admit_cv = threading.Condition()
+    self._outstanding = 0
+    self._rejected = 0
+    self._shed = 0
+    self._service_s_ewma = 0.0
+    self._lock = threading.RLock()
+    self._priority_weights = dict(priority_weights) if priority_weights else None
+    self._pools: Dict[str, _Pool] = {DEFAULT_POOL: _Pool(DEFAULT_POOL, max_concurrency, self._priority_weights, ordering)}
+    self._agent_pool: Dict[str, str] = {}
     self._stop = threading.Event()
-    self._handler: Optional[Callable[[ScheduledTask], None]] = None
+    self._started = False
+    self._handler: Optional[Callable[[ScheduledTask], Any]] = None
     self._router: Optional[Callable[[Dict[str, Any]], str]] = None
+    self._unroute: Optional[Callable[[str], None]] = None
+    self._on_done: Optional[Callable[[ScheduledTask, str, Any], None]] = None
     self._backoff_fn: Callable[[int], float] = backoff_fn or (lambda n: float(min(2 ** n, 60)))
+    self._idem_lock = threading.Lock()
+    self._idem_inflight: Dict[str, str] = {}
+    # key -> (trace_id, expires_at), in completion order so expired entries are at the front
+    self._idem_done: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+    self._idem_ttl_s = idempotency_ttl_s
+    self._idem_max = idempotency_max_entries
+    self._coalesced = 0
+    self._journal = journal
+
+  def start(self,
+            handler: Callable[[ScheduledTask], Any],
+            router: Optional[Callable[[Dict[str, Any]], str]] = None,
+            on_done: Optional[Callable[[ScheduledTask, str, Any], None]] = None,
+            unroute: Optional[Callable[[str], None]] = None) -> None:
+    """Start workers.
+
+    on_done(item, outcome, value) is called once per task when it reaches a terminal
+    outcome: value is the handler's return value for "succeeded"/"budget_exceeded", the
+    last exception for "failed" and None for "dropped". It runs on the worker thread (or
+    the thread calling stop() for drops) and must not block.
 
-  def start(self, handler: Callable[[ScheduledTask], None], router: Optional[Callable[[Dict[str, Any]], str]] = None) -> None:
+    unroute(agent) is called instead when enqueue() routed a task but did not queue it
+    (rejected, coalesced or failed), so a router that counts load can release it.
+    """
     self._handler = handler
     self._router = router
-    for _ in range(self._max):
-      t = threading.Thread(target=self._run, daemon=True)
-      t.start()
-      self._workers.append(t)
+    self._on_done = on_done
+    self._unroute = unroute
+    with self._lock:
+      self._started = True
+      for pool in self._pools.values():
+        self._spawn(pool)
 
   def stop(self) -> None:
     self._stop.set()
-    for _ in self._workers:
-      self._q.put(ScheduledTask(trace_id="", task={}))
-    for w in self._workers:
+    with self._lock:
+      pools = list(self._pools.values())
+    workers: List[threading.Thread] = []
+    for pool in pools:
+      with pool.cv:
+        pool.cv.notify_all()
+        workers.extend(pool.workers)
+    for w in workers:
       w.join(timeout=1.0)
+    with self._admit_cv:
+      self._admit_cv.notify_all()
+    for pool in pools:
+      for item in pool.drain():
+        self._finish(item, OUTCOME_DROPPED, None, journal=False)
+
+  def configure_pool(self, name: str, *, max_concurrency: int, agents: Iterable[str] = ()) -> None:
+    """Create or resize a pool and route the given agents to it.
+
+    Safe to call at runtime: growing a pool spawns workers immediately, shrinking lets
+    surplus workers exit after their current task. Already-queued tasks stay in the pool
+    they were queued on.
+
+    Raises:
+      ValueError: if max_concurrency is less than 1.
+    """
+    if max_concurrency < 1:
+      raise ValueError("max_concurrency must be >= 1")
+    with self._lock:
+      pool = self._pools.get(name)
+      if pool is None:
+        pool = _Pool(name, max_concurrency, self._priority_weights, self._ordering)
+        self._pools[name] = pool
+      with pool.cv:
+        pool.max = max_concurrency
+        pool.cv.notify_all()
+      for agent in agents:
+        self._agent_pool[agent] = name
+      if self._started:
+        self._spawn(pool)
+
+  def pool_for(self, agent: Optional[str]) -> str:
+    with self._lock:
+      return self._agent_pool.get(agent or "", DEFAULT_POOL)
 
-  def enqueue(self, task: Dict[str, Any], *, max_attempts: int = 3, budget_ms: Optional[int] = None) -> str:
-    trace_id = str(uuid.uuid4())
+  def enqueue(self,
+              task: Dict[str, Any],
+              *,
+              max_attempts: int = 3,
+              budget_ms: Optional[int] = None,
+              priority: str = DEFAULT_PRIORITY,
+              tenant: str = "",
+              trace_id: Optional[str] = None,
+              deadline: Optional[float] = None,
+              idempotency_key: Optional[str] = None,
+              rank: float = 0.0) -> str:
+    """Queue a task and return its trace ID (generated unless the caller supplies one).
+
+    deadline is an absolute time.time() after which the task is no longer worth running;
+    it is also exposed to the handler through item.cancel.
+
+    With an idempotency_key matching a queued, running or recently succeeded task, nothing
+    is queued and that task's trace ID is returned instead; callers detect coalescing by
+    comparing it with the trace ID they supplied.
+
+    rank only matters with critical_path ordering, where higher-ranked tasks of the same
+    class and tenant are dispatched first.
+
+    Raises:
+      ValueError: if priority is not a configured priority class.
+      QueueFullError: if the scheduler is at capacity and the admission policy refuses
+        the task; carries a retry_after_s hint.
+    """
     agent = self._router(task) if self._router else task.get("agent")
-    self._q.put(ScheduledTask(trace_id=trace_id, task=task, agent=agent, attempts=0, max_attempts=max_attempts, next_at=time.time(), budget_ms=budget_ms))
-    return trace_id
+    queued = False
+    try:
+      pool_name = self.pool_for(agent)
+      with self._lock:
+        pool = self._pools[pool_name]
+      if not pool.ready.has_class(priority):
+        raise ValueError(f"unknown priority class '{priority}'")
+      if idempotency_key is not None:
+        existing = self._coalesce(idempotency_key)
+        if existing is not None:
+          return existing
+      shed = self._admit(pool.ready.weights()[priority])
+      if shed is not None:
+        self._notify_done(shed, OUTCOME_DROPPED, None)
+      trace_id = trace_id or str(uuid.uuid4())
+      if idempotency_key is not None:
+        # Another submitter may have claimed the key while we waited for admission
+        with self._idem_lock:
+          existing = self._lookup_key(idempotency_key)
+          if existing is None:
+            self._idem_inflight[idempotency_key] = trace_id
+          else:
+            self._coalesced += 1
+        if existing is not None:
+          self._release_slot()
+          return existing
+      now = time.time()
+      item = ScheduledTask(trace_id=trace_id, task=task, agent=agent, attempts=0, max_attempts=max_attempts, next_at=now, budget_ms=budget_ms, priority=priority, tenant=tenant, enqueued_at=now, pool=pool_name, deadline=deadline, cancel=CancelToken(deadline), idempotency_key=idempotency_key, rank=rank)
+      if self._journal is not None:
+        try:
+          self._journal.log_enqueue(task, trace_id=trace_id, agent=agent, max_attempts=max_attempts, budget_ms=budget_ms, priority=priority, tenant=tenant, enqueued_at=now, deadline=deadline, idempotency_key=idempotency_key, rank=rank, attempts=0, runs=0, next_at=now)
+        except BaseException:
+          self._release_slot()
+          self._settle_key(item, OUTCOME_DROPPED)
+          raise
+      pool.push(item)
+      queued = True
+      return trace_id
+    finally:
+      if not queued and self._router is not None and agent and self._unroute is not None:
+        self._unroute(agent)
+
+  def recover(self) -> List[ScheduledTask]:
+    """Re-queue every task the journal recorded as admitted but unfinished.
+
+    Attempt counts and pending retry times are restored. A task that was running when
+    the process died runs again (at-least-once). Recovered tasks bypass admission
+    control but occupy capacity slots. Call before submitting new work.
+    """
+    if self._journal is None:
+      return []
+    items: List[ScheduledTask] = []
+    for rec in self._journal.recover():
+      task = rec["task"]
+      agent = rec.get("agent")
+      pool_name = self.pool_for(agent)
+      with self._lock:
+        pool = self._pools[pool_name]
+      priority = rec.get("priority") or DEFAULT_PRIORITY
+      if not pool.ready.has_class(priority):
+        priority = DEFAULT_PRIORITY
+      deadline = rec.get("deadline")
+      item = ScheduledTask(trace_id=rec["trace_id"], task=task, agent=agent, attempts=int(rec.get("attempts") or 0), max_attempts=int(rec.get("max_attempts") or 3), next_at=float(rec.get("next_at") or 0.0), budget_ms=rec.get("budget_ms"), priority=priority, tenant=rec.get("tenant") or "", enqueued_at=float(rec.get("enqueued_at") or time.time()), pool=pool_name, deadline=deadline, runs=int(rec.get("runs") or 0), cancel=CancelToken(deadline), idempotency_key=rec.get("idempotency_key"), rank=float(rec.get("rank") or 0.0))
+      with self._admit_cv:
+        self._outstanding += 1
+      if item.idempotency_key is not None:
+        with self._idem_lock:
+          self._idem_inflight.setdefault(item.idempotency_key, item.trace_id)
+      pool.push(item)
+      items.append(item)
+    return items
+
+  def forget_idempotency_key(self, key: str) -> None:
+    """Drop a cached completion so the next enqueue with this key runs again."""
+    with self._idem_lock:
+      self._idem_done.pop(key, None)
+
+  def _coalesce(self, key: str) -> Optional[str]:
+    with self._idem_lock:
+      existing = self._lookup_key(key)
+      if existing is not None:
+        self._coalesced += 1
+      return existing
+
+  def _lookup_key(self, key: str) -> Optional[str]:
+    # Caller holds self._idem_lock
+    trace_id = self._idem_inflight.get(key)
+    if trace_id is not None:
+      return trace_id
+    now = time.time()
+    while self._idem_done:
+      oldest_key, (_, expires_at) = next(iter(self._idem_done.items()))
+      if expires_at > now:
+        break
+      del self._idem_done[oldest_key]
+    done = self._idem_done.get(key)
+    return done[0] if done is not None else None
+
+  def _settle_key(self, item: ScheduledTask, outcome: str) -> None:
+    if item.idempotency_key is None:
+      return
+    with self._idem_lock:
+      if self._idem_inflight.get(item.idempotency_key) == item.trace_id:
+        del self._idem_inflight[item.idempotency_key]
+      if outcome == OUTCOME_SUCCEEDED and self._idem_ttl_s > 0:
+        self._idem_done[item.idempotency_key] = (item.trace_id, time.time() + self._idem_ttl_s)
+        self._idem_done.move_to_end(item.idempotency_key)
+        while len(self._idem_done) > self._idem_max:
+          self._idem_done.popitem(last=False)
+
+  def _admit(self, weight: int) -> Optional[ScheduledTask]:
+    """Reserve a capacity slot; returns a task shed to make room, if any."""
+    with self._admit_cv:
+      if self._capacity is None or self._outstanding < self._capacity:
+        self._outstanding += 1
+        return None
+      if self._admission == ADMISSION_BLOCK:
+        if self._admit_cv.wait_for(lambda: self._outstanding < (self._capacity or 0) or self._stop.is_set(), timeout=self._admission_timeout_s) and not self._stop.is_set():
+          self._outstanding += 1
+          return None
+      elif self._admission == ADMISSION_SHED:
+        victim = self._shed_lower_than(weight)
+        if victim is not None:
+          # The victim's slot passes straight to the new task
+          self._shed += 1
+          return victim
+      self._rejected += 1
+      raise QueueFullError(f"scheduler at capacity ({self._capacity})", retry_after_s=self._retry_after_s())
+
+  def _shed_lower_than(self, weight: int) -> Optional[ScheduledTask]:
+    # Caller holds self._admit_cv; lock order is admit_cv -> _lock -> pool.cv
+    with self._lock:
+      pools = list(self._pools.values())
+    best: Optional[_Pool] = None
+    best_w = weight
+    for pool in pools:
+      with pool.cv:
+        w = pool.ready.lowest_weight()
+      if w is not None and w < best_w:
+        best, best_w = pool, w
+    if best is None:
+      return None
+    with best.cv:
+      popped = best.ready.pop_lowest()
+    return popped[1] if popped is not None else None
+
+  def _retry_after_s(self) -> float:
+    # Expected time for one slot to free up: mean service time spread over all workers
+    with self._lock:
+      workers = sum(max(1, p.max) for p in self._pools.values())
+    est = self._service_s_ewma / workers if self._service_s_ewma else 0.1
+    return float(min(60.0, max(0.05, est)))
 
   def metrics(self) -> Dict[str, Any]:
+    with self._lock:
+      pools = {name: p.metrics() for name, p in self._pools.items()}
+    # Aggregate view keeps the single-pool shape; per-pool detail lives under "pools"
+    classes: Dict[str, Any] = {}
+    for pm in pools.values():
+      for cls, cm in pm["classes"].items():
+        agg = classes.setdefault(cls, {"weight": cm["weight"], "depth": 0, "dispatched": 0, "wait_ms_avg": 0.0, "wait_ms_max": 0.0})
+        total = agg["wait_ms_avg"] * agg["dispatched"] + cm["wait_ms_avg"] * cm["dispatched"]
+        agg["depth"] += cm["depth"]
+        agg["dispatched"] += cm["dispatched"]
+        agg["wait_ms_avg"] = total / agg["dispatched"] if agg["dispatched"] else 0.0
+        agg["wait_ms_max"] = max(agg["wait_ms_max"], cm["wait_ms_max"])
+    with self._admit_cv:
+      admission = {
+        "capacity": self._capacity,
+        "policy": self._admission,
+        "outstanding": self._outstanding,
+        "rejected": self._rejected,
+        "shed": self._shed,
+      }
+    with self._idem_lock:
+      idempotency = {"inflight": len(self._idem_inflight), "cached": len(self._idem_done), "coalesced": self._coalesced}
     return {
-      "queued": self._q.qsize(),
-      "workers": len(self._workers),
+      "queued": sum(pm["queued"] for pm in pools.values()),
+      "ready": sum(pm["ready"] for pm in pools.values()),
+      "delayed": sum(pm["delayed"] for pm in pools.values()),
+      "workers": sum(pm["workers"] for pm in pools.values()),
       "stopped": self._stop.is_set(),
+      "classes": classes,
+      "pools": pools,
+      "admission": admission,
+      "idempotency": idempotency,
     }
 
-  def _run(self) -> None:
+  def _spawn(self, pool: _Pool) -> None:
+    # Caller holds self._lock
+    with pool.cv:
+      while len(pool.workers) < pool.max:
+        t = threading.Thread(target=self._run, args=(pool,), daemon=True, name=f"scheduler-{pool.name}")
+        pool.workers.append(t)
+        t.start()
+
+  def _run(self, pool: _Pool) -> None:
     assert self._handler is not None
-    while not self._stop.is_set():
-      item = self._q.get()
-      if self._stop.is_set():
+    while True:
+      item = pool.next(self._stop)
+      if item is None:
         break
+      if item.cancel.cancelled:
+        # Expired (or cancelled) while queued: nobody is waiting for the result
+        with pool.cv:
+          pool.expired += 1
+        pool.done()
+        self._finish(item, OUTCOME_BUDGET_EXCEEDED, None)
+        continue
       try:
-        now = time.time()
-        if item.next_at > now:
-          time.sleep(item.next_at - now)
         start = time.time()
-        self._handler(item)
+        item.runs += 1
+        value = self._handler(item)
+        outcome = OUTCOME_SUCCEEDED
         # budget accounting: if exceeded, drop
         if item.budget_ms is not None:
           elapsed_ms = int((time.time() - start) * 1000)
           if elapsed_ms > item.budget_ms:
             # budget exceeded; do not retry
-            continue
-      except Exception:
-        # retry with exponential backoff
+            outcome = OUTCOME_BUDGET_EXCEEDED
+        self._observe_service(time.time() - start)
+        self._finish(item, outcome, value)
+      except Exception as e:
+        self._observe_service(time.time() - start)
+        if _non_retryable(e):
+          # Handler observed cancellation / deadline; retrying cannot help
+          self._finish(item, OUTCOME_BUDGET_EXCEEDED, e)
+          continue
+        # retry with exponential backoff; the item waits on the timer heap, not a worker
         item.attempts += 1
         if item.attempts < item.max_attempts:
           delay = self._backoff_fn(item.attempts)
           item.next_at = time.time() + delay
-          self._q.put(item)
+          if item.deadline is not None and item.next_at >= item.deadline:
+            self._finish(item, OUTCOME_BUDGET_EXCEEDED, e)
+          else:
+            if self._journal is not None:
+              try:
+                self._journal.log_attempt(item.trace_id, attempts=item.attempts, runs=item.runs, next_at=item.next_at)
+              except ValueError:
+                # Journal already closed; recovery replays the last logged attempt count
+                pass
+            pool.push(item)
         else:
           # drop after max attempts
-          pass
+          self._finish(item, OUTCOME_FAILED, e)
       finally:
-        self._q.task_done()
+        pool.done()
+
+  def _observe_service(self, seconds: float) -> None:
+    with self._admit_cv:
+      self._service_s_ewma = seconds if not self._service_s_ewma else 0.8 * self._service_s_ewma + 0.2 * seconds
+
+  def _finish(self, item: ScheduledTask, outcome: str, value: Any, *, journal: bool = True) -> None:
+    self._release_slot()
+    self._notify_done(item, outcome, value, journal=journal)
+
+  def _release_slot(self) -> None:
+    with self._admit_cv:
+      self._outstanding -= 1
+      self._admit_cv.notify()
+
+  def _notify_done(self, item: ScheduledTask, outcome: str, value: Any, *, journal: bool = True) -> None:
+    self._settle_key(item, outcome)
+    if journal and self._journal is not None:
+      try:
+        self._journal.log_complete(item.trace_id, outcome)
+      except ValueError:
+        # Journal already closed; the task is replayed on recovery (at-least-once)
+        pass
+    if self._on_done is None:
+      return
+    try:
+      self._on_done(item, outcome, value)
+    except Exception:
+      # A faulty listener must not take down the worker or trigger a retry
+      pass
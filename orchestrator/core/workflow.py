@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from .dag import DAG
+
+
+@dataclass
+class WorkflowNode:
+  trace_id: str
+  task: Dict[str, Any]
+  workflow_id: str  # trace ID of the root task submitted by the client
+  parent: str  # trace ID of the task whose result emitted this one
+  priority: str
+  tenant: str = ""
+  deps: List[str] = field(default_factory=list)
+  released: bool = False
+  rank: float = 0.0  # critical-path estimate in seconds, set when the node is added
+
+  def record(self) -> Dict[str, Any]:
+    """Fields persisted in workflow checkpoints."""
+    return {"trace_id": self.trace_id, "task": self.task, "workflow_id": self.workflow_id, "parent": self.parent, "priority": self.priority, "tenant": self.tenant, "deps": list(self.deps)}
+
+  @classmethod
+  def from_record(cls, rec: Mapping[str, Any]) -> "WorkflowNode":
+    return cls(trace_id=rec["trace_id"], task=rec["task"], workflow_id=rec["workflow_id"], parent=rec["parent"], priority=rec["priority"], tenant=rec.get("tenant", ""), deps=list(rec.get("deps") or []))
+
+
+class DurationEstimates:
+  """Per-agent EWMA of handler run time in seconds; unseen agents use default_s."""
+
+  def __init__(self, *, alpha: float = 0.2, default_s: float = 1.0, initial: Optional[Mapping[str, float]] = None) -> None:
+    if not 0.0 < alpha <= 1.0:
+      raise ValueError("alpha must be in (0, 1]")
+    self._alpha = alpha
+    self._default_s = default_s
+    self._lock = threading.Lock()
+    self._ewma: Dict[str, float] = dict(initial or {})
+
+  def observe(self, agent: str, seconds: float) -> None:
+    with self._lock:
+      prev = self._ewma.get(agent)
+      self._ewma[agent] = seconds if prev is None else (1.0 - self._alpha) * prev + self._alpha * seconds
+
+  def estimate(self, agent: str) -> float:
+    with self._lock:
+      return self._ewma.get(agent, self._default_s)
+
+  def snapshot(self) -> Dict[str, float]:
+    with self._lock:
+      return dict(self._ewma)
+
+
+def _cyclic(nodes: Sequence[WorkflowNode]) -> List[str]:
+  # Kahn's algorithm over edges between the given nodes; what never drains is on or
+  # behind a cycle
+  indegree = {n.trace_id: 0 for n in nodes}
+  dependents: Dict[str, List[str]] = {n.trace_id: [] for n in nodes}
+  for n in nodes:
+    for d in dict.fromkeys(n.deps):
+      if d in indegree:
+        indegree[n.trace_id] += 1
+        dependents[d].append(n.trace_id)
+  ready = [nid for nid, deg in indegree.items() if deg == 0]
+  while ready:
+    for child in dependents[ready.pop()]:
+      indegree[child] -= 1
+      if indegree[child] == 0:
+        ready.append(child)
+  return [nid for nid, deg in indegree.items() if deg > 0]
+
+
+class WorkflowTracker:
+  """Follow-up tasks (ResultPayload.newTasks) held as DAG nodes until they can run.
+
+  Notes:
+  - A node becomes runnable once every sibling it dependsOn has succeeded; the caller
+    hands runnable nodes to the Scheduler.
+  - Fan-out is bounded: at most max_fanout children of the same parent are released
+    (queued or running) at a time; the rest wait for a sibling to finish.
+  - Each node is ranked by its critical path (longest chain of estimated agent run
+    times to a sink). Held-back children are released highest rank first, and the rank
+    is passed to the Scheduler for critical_path ordering.
+  - When a node fails, is dropped or exceeds its budget, every node depending on it
+    (transitively) is cancelled instead of run.
+  - Thread-safe; all methods return work for the caller to do outside the lock.
+  """
+
+  def __init__(self, *, max_fanout: int = 8, estimates: Optional[DurationEstimates] = None) -> None:
+    if max_fanout < 1:
+      raise ValueError("max_fanout must be >= 1")
+    self._max_fanout = max_fanout
+    self.estimates = estimates or DurationEstimates()
+    self._seq = itertools.count()
+    self._lock = threading.Lock()
+    self._dag = DAG()
+    self._nodes: Dict[str, WorkflowNode] = {}
+    self._inflight: Dict[str, int] = {}  # parent trace ID -> released, unfinished children
+    # parent trace ID -> heap of (-rank, seq, trace ID) for runnable, unreleased children
+    self._waiting: Dict[str, List[Tuple[float, int, str]]] = {}
+    self._completed = 0
+    self._cancelled = 0
+
+  def workflow_of(self, trace_id: str) -> str:
+    """Workflow ID for a task: its root's trace ID (itself when it is a root)."""
+    with self._lock:
+      node = self._nodes.get(trace_id)
+      return node.workflow_id if node is not None else trace_id
+
+  def add_children(self, parent: str, children: Sequence[WorkflowNode]) -> List[WorkflowNode]:
+    """Register a parent's follow-up tasks and return those runnable now.
+
+    Raises:
+      ValueError: if a child depends on an id that is not one of its siblings, or the
+        siblings' dependencies form a cycle; nothing is registered in either case.
+    """
+    with self._lock:
+      ids = {c.trace_id for c in children}
+      for c in children:
+        unknown = [d for d in c.deps if d not in ids]
+        if unknown:
+          raise ValueError(f"newTask depends on unknown sibling(s): {', '.join(unknown)}")
+      # Checked up front: DAG.add_node() would only catch the cycle halfway through _add()
+      cyclic = _cyclic(children)
+      if cyclic:
+        raise ValueError(f"newTasks dependency cycle among: {', '.join(cyclic)}")
+      self._add(children)
+      self._enqueue_runnable(c.trace_id for c in children if not self._dag.deps(c.trace_id))
+      return self._release(parent)
+
+  def restore(self, nodes: Sequence[WorkflowNode], *, running: Iterable[str] = ()) -> List[WorkflowNode]:
+    """Re-register the pending nodes of a resumed workflow and return those runnable now.
+
+    deps may only name other nodes in this call (the caller drops satisfied ones). Nodes
+    in running are already queued or running and count against their parent's fan-out.
+    """
+    with self._lock:
+      active = set(running)
+      self._add(nodes)
+      for n in nodes:
+        if n.trace_id in active:
+          n.released = True
+          self._inflight[n.parent] = self._inflight.get(n.parent, 0) + 1
+      self._enqueue_runnable(n.trace_id for n in nodes if n.trace_id not in active and not self._dag.deps(n.trace_id))
+      released: List[WorkflowNode] = []
+      for parent in dict.fromkeys(n.parent for n in nodes):
+        released.extend(self._release(parent))
+      return released
+
+  def on_done(self, trace_id: str, succeeded: bool) -> Tuple[List[WorkflowNode], List[WorkflowNode]]:
+    """Record a task's terminal outcome; returns (nodes to release, nodes cancelled)."""
+    with self._lock:
+      node = self._nodes.pop(trace_id, None)
+      if node is None:
+        return [], []
+      self._completed += 1
+      self._finish_child(node)
+      cancelled = [] if succeeded else self._cancel_dependents(trace_id)
+      newly_ready = self._dag.mark_done(trace_id)
+      self._enqueue_runnable(newly_ready)
+      parents = dict.fromkeys([node.parent] + [self._nodes[n].parent for n in newly_ready if n in self._nodes])
+      released: List[WorkflowNode] = []
+      for parent in parents:
+        released.extend(self._release(parent))
+      return released, cancelled
+
+  def metrics(self) -> Dict[str, Any]:
+    with self._lock:
+      released = sum(self._inflight.values())
+      return {
+        "pending": len(self._nodes) - released,
+        "released": released,
+        "completed": self._completed,
+        "cancelled": self._cancelled,
+        "max_fanout": self._max_fanout,
+        "duration_estimates_s": self.estimates.snapshot(),
+      }
+
+  def _add(self, nodes: Sequence[WorkflowNode]) -> None:
+    for n in nodes:
+      self._nodes[n.trace_id] = n
+      self._dag.add_node(n.trace_id, n.deps)
+    # New nodes have no dependents outside this set, so existing ranks are unchanged
+    ranks = self._dag.critical_path(lambda nid: self.estimates.estimate(str(self._nodes[nid].task.get("agent", ""))), roots=[n.trace_id for n in nodes])
+    for n in nodes:
+      n.rank = ranks.get(n.trace_id, 0.0)
+
+  def _finish_child(self, node: WorkflowNode) -> None:
+    if node.released:
+      left = self._inflight.get(node.parent, 0) - 1
+      if left > 0:
+        self._inflight[node.parent] = left
+      else:
+        self._inflight.pop(node.parent, None)
+
+  def _cancel_dependents(self, trace_id: str) -> List[WorkflowNode]:
+    # Caller marks trace_id done afterwards; cancelled nodes leave the DAG here
+    out: List[WorkflowNode] = []
+    stack = list(self._dag.dependents(trace_id))
+    while stack:
+      dep = self._nodes.pop(stack.pop(), None)
+      if dep is None:
+        continue
+      stack.extend(self._dag.dependents(dep.trace_id))
+      self._dag.mark_done(dep.trace_id)
+      self._cancelled += 1
+      out.append(dep)
+    return out
+
+  def _enqueue_runnable(self, trace_ids: Iterable[str]) -> None:
+    for trace_id in trace_ids:
+      node = self._nodes.get(trace_id)
+      if node is not None:
+        heapq.heappush(self._waiting.setdefault(node.parent, []), (-node.rank, next(self._seq), trace_id))
+
+  def _release(self, parent: str) -> List[WorkflowNode]:
+    # O(released): only this parent's runnable children are considered
+    out: List[WorkflowNode] = []
+    q = self._waiting.get(parent)
+    while q and self._inflight.get(parent, 0) < self._max_fanout:
+      node = self._nodes.get(heapq.heappop(q)[2])
+      if node is None:
+        continue  # cancelled while waiting
+      node.released = True
+      self._inflight[parent] = self._inflight.get(parent, 0) + 1
+      out.append(node)
+    if not q:
+      self._waiting.pop(parent, None)
+    return out
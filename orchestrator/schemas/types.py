@@ -108,6 +108,8 @@ class Delta(BaseModel):
 class NewTaskRef(BaseModel):
   agent: str
   payload: Dict[str, Any]
+  id: Optional[str] = None  # referenced by sibling dependsOn entries
+  dependsOn: Optional[List[str]] = None  # ids of sibling newTasks that must succeed first
 
 
 class ResultPayload(BaseModel):
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from orchestrator.context.context_store import ContextStore
+from orchestrator.core.async_orchestrator import AsyncOrchestrator
+from orchestrator.core.errors import QueueFullError, TaskFailedError
+from orchestrator.core.orchestrator import Orchestrator
+
+
+def _codegen(tid: str) -> dict:
+  return {"type": "AgentTask", "id": tid, "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}}
+
+
+def _orchestrator() -> Orchestrator:
+  o = Orchestrator()
+  o.set_context_store(MagicMock(spec=ContextStore))
+  return o
+
+
+def test_async_run_resolves_with_validated_result():
+  async def main():
+    async with AsyncOrchestrator(_orchestrator()) as ao:
+      results = await asyncio.gather(*(ao.run(_codegen(f"t{i}")) for i in range(20)))
+      assert [r.id for r in results] == [f"res-t{i}" for i in range(20)]
+      assert ao.in_flight == 0
+  asyncio.run(main())
+
+
+def test_async_failure_raises_task_failed():
+  o = _orchestrator()
+  o._scheduler._backoff_fn = lambda n: 0.01
+
+  def boom(task, ctx=None):
+    raise RuntimeError("agent crashed")
+
+  o._agent_handlers["CodeGenAgent"] = boom
+
+  async def main():
+    ao = AsyncOrchestrator(o)
+    with pytest.raises(TaskFailedError):
+      await asyncio.wait_for(ao.run(_codegen("t-fail")), timeout=5)
+  asyncio.run(main())
+
+
+def test_async_validation_error_releases_slot():
+  async def main():
+    ao = AsyncOrchestrator(_orchestrator(), max_in_flight=1)
+    with pytest.raises(ValueError):
+      await ao.submit({"type": "AgentTask"})
+    # Slot was released, so a valid task still goes through
+    res = await asyncio.wait_for(ao.run(_codegen("t-ok")), timeout=5)
+    assert res is not None
+  asyncio.run(main())
+
+
+def test_async_in_flight_bound_applies_backpressure():
+  o = _orchestrator()
+  gate = threading.Event()
+  real = o._agent_handlers["CodeGenAgent"]
+
+  def gated(task, ctx=None):
+    gate.wait(5)
+    return real(task)
+
+  o._agent_handlers["CodeGenAgent"] = gated
+
+  async def main():
+    ao = AsyncOrchestrator(o, max_in_flight=1)
+    first = await ao.submit(_codegen("t1"))
+    second = asyncio.ensure_future(ao.submit(_codegen("t2")))
+    await asyncio.sleep(0.05)
+    # Second submission is parked until the first completes
+    assert not second.done()
+    gate.set()
+    await asyncio.wait_for(first, timeout=5)
+    fut2 = await asyncio.wait_for(second, timeout=5)
+    await asyncio.wait_for(fut2, timeout=5)
+  asyncio.run(main())
+
+
+def test_async_coalesced_submits_all_resolve_and_release_slots():
+  o = _orchestrator()
+  gate = threading.Event()
+  real = o._agent_handlers["CodeGenAgent"]
+
+  def gated(task, ctx=None):
+    gate.wait(5)
+    return real(task)
+
+  o._agent_handlers["CodeGenAgent"] = gated
+  task = {**_codegen("t-idem"), "constraints": {"idempotencyKey": "same"}}
+
+  async def main():
+    ao = AsyncOrchestrator(o, max_in_flight=2)
+    first = await ao.submit(task)
+    second = await ao.submit({**task, "id": "t-idem-2"})
+    assert ao.in_flight == 2
+    gate.set()
+    r1, r2 = await asyncio.wait_for(asyncio.gather(first, second), timeout=5)
+    assert r1 is r2 and ao.in_flight == 0
+    # Both slots came back, so two more submissions do not park
+    await asyncio.wait_for(asyncio.gather(ao.run(_codegen("t-a")), ao.run(_codegen("t-b"))), timeout=5)
+  asyncio.run(main())
+
+
+def _gated_orchestrator(**kw):
+  o = Orchestrator(**kw)
+  o.set_context_store(MagicMock(spec=ContextStore))
+  gate = threading.Event()
+  real = o._agent_handlers["CodeGenAgent"]
+
+  def gated(task, ctx=None):
+    gate.wait(5)
+    return real(task)
+
+  o._agent_handlers["CodeGenAgent"] = gated
+  return o, gate
+
+
+def test_async_queue_full_raises_typed_error_and_releases_slot():
+  o, gate = _gated_orchestrator(queue_capacity=1, admission="reject")
+
+  async def main():
+    ao = AsyncOrchestrator(o, max_in_flight=2)
+    first = await ao.submit(_codegen("t1"))
+    with pytest.raises(QueueFullError) as e:
+      await ao.submit(_codegen("t2"))
+    assert e.value.retry_after_s >= 0
+    assert ao._sem._value == 1 and ao.in_flight == 1
+    gate.set()
+    await asyncio.wait_for(first, timeout=5)
+    assert ao._sem._value == 2
+  asyncio.run(main())
+  o.shutdown()
+
+
+def test_async_blocking_admission_does_not_stall_event_loop():
+  o, gate = _gated_orchestrator(queue_capacity=1)
+
+  async def main():
+    ao = AsyncOrchestrator(o, max_in_flight=4)
+    first = await ao.submit(_codegen("t1"))
+    second = asyncio.ensure_future(ao.submit(_codegen("t2")))
+    # The blocked admission waits in an executor thread; the loop keeps running
+    t0 = asyncio.get_running_loop().time()
+    await asyncio.sleep(0.05)
+    assert asyncio.get_running_loop().time() - t0 < 1.0 and not second.done()
+    gate.set()
+    await asyncio.wait_for(first, timeout=5)
+    await asyncio.wait_for(await asyncio.wait_for(second, timeout=5), timeout=5)
+  asyncio.run(main())
+  o.shutdown()
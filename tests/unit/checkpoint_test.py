@@ -0,0 +1,127 @@
+import os
+import shutil
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from orchestrator.context.context_store import ContextStore
+from orchestrator.core.checkpoint import WorkflowCheckpoints
+from orchestrator.core.orchestrator import Orchestrator
+
+
+def _node(trace_id, parent="", deps=()):
+  return {"trace_id": trace_id, "task": {"id": trace_id, "agent": "TestAgent"}, "workflow_id": "wf", "parent": parent, "priority": "normal", "tenant": "", "deps": list(deps)}
+
+
+def test_checkpoints_replay_and_remove_finished_workflows(tmp_path):
+  cps = WorkflowCheckpoints(str(tmp_path))
+  cps.start("wf", _node("root"))
+  cps.record_done("root", "succeeded", {"id": "r"}, children=[_node("a", "root"), _node("b", "root", ["a"])])
+  cps.record_done("a", "succeeded", {"id": "ra"})
+  cps.record_done("untracked", "succeeded")
+  # A restarted process sees the same open nodes
+  cps2 = WorkflowCheckpoints(str(tmp_path))
+  assert cps2.workflow_ids() == ["wf"] and cps2.workflow_of("b") == "wf" and cps2.workflow_of("a") is None
+  cp = cps2.load("wf")
+  assert [s.outcome for s in cp.nodes.values()] == ["succeeded", "succeeded", None]
+  assert cp.nodes["a"].result == {"id": "ra"} and [n["trace_id"] for n in cp.pending()] == ["b"]
+  cps2.record_done("b", "failed")
+  assert cps2.workflow_ids() == []
+  with pytest.raises(KeyError):
+    cps2.load("wf")
+  with pytest.raises(KeyError):
+    cps2.load("../wf")
+
+
+def test_checkpoints_ignore_torn_and_corrupt_records(tmp_path):
+  cps = WorkflowCheckpoints(str(tmp_path))
+  cps.start("wf", _node("root"))
+  cps.record_done("root", "succeeded", {"id": "r"}, children=[_node("a", "root")])
+  path = os.path.join(str(tmp_path), "wf.jsonl")
+  with open(path, encoding="utf-8") as f:
+    lines = f.read().splitlines()
+  with open(path, "w", encoding="utf-8") as f:
+    f.write(lines[0] + "\n" + lines[1].replace('"id":"r"', '"id":"x"') + "\n" + '{"op":"done","trace')
+  cp = WorkflowCheckpoints(str(tmp_path)).load("wf")
+  # The root's output no longer matches its digest, so it counts as not run
+  assert [n["trace_id"] for n in cp.pending()] == ["root"]
+
+
+def test_checkpoints_keep_records_appended_after_a_torn_tail(tmp_path):
+  cps = WorkflowCheckpoints(str(tmp_path))
+  cps.start("wf", _node("R"))
+  cps.record_done("R", "succeeded", {"id": "r"}, children=[_node("A", "R"), _node("B", "R"), _node("C", "R")])
+  with open(os.path.join(str(tmp_path), "wf.jsonl"), "a", encoding="utf-8") as f:
+    f.write('{"op":"done","trace')
+  # Resuming cuts the torn fragment, so what it appends next is readable
+  cps2 = WorkflowCheckpoints(str(tmp_path))
+  assert [n["trace_id"] for n in cps2.load("wf").pending()] == ["A", "B", "C"]
+  cps2.record_done("A", "succeeded", {"id": "a"})
+  cps2.record_done("B", "failed")
+  cp = WorkflowCheckpoints(str(tmp_path)).load("wf")
+  assert [n["trace_id"] for n in cp.pending()] == ["C"] and cp.nodes["A"].result == {"id": "a"}
+
+
+def _result(task, new_tasks=None):
+  payload = {"newTasks": new_tasks} if new_tasks else {}
+  return {"type": "AgentResult", "id": f"res-{task['id']}", "parentId": task["id"], "agent": task["agent"], "payload": payload}
+
+
+def test_orchestrator_resumes_workflow_without_rerunning_finished_nodes(tmp_path):
+  live_dir = str(tmp_path / "live")
+  crash_dir = str(tmp_path / "crash")
+  calls: list[str] = []
+  gate = threading.Event()
+  started = threading.Event()
+
+  def codegen(task, ctx=None):
+    calls.append(task["id"])
+    return _result(task, [
+      {"id": "gen", "agent": "TestAgent", "payload": {"mode": "generate", "target": "a.py"}},
+      {"id": "run", "agent": "TestAgent", "payload": {"mode": "execute"}, "dependsOn": ["gen"]},
+    ])
+
+  def test_agent(task, ctx=None):
+    calls.append(task["id"])
+    if task["payload"]["mode"] == "execute":
+      started.set()
+      gate.wait(5)
+    return _result(task)
+
+  def build(path):
+    o = Orchestrator(checkpoint_dir=path)
+    o.set_context_store(MagicMock(spec=ContextStore))
+    o._agent_handlers.update({"CodeGenAgent": codegen, "TestAgent": test_agent})
+    return o
+
+  o1 = build(live_dir)
+  root = o1.submit_task({"type": "AgentTask", "id": "t1", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}})
+  assert started.wait(5)
+  # Snapshot the checkpoint as a crash would leave it: root and gen done, run in flight
+  shutil.copytree(live_dir, crash_dir)
+  gate.set()
+  o1.shutdown()
+  assert o1.resumable_workflows() == []
+
+  calls.clear()
+  o2 = build(crash_dir)
+  assert o2.resumable_workflows() == [root["traceId"]]
+  summary = o2.resume_workflow(root["traceId"])
+  assert summary == {"workflowId": root["traceId"], "reused": 2, "resumed": 1, "dropped": 0}
+  outcome = o2.result_future(root["traceId"]).result(timeout=5)
+  assert outcome.state == "succeeded" and outcome.result.payload["newTasks"][0]["id"] == "gen"
+  deadline = time.time() + 5
+  while o2.resumable_workflows() and time.time() < deadline:
+    time.sleep(0.01)
+  o2.shutdown()
+  # Only the interrupted node ran again, and the finished workflow left no checkpoint
+  assert calls == ["t1/run"]
+  assert o2.resumable_workflows() == []
+  with pytest.raises(KeyError):
+    o2.resume_workflow(root["traceId"])
+  plain = Orchestrator()
+  with pytest.raises(ValueError):
+    plain.resume_workflow(root["traceId"])
+  plain.shutdown()
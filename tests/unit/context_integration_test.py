@@ -24,3 +24,45 @@ def test_apply_agent_result_writes_code_doc():
   assert "origin" in docs[0].metadata
 
 
+
+
+def test_apply_agent_result_batches_artifacts_per_kind():
+  o = Orchestrator()
+  fake_store = MagicMock(spec=ContextStore)
+  o.set_context_store(fake_store)
+  res = {
+    "type": "AgentResult",
+    "id": "r2",
+    "parentId": "t2",
+    "agent": "TestAgent",
+    "payload": {"artifacts": [
+      {"kind": "test_result", "test_name": f"test_{i}", "status": "pass", "log": ""} for i in range(5)
+    ] + [{"kind": "coverage_hint", "files": ["a.cpp"], "line_rate": 0.5}]},
+  }
+  o.apply_agent_result(res)
+  # 5 test results + 6 rendered text docs, one write per kind
+  assert fake_store.add_test_results.call_count == 1
+  assert len(fake_store.add_test_results.call_args[0][0]) == 5
+  assert fake_store.add_text_documents.call_count == 1
+  docs, vectors = fake_store.add_text_documents.call_args[0]
+  assert len(docs) == len(vectors) == 6
+  assert fake_store.add_coverage_hints.call_count == 1
+
+
+def test_apply_agent_results_flushes_once_and_validates_first():
+  o = Orchestrator()
+  fake_store = MagicMock(spec=ContextStore)
+  o.set_context_store(fake_store)
+
+  def code(i):
+    return {"type": "AgentResult", "id": f"r{i}", "parentId": f"t{i}", "agent": "CodeGenAgent", "payload": {"delta": {"doc": {"path": f"f{i}.cpp", "content": "x"}}}}
+
+  o.apply_agent_results([code(i) for i in range(3)])
+  assert fake_store.add_code_documents.call_count == 1
+  assert [d.path for d in fake_store.add_code_documents.call_args[0][0]] == ["f0.cpp", "f1.cpp", "f2.cpp"]
+  bad = {**code(9), "payload": {"delta": {"doc": {"path": "g.cpp", "content": "y"}}, "artifacts": [{"kind": "analysis", "target": "g.cpp"}]}}
+  import pytest
+  with pytest.raises(ValueError):
+    o.apply_agent_result(bad)
+  # Nothing from the rejected result reached the store
+  assert fake_store.add_code_documents.call_count == 1
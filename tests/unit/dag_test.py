@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from orchestrator.core.dag import DAG
+
+
+def test_dag_ready_set_tracks_completion():
+  g = DAG()
+  g.add_node("a")
+  g.add_node("b", ["a"])
+  g.add_node("c", ["a", "b"])
+  assert g.ready() == ["a"]
+  g.mark_done("a")
+  assert g.ready() == ["b"]
+  g.mark_done("b")
+  assert g.ready() == ["c"]
+  # Depending on a finished node is already satisfied
+  g.add_node("d", ["a"])
+  assert g.ready() == ["c", "d"]
+  g.mark_done("unknown")
+  assert len(g) == 2 and g.is_done("a")
+
+
+def test_dag_placeholder_deps_and_reverse_edges():
+  g = DAG()
+  g.add_node("x", ["y"])
+  assert g.ready() == ["y"]
+  assert g.dependents("y") == {"x"} and g.deps("x") == {"y"}
+
+
+def test_dag_rejects_cycles():
+  g = DAG()
+  g.add_node("a")
+  g.add_node("b", ["a"])
+  g.add_node("c", ["b"])
+  with pytest.raises(ValueError):
+    g.add_node("a", ["c"])
+  with pytest.raises(ValueError):
+    g.add_node("z", ["z"])
+  # The rejected edge left the graph untouched
+  assert g.ready() == ["a"] and g.deps("a") == set()
+
+
+def test_dag_levels():
+  g = DAG()
+  g.add_node("a")
+  g.add_node("b")
+  g.add_node("c", ["a", "b"])
+  g.add_node("d", ["c"])
+  g.add_node("e", ["a"])
+  levels = [sorted(level) for level in g.levels()]
+  assert levels == [["a", "b"], ["c", "e"], ["d"]]
+
+
+def test_dag_critical_path():
+  g = DAG()
+  g.add_node("gen")
+  g.add_node("run", ["gen"])
+  g.add_node("lint")
+  g.add_node("report", ["run", "lint"])
+  cost = {"gen": 1.0, "run": 10.0, "lint": 2.0, "report": 1.0}
+  assert g.critical_path(cost.__getitem__) == {"gen": 12.0, "run": 11.0, "lint": 3.0, "report": 1.0}
+  assert g.critical_path(cost.__getitem__, roots=["lint"]) == {"lint": 3.0, "report": 1.0}
+
+
+def test_dag_large_fan_in_is_linear():
+  g = DAG()
+  n = 50000
+  for i in range(n):
+    g.add_node(f"f{i}")
+  g.add_node("report", [f"f{i}" for i in range(n)])
+  t0 = time.perf_counter()
+  for i in range(n):
+    g.mark_done(f"f{i}")
+  assert g.ready() == ["report"]
+  # Quadratic behaviour would take minutes here
+  assert time.perf_counter() - t0 < 5.0
@@ -0,0 +1,84 @@
+import pickle
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from orchestrator.agents.codegen import CodeGenAgent
+from orchestrator.context.context_store import ContextStore
+from orchestrator.core.errors import BudgetExceededError
+from orchestrator.core.executors import (
+  InlineExecutor,
+  ProcessPoolAgentExecutor,
+  TaskEnvelope,
+  agent_ref_for,
+  run_envelope,
+)
+from orchestrator.core.orchestrator import Orchestrator
+
+
+def _task(tid: str) -> dict:
+  return {"type": "AgentTask", "id": tid, "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}}
+
+
+def test_agent_ref_and_envelopes_are_picklable():
+  ref = agent_ref_for(CodeGenAgent().run)
+  assert ref == "orchestrator.agents.codegen:CodeGenAgent"
+  env = TaskEnvelope(trace_id="t", agent="CodeGenAgent", agent_ref=ref, task=_task("t1"))
+  out = run_envelope(pickle.loads(pickle.dumps(env)))
+  assert out.error is None
+  assert out.result is not None and out.result["payload"]["delta"]["doc"]["path"] == "a.py"
+  assert pickle.loads(pickle.dumps(out)) == out
+
+
+def test_agent_ref_rejects_plain_functions():
+  with pytest.raises(ValueError):
+    agent_ref_for(lambda task: task)
+
+
+def test_run_envelope_reports_errors_as_data():
+  env = TaskEnvelope(trace_id="t", agent="X", agent_ref="orchestrator.agents.nope:Missing", task={})
+  out = run_envelope(env)
+  assert out.result is None
+  assert out.error is not None and "ModuleNotFoundError" in out.error
+
+
+def test_inline_executor_calls_handler():
+  env = TaskEnvelope(trace_id="t", agent="A", agent_ref="", task={"id": "x"})
+  assert InlineExecutor().execute(env, lambda task, ctx: {"echo": task["id"]}) == {"echo": "x"}
+
+
+def test_process_pool_executor_runs_agent_in_worker():
+  ex = ProcessPoolAgentExecutor(max_workers=1, warm_agent_refs=["orchestrator.agents.codegen:CodeGenAgent"])
+  try:
+    env = TaskEnvelope(trace_id="t", agent="CodeGenAgent", agent_ref="orchestrator.agents.codegen:CodeGenAgent", task=_task("t2"))
+    res = ex.execute(env, CodeGenAgent().run)
+    assert res["id"] == "res-t2"
+    bad = TaskEnvelope(trace_id="t", agent="X", agent_ref="orchestrator.agents.nope:Missing", task={})
+    with pytest.raises(RuntimeError) as e:
+      ex.execute(bad, CodeGenAgent().run)
+    assert e.value.__cause__ is None
+    # A deadline hit in the child stays a budget error (as the cause), so it is not retried
+    late = TaskEnvelope(trace_id="t", agent="TestAgent", agent_ref="orchestrator.agents.test_agent:TestAgent", task={"id": "t3", "payload": {"mode": "execute"}}, deadline=time.time() - 1)
+    with pytest.raises(RuntimeError) as e:
+      ex.execute(late, CodeGenAgent().run)
+    assert isinstance(e.value.__cause__, BudgetExceededError)
+  finally:
+    ex.shutdown()
+
+
+def test_orchestrator_applies_process_pool_results_on_parent():
+  o = Orchestrator()
+  store = MagicMock(spec=ContextStore)
+  o.set_context_store(store)
+  o.use_process_pool(["CodeGenAgent"], max_workers=1)
+  try:
+    o.submit_task(_task("t3"))
+    deadline = time.time() + 20
+    while not store.add_code_documents.called and time.time() < deadline:
+      time.sleep(0.05)
+    assert store.add_code_documents.called
+  finally:
+    o.shutdown()
+  with pytest.raises(ValueError):
+    o.use_process_pool(["NoSuchAgent"])
@@ -0,0 +1,61 @@
+import pytest
+
+from orchestrator.core.fair_queue import FairQueue
+
+
+def _drain(q: FairQueue) -> list:
+  out = []
+  while True:
+    popped = q.pop()
+    if popped is None:
+      return out
+    out.append(popped[1])
+
+
+def test_fair_queue_weights_interleave_classes():
+  q: FairQueue[str] = FairQueue({"hi": 3, "lo": 1})
+  for i in range(6):
+    q.push(f"lo{i}", priority="lo")
+  for i in range(6):
+    q.push(f"hi{i}", priority="hi")
+  order = _drain(q)
+  # Among the first 4 dispatches, 3 belong to the heavier class
+  assert sum(1 for x in order[:4] if x.startswith("hi")) == 3
+  # FIFO within a class
+  assert [x for x in order if x.startswith("lo")] == [f"lo{i}" for i in range(6)]
+
+
+def test_fair_queue_round_robin_tenants():
+  q: FairQueue[str] = FairQueue({"normal": 1})
+  for i in range(3):
+    q.push(f"a{i}", priority="normal", tenant="a")
+  q.push("b0", priority="normal", tenant="b")
+  assert _drain(q)[:3] == ["a0", "b0", "a1"]
+
+
+def test_fair_queue_idle_class_does_not_bank_credit():
+  q: FairQueue[str] = FairQueue({"hi": 1, "lo": 1})
+  for i in range(10):
+    q.push(f"lo{i}", priority="lo")
+  for _ in range(8):
+    q.pop()
+  for i in range(5):
+    q.push(f"hi{i}", priority="hi")
+  # hi re-enters at current virtual time and alternates with lo instead of bursting
+  order = _drain(q)
+  assert "lo8" in order[:3]
+
+
+def test_fair_queue_rejects_unknown_class_and_bad_weights():
+  q: FairQueue[str] = FairQueue()
+  with pytest.raises(ValueError):
+    q.push("x", priority="nope")
+  with pytest.raises(ValueError):
+    FairQueue({"a": 0})
+
+
+def test_fair_queue_order_key_pops_smallest_first():
+  q: FairQueue[tuple] = FairQueue({"normal": 1}, order_key=lambda item: item[1])
+  for name, deadline in [("c", 30.0), ("a", 10.0), ("b", 20.0), ("a2", 10.0)]:
+    q.push((name, deadline), priority="normal")
+  assert [x[0] for x in _drain(q)] == ["a", "a2", "b", "c"]
@@ -0,0 +1,59 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from orchestrator.context.hnsw import HNSWIndex
+from orchestrator.context.numpy_context_store import NumpyContextStore
+
+
+def _unit(rng, n, dim):
+  v = rng.standard_normal((n, dim)).astype(np.float32)
+  return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_hnsw_recall_against_exact_search():
+  rng = np.random.default_rng(0)
+  data = _unit(rng, 600, 16)
+  idx = HNSWIndex(lambda: data, m=8, ef_construction=64, ef_search=48)
+  for row in range(len(data)):
+    idx.add(row)
+  assert len(idx) == 600 and idx.stats()["edges"] > 0
+  hits = 0
+  for q in _unit(rng, 30, 16):
+    truth = set(np.argsort(-(data @ q))[:10].tolist())
+    got = idx.search(q, 10)
+    assert [s for s, _ in got] == sorted((s for s, _ in got), reverse=True)
+    hits += len(truth & {r for _, r in got})
+  assert hits / 300 >= 0.9
+
+
+def test_hnsw_allowed_mask_and_relink():
+  rng = np.random.default_rng(1)
+  data = _unit(rng, 200, 8)
+  idx = HNSWIndex(lambda: data, m=4, ef_construction=32)
+  for row in range(200):
+    idx.add(row)
+  allowed = np.zeros(200, dtype=bool)
+  allowed[::7] = True
+  got = idx.search(data[3], 5, ef=200, allowed=allowed)
+  assert got and all(r % 7 == 0 for _, r in got)
+  # Move row 5 onto row 150's position; the re-linked graph finds it there
+  data[5] = data[150]
+  idx.add(5)
+  assert {r for _, r in idx.search(data[150], 2)} == {5, 150}
+  with pytest.raises(ValueError):
+    HNSWIndex(lambda: data, m=1)
+
+
+def test_store_serves_dense_queries_from_hnsw():
+  rng = np.random.default_rng(2)
+  data = _unit(rng, 300, 12)
+  s = NumpyContextStore(index="hnsw", index_params={"m": 8, "ef_construction": 64, "ef_search": 64})
+  s.add(list(range(300)), data, [{"type": "code" if i % 2 else "text"} for i in range(300)])
+  assert s.search(embedding=data[17], k=1, mode="dense")[0].doc_id == 17
+  # Post-filtered (half the rows match) goes through the graph with a mask
+  hits = s.search(embedding=data[17], k=5, mode="dense", filters={"type": "code"})
+  assert hits[0].doc_id == 17 and all(h.doc_id % 2 for h in hits)
+  assert s.metrics()["default"]["hnsw"]["nodes"] == 300
+  with pytest.raises(ValueError):
+    NumpyContextStore(index="lsh")
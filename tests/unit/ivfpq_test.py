@@ -0,0 +1,69 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from orchestrator.context.ivfpq import IVFPQIndex, kmeans
+from orchestrator.context.numpy_context_store import NumpyContextStore
+
+
+def _clustered(n, dim, seed):
+  rng = np.random.default_rng(seed)
+  centres = rng.standard_normal((8, dim)).astype(np.float32)
+  x = centres[rng.integers(0, 8, size=n)] + 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+  return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def test_kmeans_separates_blobs():
+  x = np.concatenate([np.zeros((20, 2)), np.full((20, 2), 10.0)]).astype(np.float32)
+  cent = kmeans(x, 2)
+  assert sorted(cent[:, 0].round().tolist()) == [0.0, 10.0]
+
+
+def test_index_is_exact_until_trained_then_compresses():
+  data = _clustered(600, 16, 0)
+  idx = IVFPQIndex(nlist=8, m=4, nbits=6, nprobe=3, train_size=500)
+  for row in range(499):
+    idx.add(row, data[row])
+  assert not idx.trained and idx.search(data[7], 1)[0][1] == 7
+  for row in range(499, 600):
+    idx.add(row, data[row])
+  assert idx.trained and len(idx) == 600
+  # Codes, list ids and int32 posting entries (plus growth slack) instead of 64 float32 bytes
+  per_vector = (idx.nbytes() - idx.centroids.nbytes - idx.codebooks.nbytes) / 600
+  assert sum(lst.nbytes for lst in idx._lists) >= 4 * 600 and per_vector < 64 / 2
+  # Re-adding a row under another list moves its posting entry
+  idx.add(7, data[300])
+  assert sorted(np.concatenate([idx._list_rows(li) for li in range(len(idx._lists))]).tolist()) == list(range(600))
+  assert 7 in idx._list_rows(int(idx._list_of[300])).tolist()
+  idx.add(7, data[7])
+  # Approximate scores still find the true neighbours within a wider candidate set
+  truth = set(np.argsort(-(data @ data[7]))[:10].tolist())
+  assert len(truth & {r for _, r in idx.search(data[7], 50)}) >= 8
+  allowed = np.zeros(600, dtype=bool)
+  allowed[1::2] = True
+  assert all(r % 2 for _, r in idx.search(data[7], 10, allowed=allowed))
+  approx = idx.score_rows(data[7], np.array([7, 8], dtype=np.int64))
+  assert approx.shape == (2,) and np.isfinite(approx).all()
+  with pytest.raises(ValueError):
+    IVFPQIndex(m=5).add(0, data[0])
+  with pytest.raises(ValueError):
+    IVFPQIndex(nbits=9)
+
+
+def test_store_ivfpq_with_and_without_exact_rerank():
+  data = _clustered(400, 16, 1)
+  metas = [{"type": "code" if i % 2 else "text"} for i in range(400)]
+  params = {"nlist": 8, "m": 4, "nprobe": 8, "train_size": 256}
+  codes_only = NumpyContextStore(index="ivfpq", index_params=params)
+  rerank = NumpyContextStore(index="ivfpq", index_params={**params, "rerank": True})
+  for s in (codes_only, rerank):
+    s.add(list(range(400)), data, metas)
+  exact = rerank.search(embedding=data[11], k=5, mode="dense", rerank_factor=10)
+  assert exact[0].doc_id == 11 and exact[0].score == pytest.approx(1.0, abs=1e-5)
+  assert 11 in {h.doc_id for h in codes_only.search(embedding=data[11], k=5, mode="dense")}
+  m = codes_only.metrics()["default"]
+  assert m["ivfpq"] == {"trained": True, "exact_rerank": False}
+  assert m["vector_bytes"] < rerank.metrics()["default"]["vector_bytes"] - 400 * 16 * 4 + 1
+  # Pre-filtered queries score the matching rows from their codes
+  hits = codes_only.search(embedding=data[11], k=3, mode="dense", filters={"type": "code"})
+  assert hits and all(h.doc_id % 2 for h in hits)
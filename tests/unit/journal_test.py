@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from orchestrator.context.context_store import ContextStore
+from orchestrator.core.journal import TaskJournal
+from orchestrator.core.orchestrator import Orchestrator
+from orchestrator.core.scheduler import Scheduler, ScheduledTask
+
+
+def test_journal_recover_replays_unfinished_and_compacts(tmp_path):
+  path = str(tmp_path / "tasks.wal")
+  j = TaskJournal(path)
+  j.log_enqueue({"id": "a"}, trace_id="ta", priority="normal")
+  j.log_enqueue({"id": "b"}, trace_id="tb", priority="batch")
+  j.log_attempt("ta", attempts=1, runs=1, next_at=123.0)
+  j.log_complete("tb", "succeeded")
+  j.close()
+  # Simulate a crash mid-append
+  with open(path, "a", encoding="utf-8") as f:
+    f.write('{"op":"enqueue","trace_id":"tc"')
+  j2 = TaskJournal(path)
+  live = j2.recover()
+  assert [r["trace_id"] for r in live] == ["ta"]
+  assert live[0]["attempts"] == 1 and live[0]["next_at"] == 123.0
+  j2.close()
+  with open(path, encoding="utf-8") as f:
+    assert len(f.read().splitlines()) == 1
+
+
+def test_journal_group_commit_batches_concurrent_appends(tmp_path, monkeypatch):
+  real_fsync = os.fsync
+
+  def slow_fsync(fd: int) -> None:
+    # Appends arriving during a slow fsync must share the next one
+    time.sleep(0.02)
+    real_fsync(fd)
+
+  monkeypatch.setattr(os, "fsync", slow_fsync)
+  j = TaskJournal(str(tmp_path / "tasks.wal"))
+  threads = [threading.Thread(target=j.log_enqueue, args=({"id": str(i)},), kwargs={"trace_id": str(i)}) for i in range(32)]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  m = j.metrics()
+  j.close()
+  assert m["synced"] == 32 and m["commits"] < m["synced"]
+  with pytest.raises(ValueError):
+    j.log_complete("0", "succeeded")
+
+
+def test_scheduler_recovers_backlog_and_retry_state(tmp_path):
+  path = str(tmp_path / "tasks.wal")
+  s = Scheduler(max_concurrency=1, backoff_fn=lambda n: 0.2, journal=TaskJournal(path))
+
+  def fail(item: ScheduledTask) -> None:
+    raise RuntimeError("flaky")
+
+  s.start(fail)
+  s.enqueue({"id": "retrying"}, max_attempts=3)
+  time.sleep(0.05)
+  s.stop()
+  s._journal.close()
+
+  seen: list[tuple[str, int]] = []
+  s2 = Scheduler(max_concurrency=1, journal=TaskJournal(path))
+  recovered = s2.recover()
+  assert [r.task["id"] for r in recovered] == ["retrying"]
+  assert recovered[0].attempts == 1 and recovered[0].runs == 1
+  # The restored retry timer is still honoured
+  assert s2.metrics()["delayed"] == 1
+  s2.start(lambda item: seen.append((item.task["id"], item.runs)))
+  time.sleep(0.3)
+  s2.stop()
+  s2._journal.close()
+  assert seen == [("retrying", 2)]
+  assert TaskJournal(path).recover() == []
+
+
+def test_scheduler_retry_survives_a_closed_journal(tmp_path):
+  s = Scheduler(max_concurrency=1, backoff_fn=lambda n: 0.01, journal=TaskJournal(str(tmp_path / "tasks.wal")))
+  gate = threading.Event()
+  outcomes: list[str] = []
+
+  def fail_once(item: ScheduledTask) -> None:
+    gate.wait(5)
+    if item.runs == 1:
+      raise RuntimeError("flaky")
+
+  s.start(fail_once, on_done=lambda item, outcome, value: outcomes.append(outcome))
+  s.enqueue({"id": "t"}, max_attempts=3)
+  time.sleep(0.02)
+  # Closed mid-run (shutdown race): logging the retry must not kill the worker
+  s._journal.close()
+  gate.set()
+  deadline = time.time() + 5
+  while not outcomes and time.time() < deadline:
+    time.sleep(0.01)
+  s.stop()
+  assert outcomes == ["succeeded"]
+
+
+def test_orchestrator_restart_resumes_queued_tasks(tmp_path):
+  path = str(tmp_path / "tasks.wal")
+  o = Orchestrator(journal_path=path)
+  o.set_context_store(MagicMock(spec=ContextStore))
+  gate = threading.Event()
+  o._agent_handlers["StaticAnalysisAgent"] = lambda task, ctx=None: gate.wait(0.3) or {}
+  o.configure_pool("default", max_concurrency=1)
+  task = {"type": "AgentTask", "id": "t1", "agent": "StaticAnalysisAgent", "payload": {"target": "a.py"}}
+  o.submit_task(task)
+  queued = o.submit_task({**task, "id": "t2"})
+  time.sleep(0.05)
+  o.shutdown()
+
+  o2 = Orchestrator(journal_path=path)
+  # Nothing runs until the caller has configured the new instance and starts it
+  assert o2.queue_metrics()["workers"] == 0 and o2.get_result(queued["traceId"]) is None
+  o2.set_context_store(MagicMock(spec=ContextStore))
+  o2.start()
+  outcome = o2.result_future(queued["traceId"]).result(timeout=5)
+  # Succeeds on its first recovered run instead of failing against a half-built instance
+  assert outcome.state == "succeeded" and outcome.task_id == "t2" and outcome.attempts == 1
+  assert o2.queue_metrics()["journal"]["recovered"] >= 1
+  o2.shutdown()
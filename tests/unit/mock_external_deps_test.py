@@ -57,3 +57,53 @@ def test_context_store_add_text_documents_length_mismatch_raises() -> None:
   import pytest
   with pytest.raises(ValueError):
     store.add_text_documents(docs, [])
+
+
+def test_context_store_write_behind_batches_and_flushes():
+  fake_backend = MagicMock()
+  store = ContextStore(backend=fake_backend, write_behind=True, flush_max_rows=100, flush_interval_ms=10000)
+  for i in range(5):
+    store.add_text_documents([TextDocument(id=i, title="t", content=str(i), metadata={"origin": "TestAgent"})], [[0.0]])
+  # Re-adding an id replaces the buffered row
+  store.add_text_documents([TextDocument(id=0, title="t", content="new", metadata={"origin": "TestAgent"})], [[1.0]])
+  assert fake_backend.add.call_count == 0
+  assert store.write_metrics()["buffered"] == 5
+  store.flush()
+  fake_backend.add.assert_called_once()
+  ids, vecs, _meta = fake_backend.add.call_args[0]
+  assert ids == [1, 2, 3, 4, 0] and vecs[-1] == [1.0]
+  m = store.write_metrics()
+  assert m["flushes"] == 1 and m["rows_flushed"] == 5 and m["coalesced"] == 1
+  # Reads see earlier writes
+  store.add_text_documents([TextDocument(id=9, title="t", content="x", metadata={"origin": "TestAgent"})], [[0.0]])
+  store.search("x")
+  assert fake_backend.add.call_count == 2
+  store.close()
+
+
+def test_context_store_write_behind_size_and_time_triggers():
+  import time
+  fake_backend = MagicMock()
+  store = ContextStore(backend=fake_backend, write_behind=True, flush_max_rows=3, flush_interval_ms=20)
+  store.add([1, 2, 3], [[0.0]] * 3, [{}] * 3)
+  store.add([4], [[0.0]], [{}])
+  deadline = time.time() + 1.0
+  while store.write_metrics()["rows_flushed"] < 4 and time.time() < deadline:
+    time.sleep(0.005)
+  assert store.write_metrics()["rows_flushed"] == 4
+  store.close()
+  # After close, writes go straight through
+  store.add([5], [[0.0]], [{}])
+  assert fake_backend.add.call_args[0][0] == [5]
+
+
+def test_context_store_write_behind_surfaces_flush_errors():
+  import pytest
+  fake_backend = MagicMock()
+  fake_backend.add.side_effect = OSError("disk full")
+  store = ContextStore(backend=fake_backend, write_behind=True)
+  store.add([1], [[0.0]], [{}])
+  with pytest.raises(RuntimeError):
+    store.flush()
+  assert store.write_metrics()["error"] is None
+  store.close()
@@ -0,0 +1,116 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from orchestrator.context.context_store import ContextStore
+from orchestrator.context.models import CodeDocument
+from orchestrator.context.models import TestResultDocument as _TestResultDoc
+from orchestrator.context.numpy_context_store import NumpyContextStore, tokenize
+
+
+def _store(**kw):
+  s = NumpyContextStore(**kw)
+  s.add(
+    [1, 2, 3, 4],
+    [[1.0, 0.0, 0.0], [0.9, 0.1, 0.0], [0.0, 1.0, 0.0], [0.0]],
+    [
+      {"type": "code", "path": "src/auth/login.py"},
+      {"type": "code", "path": "src/auth/logout.py"},
+      {"type": "text", "title": "Login flow design notes"},
+      {"type": "test_result", "test_name": "test_login_redirect", "status": "failed"},
+    ],
+  )
+  return s
+
+
+def test_tokenize_splits_identifiers_and_paths():
+  assert tokenize("src/auth/login_flow.py Foo") == ["src", "auth", "login", "flow", "py", "foo"]
+
+
+def test_dense_and_sparse_rank_independently():
+  s = _store()
+  dense = s.search(embedding=[1.0, 0.0, 0.0], k=3, mode="dense")
+  # The 1-element placeholder vector never surfaces in dense results
+  assert [r.doc_id for r in dense] == [1, 2, 3]
+  assert dense[0].dense_rank == 1 and dense[0].sparse_rank == 0 and dense[0].score == pytest.approx(1.0)
+  sparse = s.search(text="login", k=10, mode="sparse")
+  assert {r.doc_id for r in sparse} == {1, 3, 4}
+  assert all(r.sparse_score > 0 and r.dense_rank == 0 for r in sparse)
+  assert s.search(text="nothing-matches", mode="sparse") == []
+
+
+def test_hybrid_rrf_and_weighted_fusion():
+  s = _store()
+  hits = s.search(text="login", embedding=[1.0, 0.0, 0.0], k=2, rrf_k=10.0)
+  top = hits[0]
+  assert top.doc_id == 1 and top.dense_rank == 1 and top.sparse_rank >= 1
+  assert top.score == pytest.approx(0.5 / (10.0 + top.dense_rank) + 0.5 / (10.0 + top.sparse_rank))
+  dense_only = s.search(text="login", embedding=[0.0, 1.0, 0.0], k=1, dense_weight=1.0, sparse_weight=0.0)
+  assert dense_only[0].doc_id == 3
+  w = _store(fusion="weighted")
+  hits = w.search(text="logout", embedding=[1.0, 0.0, 0.0], k=4, dense_weight=0.3, sparse_weight=0.7)
+  # Min-max normalized: doc 2 is the only sparse hit (1.0) and near the dense maximum
+  assert hits[0].doc_id == 2 and hits[0].score == pytest.approx(0.3 * 0.9 / np.sqrt(0.82) + 0.7, rel=1e-5)
+  with pytest.raises(ValueError):
+    NumpyContextStore(fusion="max")
+
+
+def test_filters_upserts_scopes_and_dimension_checks():
+  s = _store()
+  assert [r.doc_id for r in s.search(text="login", mode="sparse", filters={"type": "code"})] == [1]
+  assert [r.doc_id for r in s.search(text="login", mode="sparse", filters='{"status": "failed"}')] == [4]
+  with pytest.raises(ValueError):
+    s.search(text="login", filters="[1]")
+  with pytest.raises(ValueError):
+    s.search(embedding=[1.0, 0.0], mode="dense")
+  # Re-adding an id replaces its vector, metadata and terms
+  s.add([1], [[0.0, 0.0, 1.0]], [{"type": "code", "path": "src/billing.py"}])
+  assert len(s) == 4
+  assert 1 not in {r.doc_id for r in s.search(text="login", mode="sparse")}
+  assert s.search(embedding=[0.0, 0.0, 1.0], k=1, mode="dense")[0].metadata["path"] == "src/billing.py"
+  s.open_scope("other")
+  assert len(s) == 0 and s.search(text="billing") == []
+  s.open_scope("default")
+  assert len(s) == 4
+
+
+def test_growth_keeps_rows_contiguous():
+  s = NumpyContextStore()
+  rng = np.random.default_rng(0)
+  vecs = rng.standard_normal((100, 8)).astype(np.float32)
+  for i in range(100):
+    s.add([i], [vecs[i]], [{"title": f"doc {i}"}])
+  top = s.search(embedding=vecs[42], k=1, mode="dense")
+  assert top[0].doc_id == 42 and top[0].score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_context_store_facade_over_numpy_backend():
+  ctx = ContextStore(NumpyContextStore())
+  ctx.add_code_documents([CodeDocument(id=7, path="pkg/parser.py", language="python", content="def parse(): ...", metadata={"origin": "agent"})], [[0.2, 0.8]])
+  ctx.add_test_results([_TestResultDoc(id=8, test_name="test_parser_errors", status="passed", log=None, metadata={"origin": "agent"})])
+  hits = ctx.structured_query(text="parser", embedding=[0.2, 0.8], k=5, rrf_k=60.0, dense_weight=0.6, sparse_weight=0.4, rerank_factor=2)
+  assert [h.doc_id for h in hits] == [7, 8]
+  assert hits[0].dense_rank == 1 and hits[0].sparse_rank >= 1
+
+
+def test_metadata_index_plans_pre_and_post_filtering():
+  s = NumpyContextStore(prefilter_selectivity=0.2)
+  ids = list(range(50))
+  s.add(
+    ids,
+    [[1.0, float(i)] for i in ids],
+    [{"type": "test_result" if i < 5 else "code", "status": "failed" if i % 2 else "passed", "test_name": f"test_case_{i}"} for i in ids],
+  )
+  # 2 of 50 rows match: only those are scored
+  hits = s.search(text="test case", embedding=[1.0, 0.0], k=10, filters={"type": "test_result", "status": "failed"})
+  assert sorted(h.doc_id for h in hits) == [1, 3]
+  # 25 of 50 match: full scan, then mask
+  hits = s.search(embedding=[0.0, 1.0], k=3, mode="dense", filters='{"status": "failed"}')
+  assert [h.doc_id for h in hits] == [49, 47, 45]
+  assert s.search(text="test", filters={"type": "missing"}) == []
+  assert s.metrics()["default"]["filter_plans"] == {"prefilter": 1, "postfilter": 1, "empty": 1}
+  # Upserts move rows between posting lists
+  s.add([1], [[1.0, 1.0]], [{"type": "code", "status": "passed"}])
+  assert [h.doc_id for h in s.search(text="test", mode="sparse", filters={"type": "test_result", "status": "failed"})] == [3]
+  with pytest.raises(ValueError):
+    NumpyContextStore(prefilter_selectivity=1.5)
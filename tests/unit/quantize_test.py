@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from orchestrator.context.numpy_context_store import NumpyContextStore
+from orchestrator.context.quantize import int8_scales, int8_scores, quantize_int8
+
+
+def test_int8_roundtrip_and_blocked_scores_match_integer_math():
+  rng = np.random.default_rng(0)
+  x = rng.standard_normal((3000, 32)).astype(np.float32)
+  scale = int8_scales(x)
+  codes = quantize_int8(x, scale)
+  assert codes.dtype == np.int8 and np.abs(codes).max() == 127
+  assert np.abs(codes * scale - x).max() <= scale.max() / 2 + 1e-6
+  # Out-of-range values clip instead of wrapping
+  assert quantize_int8(np.full(32, 1e6, dtype=np.float32), scale).tolist() == [127] * 32
+  q = rng.integers(-127, 128, size=32).astype(np.int8)
+  expect = codes.astype(np.int64) @ q.astype(np.int64)
+  assert np.array_equal(int8_scores(codes, q).astype(np.int64), expect)
+
+
+def _unit(rng, n, dim):
+  v = rng.standard_normal((n, dim)).astype(np.float32)
+  return v / np.linalg.norm(v, axis=1, keepdims=True)
+
+
+def test_int8_scope_calibrates_then_searches_codes():
+  rng = np.random.default_rng(1)
+  data = _unit(rng, 500, 32)
+  s = NumpyContextStore()
+  s.open_scope("code", json.dumps({"quantization": "int8", "calibrate_rows": 200}))
+  s.add(list(range(150)), data[:150], [{"type": "code"}] * 150)
+  assert s.metrics()["code"]["int8"] == {"calibrated": False, "exact_rerank": False}
+  s.add(list(range(150, 500)), data[150:], [{"type": "code" if i % 2 else "text"} for i in range(150, 500)])
+  m = s.metrics()["code"]
+  assert m["int8"]["calibrated"] and m["vector_bytes"] == 500 * 32
+  hits = s.search(embedding=data[321], k=5, mode="dense", rerank_factor=4)
+  # Rescored in float32 from dequantized rows: close to, not exactly, the cosine
+  assert hits[0].doc_id == 321 and hits[0].score == pytest.approx(1.0, abs=0.02)
+  filtered = s.search(embedding=data[321], k=3, mode="dense", filters={"type": "code"})
+  assert filtered[0].doc_id == 321 and all(h.doc_id % 2 for h in filtered if h.doc_id >= 150)
+  # Vectors added after calibration are encoded directly
+  s.add([999], [data[0] * 3.0], [{"type": "code"}])
+  assert s.search(embedding=data[0], k=2, mode="dense")[0].doc_id in (0, 999)
+  # Other scopes keep float32
+  s.open_scope("default")
+  assert "int8" not in s.metrics()["default"]
+
+
+def test_int8_scope_exact_rerank_and_setting_conflicts():
+  rng = np.random.default_rng(2)
+  data = _unit(rng, 300, 16)
+  s = NumpyContextStore()
+  s.open_scope("exact", json.dumps({"quantization": "int8", "keep_float32": True, "calibrate_rows": 100}))
+  s.add(list(range(300)), data, [{}] * 300)
+  hits = s.search(embedding=data[42], k=3, mode="dense")
+  assert hits[0].doc_id == 42 and hits[0].score == pytest.approx(1.0, abs=1e-5)
+  assert s.metrics()["exact"]["vector_bytes"] == 300 * 16 * 5
+  s.open_scope("exact", json.dumps({"quantization": "int8"}))
+  with pytest.raises(ValueError):
+    s.open_scope("exact", json.dumps({"quantization": "none"}))
+  with pytest.raises(ValueError):
+    s.open_scope("bad", json.dumps({"quantization": "int4"}))
+  with pytest.raises(ValueError):
+    s.open_scope("bad", "[1]")
+  with pytest.raises(ValueError):
+    NumpyContextStore(index="hnsw").open_scope("q", json.dumps({"quantization": "int8"}))
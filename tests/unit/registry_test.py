@@ -1,6 +1,9 @@
 from __future__ import annotations
 
 import time
+
+import pytest
+
 from orchestrator.core.registry import AgentRegistry
 
 
@@ -72,3 +75,112 @@ def test_registry_skips_down_agents():
   assert r.select_for("A1") == "A2"
 
 
+def test_agents_with_capability() -> None:
+  r = AgentRegistry()
+  r.register("B", ["x", "y"])
+  r.register("A", ["x"])
+  assert r.agents_with_capability("x") == ["A", "B"]
+  assert r.agents_with_capability("z") == []
+
+
+def test_select_for_capability_uses_index_and_lazy_updates() -> None:
+  r = AgentRegistry()
+  for i in range(300):
+    r.register(f"T{i:03d}", ["testexec"] if i % 2 else ["analysis"])
+    r.update_status(f"T{i:03d}", status="idle", load=i)
+  assert r.select_for_capability("testexec") == "T001"
+  assert r.select_for_capability("analysis") == "T000"
+  assert r.select_for_capability("nope") == ""
+  # Busy agents only win when no idle agent has the capability
+  r.update_status("T001", status="busy", load=0)
+  assert r.select_for_capability("testexec") == "T003"
+  r.update_status("T003", status="down")
+  assert r.select_for_capability("testexec") == "T005"
+  # Many updates leave stale entries behind; heaps stay bounded
+  for n in range(1000):
+    r.update_status("T005", load=n)
+  assert len(r._heaps["testexec"]) <= 2 * 150 + 16
+  assert r.select_for_capability("testexec") == "T007"
+
+
+def test_select_for_capability_skips_expired_heartbeats_until_refreshed() -> None:
+  r = AgentRegistry()
+  r.register("A", ["x"])
+  r.register("B", ["x"])
+  r.update_status("B", load=5)
+  a = r.get("A")
+  assert a is not None
+  a.last_heartbeat = time.time() - 120
+  assert r.select_for_capability("x") == "B"
+  r.update_heartbeat("A")
+  assert r.select_for_capability("x") == "A"
+
+
+def test_heartbeat_expiry_transitions_once_and_emits_events() -> None:
+  now = [1000.0]
+  r = AgentRegistry(heartbeat_ttl_s=30.0, clock=lambda: now[0])
+  events: list[tuple[str, str]] = []
+  r.add_listener(lambda name, event: events.append((name, event)))
+  r.register("A", ["x"])
+  r.register("B", ["x"])
+  r.update_status("A", load=0)
+  r.update_status("B", load=1)
+  now[0] += 20
+  r.update_heartbeat("B")
+  now[0] += 15
+  # A lapsed at t=1030; B's original deadline was re-armed by its heartbeat
+  assert r.select_for_capability("x") == "B"
+  assert r.select_for("A") == "B" and not r.is_active("A")
+  assert [a.name for a in r.list_active()] == ["B"]
+  r.expire()
+  assert events == [("A", "stale")]
+  r.update_heartbeat("A")
+  assert events[-1] == ("A", "alive") and r.select_for_capability("x") == "A"
+  now[0] += 100
+  assert sorted(r.expire()) == ["A", "B"]
+  assert r.select_for("") == "" and len(events) == 4
+
+
+def test_least_expected_routing_prefers_fast_and_unloaded_instances() -> None:
+  r = AgentRegistry(routing="least_expected")
+  for name in ("fast", "slow", "cold"):
+    r.register(name, ["testexec"])
+  r.begin("fast")
+  r.record_service("fast", 0.1, wait_s=0.01)
+  r.end("fast")
+  r.begin("slow")
+  r.record_service("slow", 2.0)
+  r.end("slow")
+  # The unmeasured instance is scored with the mean of the others (1.05s)
+  assert r.select_for_capability("testexec") == "fast"
+  for _ in range(10):
+    r.begin("fast")
+  # 11 * 0.1s in flight on fast now exceeds the cold prior
+  assert r.select_for_capability("testexec") == "cold"
+  stats = r.agent_stats()
+  assert stats["fast"]["inflight"] == 10 and stats["slow"]["service_ms_p95"] == 2000.0
+  assert "cold" not in stats
+  with pytest.raises(ValueError):
+    AgentRegistry(routing="random")
+
+
+def test_select_affine_is_sticky_and_moves_few_keys() -> None:
+  r = AgentRegistry()
+  for name in ("i1", "i2", "i3"):
+    r.register(name, ["analysis"])
+  keys = [f"src/mod_{n}.py" for n in range(300)]
+  before = {k: r.select_affine(k, "analysis") for k in keys}
+  assert set(before.values()) == {"i1", "i2", "i3"}
+  assert all(r.select_affine(k, "analysis") == v for k, v in before.items())
+  # A leaving instance only gives up its own keys
+  r.update_status("i2", status="down")
+  after = {k: r.select_affine(k, "analysis") for k in keys}
+  assert all(after[k] == v for k, v in before.items() if v != "i2")
+  assert "i2" not in after.values()
+  # A joining instance takes roughly its share, and only from the others
+  r.update_status("i2", status="idle")
+  r.register("i4", ["analysis"])
+  joined = {k: r.select_affine(k, "analysis") for k in keys}
+  moved = [k for k in keys if joined[k] != before[k]]
+  assert all(joined[k] == "i4" for k in moved) and 30 < len(moved) < 150
+  assert r.select_affine("x.py", "nope") == ""
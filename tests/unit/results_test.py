@@ -0,0 +1,113 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from orchestrator.context.context_store import ContextStore
+from orchestrator.core.orchestrator import Orchestrator
+from orchestrator.core.results import ResultsTable
+
+
+def test_results_table_future_and_callback():
+  t = ResultsTable()
+  t.track("a", task_id="t1", agent="X")
+  assert t.get("a").state == "pending"
+  fut = t.future("a")
+  seen = []
+  t.add_done_callback("a", seen.append)
+  t.complete("a", "succeeded", attempts=1)
+  assert fut.result(timeout=1).state == "succeeded"
+  assert seen and seen[0].task_id == "t1"
+  # Late subscribers are served immediately
+  assert t.future("a").result(timeout=0).state == "succeeded"
+  with pytest.raises(KeyError):
+    t.future("unknown")
+  with pytest.raises(ValueError):
+    t.complete("a", "pending")
+
+
+def test_results_table_bounded_retention():
+  t = ResultsTable(max_entries=3)
+  for i in range(10):
+    t.track(str(i))
+    t.complete(str(i), "dropped")
+  m = t.metrics()
+  assert m["retained"] == 3 and m["evicted"] == 7
+  assert m["completed"]["dropped"] == 10
+  assert t.get("0") is None and t.get("9") is not None
+
+
+def test_results_table_ttl_eviction():
+  t = ResultsTable(ttl_s=0.01)
+  t.track("a")
+  t.complete("a", "failed", error="boom")
+  time.sleep(0.02)
+  assert t.get("a") is None
+
+
+def _orchestrator() -> Orchestrator:
+  o = Orchestrator()
+  o.set_context_store(MagicMock(spec=ContextStore))
+  o._scheduler._backoff_fn = lambda n: 0.01
+  return o
+
+
+def test_orchestrator_result_by_trace_id():
+  o = _orchestrator()
+  out = o.submit_task({"type": "AgentTask", "id": "t1", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}})
+  outcome = o.result_future(out["traceId"]).result(timeout=5)
+  assert outcome.state == "succeeded"
+  assert outcome.result is not None and outcome.result.id == "res-t1"
+  assert outcome.attempts == 1
+  assert o.get_result(out["traceId"]) == outcome
+  assert o.queue_metrics()["results"]["completed"]["succeeded"] >= 1
+
+
+def test_orchestrator_reports_failed_and_dropped():
+  o = _orchestrator()
+
+  def boom(task, ctx=None):
+    raise RuntimeError("nope")
+
+  o._agent_handlers["CodeGenAgent"] = boom
+  out = o.submit_task({"type": "AgentTask", "id": "t2", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}})
+  outcome = o.result_future(out["traceId"]).result(timeout=5)
+  assert outcome.state == "failed"
+  assert outcome.attempts == 3
+  assert "nope" in (outcome.error or "")
+
+  o._scheduler._backoff_fn = lambda n: 60.0
+  out2 = o.submit_task({"type": "AgentTask", "id": "t3", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}})
+  time.sleep(0.05)
+  # Task is parked on the retry timer; stopping drops it
+  o.shutdown()
+  assert o.get_result(out2["traceId"]).state == "dropped"
+
+
+def test_orchestrator_coalesces_duplicate_submissions():
+  o = Orchestrator(derive_idempotency_keys=True)
+  o.set_context_store(MagicMock(spec=ContextStore))
+  calls = {"n": 0}
+  gate = threading.Event()
+  real = o._agent_handlers["CodeGenAgent"]
+
+  def counted(task, ctx=None):
+    calls["n"] += 1
+    gate.wait(2)
+    return real(task)
+
+  o._agent_handlers["CodeGenAgent"] = counted
+  task = {"type": "AgentTask", "id": "t1", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}}
+  first = o.submit_task(task)
+  dup = o.submit_task({**task, "id": "t2"})
+  assert first["coalesced"] is False and dup["coalesced"] is True
+  assert dup["traceId"] == first["traceId"]
+  gate.set()
+  outcome = o.result_future(dup["traceId"]).result(timeout=2)
+  assert outcome.state == "succeeded" and calls["n"] == 1
+  keyed = {**task, "id": "t3", "constraints": {"idempotencyKey": "gw-1"}}
+  a = o.submit_task(keyed)
+  b = o.submit_task({**keyed, "payload": {"action": "create", "target": "b.py"}})
+  assert b["traceId"] == a["traceId"]
+  o.shutdown()
@@ -1,3 +1,4 @@
+import threading
 import time
 from typing import Any, Dict, List
 
@@ -22,6 +23,70 @@ def test_router_selects_registered_agent() -> None:
   assert m["stopped"] is False
 
 
+def test_orchestrator_records_service_times_for_routing() -> None:
+  o = Orchestrator(routing="least_expected")
+  o._agent_handlers["StaticAnalysisAgent"] = lambda task, ctx=None: time.sleep(0.02) or {}
+  out = o.submit_task({"type": "AgentTask", "id": "t1", "agent": "StaticAnalysisAgent", "payload": {"target": "a.py"}})
+  o.result_future(out["traceId"]).result(timeout=5)
+  stats = o.queue_metrics()["agents"]["StaticAnalysisAgent"]
+  o.shutdown()
+  assert stats["service_ms_ewma"] >= 20.0 and stats["inflight"] == 0 and stats["wait_ms_ewma"] >= 0.0
+
+
+def test_router_affinity_keeps_target_on_one_agent() -> None:
+  o = Orchestrator(affinity=True)
+
+  def route(target: str) -> str:
+    # Routing counts load until the task ends; release it as a finished task would
+    agent = o._route_agent({"agent": "", "payload": {"target": target}})
+    o._registry.end(agent)
+    return agent
+
+  picks = {route(f"pkg/m{i}.py") for i in range(3) for _ in range(5)}
+  same = {route("pkg/m0.py") for _ in range(5)}
+  o.shutdown()
+  assert len(same) == 1 and same <= picks
+
+
+def _gate_all_agents(o: Orchestrator) -> threading.Event:
+  gate = threading.Event()
+  for name in ("CodeGenAgent", "TestAgent", "StaticAnalysisAgent", "DebugAgent"):
+    o._agent_handlers[name] = lambda task, ctx=None: gate.wait(5) and {}
+  return gate
+
+
+def _inflight(o: Orchestrator) -> Dict[str, int]:
+  return {name: st.inflight for name, st in o._registry._stats.items() if st.inflight}
+
+
+def test_router_counts_load_for_a_burst_before_dispatch() -> None:
+  o = Orchestrator(routing="least_expected", queue_capacity=8, admission="reject")
+  gate = _gate_all_agents(o)
+  outs = [o.submit_task({"type": "AgentTask", "id": f"t{i}", "agent": "", "payload": {"mode": "generate"}}) for i in range(12)]
+  accepted = [out["traceId"] for out in outs if out["accepted"]]
+  # Every routing decision counts immediately, so the burst spreads; rejected tasks release theirs
+  assert len(accepted) == 8 and sorted(_inflight(o).values()) == [2, 2, 2, 2]
+  gate.set()
+  for trace_id in accepted:
+    o.result_future(trace_id).result(timeout=5)
+  assert _inflight(o) == {}
+  o.shutdown()
+
+
+def test_router_affinity_bounds_a_hot_target_burst() -> None:
+  o = Orchestrator(affinity=True)
+  gate = _gate_all_agents(o)
+  outs = [o.submit_task({"type": "AgentTask", "id": f"h{i}", "agent": "", "payload": {"mode": "generate", "target": "hot.py"}}) for i in range(40)]
+  loads = _inflight(o)
+  # Bounded loads: the owner stops at ceil(1.25 * 40 / 4) = 13 and the rest spill clockwise
+  assert sum(loads.values()) == 40 and max(loads.values()) <= 13 and len(loads) >= 3
+  gate.set()
+  for out in outs:
+    o.result_future(out["traceId"]).result(timeout=5)
+  assert _inflight(o) == {}
+  o.shutdown()
+
+
 def test_retry_backoff() -> None:
   # Create a fresh Scheduler with a flaky handler
   from orchestrator.core.scheduler import Scheduler
@@ -70,3 +135,48 @@ def test_budget_enforcement() -> None:
   s.stop()
   # Should have been called once only due to budget drop
   assert len(call_count) == 1
+
+
+def test_orchestrator_pools_by_capability() -> None:
+  o = Orchestrator()
+  o.configure_pool("analysis", max_concurrency=3, capabilities=["analysis"])
+  m = o.queue_metrics()
+  assert m["pools"]["analysis"]["max_concurrency"] == 3
+  assert m["pools"]["sandbox"]["max_concurrency"] == 2
+  assert o._scheduler.pool_for("StaticAnalysisAgent") == "analysis"
+  assert o._scheduler.pool_for("TestAgent") == "sandbox"
+  assert o._scheduler.pool_for("CodeGenAgent") == "default"
+
+
+def test_orchestrator_submit_reports_queue_full() -> None:
+  o = Orchestrator(queue_capacity=1, admission="reject")
+  o._agent_handlers["StaticAnalysisAgent"] = lambda task, ctx=None: time.sleep(0.2) or {}
+  task = {"type": "AgentTask", "id": "t-a", "agent": "StaticAnalysisAgent", "payload": {"target": "a.py"}}
+  assert o.submit_task(task)["accepted"] is True
+  out = o.submit_task({**task, "id": "t-b"})
+  assert out["accepted"] is False
+  assert out["reason"] == "queue_full"
+  assert out["retryAfterMs"] >= 50
+  assert o.queue_metrics()["admission"]["rejected"] == 1
+  o.shutdown()
+
+
+def test_orchestrator_passes_deadline_to_agent() -> None:
+  o = Orchestrator()
+  seen: List[Any] = []
+
+  def capture(task: Dict[str, Any], ctx: Any = None) -> Dict[str, Any]:
+    token = ctx.get("cancel_token")
+    seen.append((ctx.get("trace_id"), token.remaining_s()))
+    token.cancel()
+    token.raise_if_cancelled()
+    return {}
+
+  o._agent_handlers["StaticAnalysisAgent"] = capture
+  task = {"type": "AgentTask", "id": "t-d", "agent": "StaticAnalysisAgent", "payload": {"target": "a.py"}, "constraints": {"timeoutMs": 5000}}
+  out = o.submit_task(task)
+  outcome = o.result_future(out["traceId"]).result(timeout=2)
+  o.shutdown()
+  assert seen[0][0] == out["traceId"] and 0 < seen[0][1] <= 5
+  # Cancellation is terminal: no retries
+  assert outcome.state == "budget_exceeded" and outcome.attempts == 1
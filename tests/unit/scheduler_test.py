@@ -1,3 +1,4 @@
+import threading
 import time
 import pytest
 
@@ -54,3 +55,319 @@ def test_scheduler_drops_when_budget_exceeded():
   assert calls["n"] == 1
 
 
+def test_scheduler_backoff_does_not_block_ready_tasks():
+  seen: list[str] = []
+
+  def handler(item: ScheduledTask) -> None:
+    seen.append(item.task["id"])
+    if item.task["id"] == "slow-retry":
+      raise RuntimeError("retry later")
+
+  # Long backoff; with a single worker the ready task must still run promptly
+  s = Scheduler(max_concurrency=1, backoff_fn=lambda n: 5.0)
+  s.start(handler)
+  s.enqueue({"type": "AgentTask", "id": "slow-retry"}, max_attempts=2)
+  time.sleep(0.05)
+  s.enqueue({"type": "AgentTask", "id": "ready"})
+  time.sleep(0.1)
+  m = s.metrics()
+  s.stop()
+  assert seen == ["slow-retry", "ready"]
+  assert m["delayed"] == 1
+
+
+def test_scheduler_priority_classes_and_metrics():
+  seen: list[str] = []
+  gate = {"open": False}
+
+  def handler(item: ScheduledTask) -> None:
+    while not gate["open"]:
+      time.sleep(0.005)
+    seen.append(item.task["id"])
+
+  s = Scheduler(max_concurrency=1)
+  s.start(handler)
+  # First task blocks the only worker while the backlog builds up
+  s.enqueue({"id": "first"}, priority="batch")
+  time.sleep(0.02)
+  for i in range(5):
+    s.enqueue({"id": f"b{i}"}, priority="batch", tenant="bulk")
+  s.enqueue({"id": "i0"}, priority="interactive", tenant="user")
+  m = s.metrics()
+  assert m["classes"]["batch"]["depth"] == 5
+  assert m["classes"]["interactive"]["depth"] == 1
+  gate["open"] = True
+  time.sleep(0.1)
+  s.stop()
+  # The interactive task overtakes the queued batch scans
+  assert seen[:2] == ["first", "i0"]
+  m = s.metrics()
+  assert m["classes"]["batch"]["dispatched"] == 6
+  assert m["classes"]["interactive"]["wait_ms_max"] > 0.0
+
+
+def test_scheduler_rejects_unknown_priority():
+  s = Scheduler(max_concurrency=1)
+  with pytest.raises(ValueError):
+    s.enqueue({"id": "x"}, priority="urgent")
+
+
+def test_scheduler_pools_isolate_slow_agents():
+  seen: list[str] = []
+  release = {"slow": False}
+
+  def handler(item: ScheduledTask) -> None:
+    if item.agent == "Slow":
+      while not release["slow"]:
+        time.sleep(0.005)
+    seen.append(item.task["id"])
+
+  s = Scheduler(max_concurrency=1)
+  s.configure_pool("heavy", max_concurrency=1, agents=["Slow"])
+  s.start(handler)
+  s.enqueue({"id": "s1", "agent": "Slow"})
+  s.enqueue({"id": "f1", "agent": "Fast"})
+  time.sleep(0.05)
+  # Fast work completes while the heavy pool is still occupied
+  assert seen == ["f1"]
+  m = s.metrics()
+  assert m["pools"]["heavy"]["busy"] == 1
+  assert m["pools"]["default"]["completed"] == 1
+  release["slow"] = True
+  time.sleep(0.05)
+  s.stop()
+  assert seen == ["f1", "s1"]
+
+
+def test_scheduler_pool_resize_at_runtime():
+  s = Scheduler(max_concurrency=1)
+  s.start(lambda item: None)
+  s.configure_pool("default", max_concurrency=3)
+  assert s.metrics()["pools"]["default"]["workers"] == 3
+  s.configure_pool("default", max_concurrency=1)
+  time.sleep(0.05)
+  # Idle surplus workers notice the smaller cap and exit
+  assert s.metrics()["pools"]["default"]["workers"] == 1
+  with pytest.raises(ValueError):
+    s.configure_pool("default", max_concurrency=0)
+  s.stop()
+
+
+def _blocked_scheduler(**kwargs):
+  gate = {"open": False}
+
+  def handler(item: ScheduledTask) -> None:
+    while not gate["open"]:
+      time.sleep(0.005)
+
+  s = Scheduler(max_concurrency=1, **kwargs)
+  dropped: list[str] = []
+  s.start(handler, on_done=lambda item, outcome, value: dropped.append(item.task["id"]) if outcome == "dropped" else None)
+  return s, gate, dropped
+
+
+def test_scheduler_capacity_reject_with_retry_hint():
+  from orchestrator.core.errors import QueueFullError
+  s, gate, _ = _blocked_scheduler(capacity=2, admission="reject")
+  s.enqueue({"id": "a"})
+  s.enqueue({"id": "b"})
+  with pytest.raises(QueueFullError) as ei:
+    s.enqueue({"id": "c"})
+  assert ei.value.retry_after_s > 0
+  m = s.metrics()["admission"]
+  assert m["rejected"] == 1 and m["outstanding"] == 2 and m["capacity"] == 2
+  gate["open"] = True
+  time.sleep(0.05)
+  # Slots free up once tasks finish
+  s.enqueue({"id": "d"})
+  s.stop()
+
+
+def test_scheduler_capacity_shed_lowest_priority():
+  from orchestrator.core.errors import QueueFullError
+  s, gate, dropped = _blocked_scheduler(capacity=2, admission="shed")
+  s.enqueue({"id": "running"}, priority="batch")
+  time.sleep(0.02)
+  s.enqueue({"id": "queued-batch"}, priority="batch")
+  # Higher priority evicts the queued batch task
+  s.enqueue({"id": "urgent"}, priority="interactive")
+  assert dropped == ["queued-batch"]
+  # Nothing lower than batch to shed: the new batch task is refused
+  with pytest.raises(QueueFullError):
+    s.enqueue({"id": "more-batch"}, priority="batch")
+  assert s.metrics()["admission"]["shed"] == 1
+  gate["open"] = True
+  s.stop()
+
+
+def test_scheduler_capacity_block_waits_for_slot():
+  from orchestrator.core.errors import QueueFullError
+  s, gate, _ = _blocked_scheduler(capacity=1, admission="block", admission_timeout_s=0.05)
+  s.enqueue({"id": "a"})
+  with pytest.raises(QueueFullError):
+    s.enqueue({"id": "b"})
+  # Once the running task finishes, a blocked submitter gets the freed slot
+  s._admission_timeout_s = 1.0
+  threading.Timer(0.02, lambda: gate.__setitem__("open", True)).start()
+  t0 = time.time()
+  s.enqueue({"id": "c"})
+  assert time.time() - t0 < 1.0
+  s.stop()
+
+
+def test_scheduler_edf_runs_earliest_deadline_first():
+  seen: list[str] = []
+  gate = threading.Event()
+
+  def handler(item: ScheduledTask) -> None:
+    gate.wait(1)
+    seen.append(item.task["id"])
+
+  s = Scheduler(max_concurrency=1, ordering="edf")
+  s.start(handler)
+  s.enqueue({"id": "blocker"})
+  time.sleep(0.02)
+  now = time.time()
+  for tid, dl in [("late", now + 30), ("none", None), ("soon", now + 10)]:
+    s.enqueue({"id": tid}, deadline=dl)
+  gate.set()
+  time.sleep(0.1)
+  s.stop()
+  # Tasks without a deadline go last
+  assert seen == ["blocker", "soon", "late", "none"]
+  with pytest.raises(ValueError):
+    Scheduler(ordering="lifo")
+
+
+def test_scheduler_critical_path_runs_highest_rank_first():
+  seen: list[str] = []
+  gate = threading.Event()
+
+  def handler(item: ScheduledTask) -> None:
+    gate.wait(1)
+    seen.append(item.task["id"])
+
+  s = Scheduler(max_concurrency=1, ordering="critical_path")
+  s.start(handler)
+  s.enqueue({"id": "blocker"})
+  time.sleep(0.02)
+  for tid, rank in [("short", 1.0), ("long", 30.0), ("mid", 5.0)]:
+    s.enqueue({"id": tid}, rank=rank)
+  gate.set()
+  time.sleep(0.1)
+  s.stop()
+  assert seen == ["blocker", "long", "mid", "short"]
+
+
+def test_scheduler_skips_tasks_expired_in_queue():
+  outcomes: dict[str, str] = {}
+  ran: list[str] = []
+  gate = threading.Event()
+
+  def handler(item: ScheduledTask) -> None:
+    ran.append(item.task["id"])
+    gate.wait(1)
+
+  s = Scheduler(max_concurrency=1)
+  s.start(handler, on_done=lambda item, outcome, value: outcomes.__setitem__(item.task["id"], outcome))
+  s.enqueue({"id": "blocker"})
+  s.enqueue({"id": "stale"}, deadline=time.time() + 0.02)
+  time.sleep(0.05)
+  gate.set()
+  time.sleep(0.05)
+  s.stop()
+  assert ran == ["blocker"]
+  assert outcomes["stale"] == "budget_exceeded"
+  assert s.metrics()["pools"]["default"]["expired"] == 1
+
+
+def test_scheduler_does_not_retry_cancelled_handler():
+  calls = {"n": 0}
+  outcomes: list[str] = []
+
+  def handler(item: ScheduledTask) -> None:
+    calls["n"] += 1
+    item.cancel.cancel()
+    item.cancel.raise_if_cancelled()
+
+  s = Scheduler(max_concurrency=1, backoff_fn=lambda n: 0.01)
+  s.start(handler, on_done=lambda item, outcome, value: outcomes.append(outcome))
+  s.enqueue({"id": "t"}, max_attempts=3)
+  time.sleep(0.1)
+  s.stop()
+  assert calls["n"] == 1 and outcomes == ["budget_exceeded"]
+
+
+def test_scheduler_does_not_retry_wrapped_budget_or_cancellation_errors():
+  from concurrent.futures import CancelledError
+
+  from orchestrator.core.errors import BudgetExceededError
+  calls: dict[str, int] = {}
+  outcomes: dict[str, str] = {}
+
+  def handler(item: ScheduledTask) -> None:
+    tid = item.task["id"]
+    calls[tid] = calls.get(tid, 0) + 1
+    if tid == "child":
+      # A child handler's budget error surfacing through a wrapper
+      raise RuntimeError("child agent failed") from BudgetExceededError("task deadline exceeded")
+    if tid == "handling":
+      try:
+        raise BudgetExceededError("task cancelled")
+      except BudgetExceededError:
+        raise ValueError("validation failed")
+    raise CancelledError()
+
+  s = Scheduler(max_concurrency=1, backoff_fn=lambda n: 0.01)
+  s.start(handler, on_done=lambda item, outcome, value: outcomes.__setitem__(item.task["id"], outcome))
+  for tid in ("child", "handling", "cancelled"):
+    s.enqueue({"id": tid}, max_attempts=3)
+  time.sleep(0.1)
+  s.stop()
+  assert calls == {"child": 1, "handling": 1, "cancelled": 1}
+  assert outcomes == {"child": "budget_exceeded", "handling": "budget_exceeded", "cancelled": "budget_exceeded"}
+
+
+def test_cancel_token_deadline_and_cancel():
+  from orchestrator.core.cancellation import CancelToken
+  from orchestrator.core.errors import BudgetExceededError
+  t = CancelToken(time.time() + 60)
+  assert not t.cancelled and 0 < t.remaining_s() <= 60
+  t.cancel()
+  assert t.cancelled and t.event.is_set()
+  with pytest.raises(BudgetExceededError):
+    t.raise_if_cancelled()
+  expired = CancelToken(time.time() - 1)
+  assert expired.cancelled and expired.remaining_s() == 0.0
+  assert CancelToken().remaining_s() is None
+
+
+def test_scheduler_coalesces_idempotent_tasks():
+  ran: list[str] = []
+  gate = threading.Event()
+  outcomes: list[str] = []
+
+  def handler(item: ScheduledTask) -> None:
+    gate.wait(1)
+    ran.append(item.trace_id)
+    if item.task.get("fail"):
+      raise RuntimeError("boom")
+
+  s = Scheduler(max_concurrency=1, idempotency_ttl_s=60)
+  s.start(handler, on_done=lambda item, outcome, value: outcomes.append(outcome))
+  first = s.enqueue({"id": "a"}, idempotency_key="k")
+  # Duplicates while in flight and after success share the first task
+  assert s.enqueue({"id": "b"}, idempotency_key="k") == first
+  gate.set()
+  time.sleep(0.05)
+  assert s.enqueue({"id": "c"}, idempotency_key="k") == first
+  assert ran == [first] and outcomes == ["succeeded"]
+  m = s.metrics()["idempotency"]
+  assert m["coalesced"] == 2 and m["cached"] == 1 and m["inflight"] == 0
+  # Failures are not cached
+  failed = s.enqueue({"id": "f", "fail": True}, max_attempts=1, idempotency_key="f")
+  time.sleep(0.05)
+  assert s.enqueue({"id": "g"}, idempotency_key="f") != failed
+  s.forget_idempotency_key("k")
+  assert s.enqueue({"id": "d"}, idempotency_key="k") != first
+  s.stop()
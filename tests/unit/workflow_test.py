@@ -0,0 +1,143 @@
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from orchestrator.context.context_store import ContextStore
+from orchestrator.core.orchestrator import Orchestrator
+from orchestrator.core.workflow import DurationEstimates, WorkflowNode, WorkflowTracker
+
+
+def _node(trace_id, deps=(), parent="p"):
+  return WorkflowNode(trace_id=trace_id, task={"id": trace_id}, workflow_id="w", parent=parent, priority="normal", deps=list(deps))
+
+
+def test_tracker_releases_by_dependencies_and_fanout():
+  t = WorkflowTracker(max_fanout=2)
+  released = t.add_children("p", [_node("a"), _node("b"), _node("c"), _node("d", ["a", "b"])])
+  # Three roots are runnable but only two may be in flight for parent p
+  assert [n.trace_id for n in released] == ["a", "b"]
+  more, cancelled = t.on_done("a", True)
+  assert [n.trace_id for n in more] == ["c"] and cancelled == []
+  more, _ = t.on_done("b", True)
+  assert [n.trace_id for n in more] == ["d"]
+  assert t.metrics()["released"] == 2
+  with pytest.raises(ValueError):
+    t.add_children("q", [_node("x", ["missing"], parent="q")])
+
+
+def test_tracker_cancels_dependents_of_failed_node():
+  t = WorkflowTracker()
+  t.add_children("p", [_node("a"), _node("b", ["a"]), _node("c", ["b"]), _node("z")])
+  released, cancelled = t.on_done("a", False)
+  assert released == []
+  assert sorted(n.trace_id for n in cancelled) == ["b", "c"]
+  assert t.metrics() == {"pending": 0, "released": 1, "completed": 1, "cancelled": 2, "max_fanout": 8, "duration_estimates_s": {}}
+
+
+def test_tracker_rejects_cyclic_children_without_leaking_nodes():
+  t = WorkflowTracker()
+  with pytest.raises(ValueError, match="cycle"):
+    t.add_children("p", [_node("z"), _node("a", ["b"]), _node("b", ["c"]), _node("c", ["a"]), _node("d", ["a"])])
+  # Nothing from the rejected batch was registered, so the same ids can be added again
+  assert t.metrics()["pending"] == 0 and t.workflow_of("a") == "a"
+  released = t.add_children("p", [_node("a"), _node("b", ["a"])])
+  assert [n.trace_id for n in released] == ["a"] and t.metrics()["pending"] == 1
+
+
+def test_tracker_ranks_by_critical_path_and_releases_longest_first():
+  est = DurationEstimates(initial={"TestAgent": 10.0, "StaticAnalysisAgent": 1.0})
+  t = WorkflowTracker(max_fanout=1, estimates=est)
+
+  def node(trace_id, agent, deps=()):
+    return WorkflowNode(trace_id=trace_id, task={"id": trace_id, "agent": agent}, workflow_id="w", parent="p", priority="normal", deps=list(deps))
+
+  released = t.add_children("p", [node("lint", "StaticAnalysisAgent"), node("gen", "StaticAnalysisAgent"), node("run", "TestAgent", ["gen"])])
+  # gen heads the 11s chain, so it goes first even though lint was listed first
+  assert [(n.trace_id, n.rank) for n in released] == [("gen", 11.0)]
+  more, _ = t.on_done("gen", True)
+  assert [(n.trace_id, n.rank) for n in more] == [("run", 10.0)]
+  est.observe("TestAgent", 20.0)
+  assert est.estimate("TestAgent") == pytest.approx(12.0) and est.estimate("unseen") == 1.0
+
+
+def _result(task, new_tasks=None):
+  payload = {"newTasks": new_tasks} if new_tasks else {}
+  return {"type": "AgentResult", "id": f"res-{task['id']}", "parentId": task["id"], "agent": task["agent"], "payload": payload}
+
+
+def test_orchestrator_runs_new_tasks_as_dag():
+  o = Orchestrator()
+  o.set_context_store(MagicMock(spec=ContextStore))
+  order: list[str] = []
+  done = threading.Event()
+  outcomes: dict[str, str] = {}
+
+  def codegen(task, ctx=None):
+    order.append(task["id"])
+    return _result(task, [
+      {"id": "gen", "agent": "TestAgent", "payload": {"mode": "generate", "target": "a.py"}},
+      {"id": "run", "agent": "TestAgent", "payload": {"mode": "execute"}, "dependsOn": ["gen"]},
+      {"id": "lint", "agent": "StaticAnalysisAgent", "payload": {"target": "a.py"}},
+    ])
+
+  def test_agent(task, ctx=None):
+    time.sleep(0.02)
+    order.append(task["id"])
+    if task["payload"]["mode"] == "execute":
+      return _result(task, [{"agent": "DebugAgent", "payload": {"errorLog": "boom"}}])
+    return _result(task)
+
+  def debug(task, ctx=None):
+    order.append(task["id"])
+    done.set()
+    return _result(task)
+
+  o._agent_handlers.update({"CodeGenAgent": codegen, "TestAgent": test_agent, "StaticAnalysisAgent": lambda task, ctx=None: order.append(task["id"]) or _result(task), "DebugAgent": debug})
+  o.add_completion_listener(lambda trace_id, outcome, result, error: outcomes.__setitem__(trace_id, outcome))
+  o.submit_task({"type": "AgentTask", "id": "t1", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}})
+  assert done.wait(5)
+  o.shutdown()
+  assert order[0] == "t1"
+  assert order.index("t1/gen") < order.index("t1/run") < order.index("t1/run/0")
+  assert "t1/lint" in order
+  assert o.queue_metrics()["workflows"]["completed"] == 4
+
+
+def test_orchestrator_cancels_dependents_and_rejects_bad_new_tasks():
+  o = Orchestrator()
+  o.set_context_store(MagicMock(spec=ContextStore))
+  o._scheduler._backoff_fn = lambda n: 0.0
+  traces: dict[str, str] = {}
+
+  def codegen(task, ctx=None):
+    if task["payload"]["target"] == "bad.py":
+      return _result(task, [{"agent": "TestAgent", "payload": {"mode": "execute"}, "dependsOn": ["nope"]}])
+    return _result(task, [
+      {"id": "gen", "agent": "TestAgent", "payload": {"mode": "generate", "target": "a.py"}},
+      {"id": "run", "agent": "TestAgent", "payload": {"mode": "execute"}, "dependsOn": ["gen"]},
+    ])
+
+  def failing(task, ctx=None):
+    raise RuntimeError("generator crashed")
+
+  o._agent_handlers.update({"CodeGenAgent": codegen, "TestAgent": failing})
+  o.add_completion_listener(lambda trace_id, outcome, result, error: traces.__setitem__(trace_id, outcome))
+  out = o.submit_task({"type": "AgentTask", "id": "t2", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "a.py"}})
+  bad = o.submit_task({"type": "AgentTask", "id": "t3", "agent": "CodeGenAgent", "payload": {"action": "create", "target": "bad.py"}})
+  o.result_future(out["traceId"]).result(timeout=5)
+  o.result_future(bad["traceId"]).result(timeout=5)
+  deadline = time.time() + 5
+  # Follow-ups are spawned after the parent's future resolves
+  while time.time() < deadline:
+    m = o.queue_metrics()
+    if m["workflows"]["cancelled"] >= 1 and m["results"]["completed"].get("failed", 0) >= 2:
+      break
+    time.sleep(0.01)
+  m = o.queue_metrics()
+  o.shutdown()
+  assert m["workflows"]["cancelled"] == 1
+  assert m["results"]["completed"].get("dropped") == 1
+  # The invalid follow-up from t3 is reported as failed alongside the crashed generator
+  assert m["results"]["completed"].get("failed") == 2